@@ -1,23 +1,16 @@
-import json
 import os
 import tkinter as tk
-from tkinter import messagebox, simpledialog, ttk
+from tkinter import messagebox, simpledialog
 from datetime import datetime
+from mistake_snapshot import snapshot_rows
+from mistake_store import ConflictError, configure, add_to_db, delete_from_db
+from mistake_tk_review import ReviewWindow
+from mistake_tk_views import VirtualTree
+from mistake_workers import TkWorkers
 
 DB_FILE = "mistake_data.json"
-
-
-# ---------------- DATABASE HELPERS ----------------
-def load_db():
-    if not os.path.exists(DB_FILE):
-        return []
-    with open(DB_FILE, "r") as f:
-        return json.load(f)
-
-
-def save_db(data):
-    with open(DB_FILE, "w") as f:
-        json.dump(data, f, indent=4)
+SERVER = os.environ.get("MISTAKE_SERVER")  # e.g. http://127.0.0.1:8765, see mistake_server.py
+configure(DB_FILE, backend="remote" if SERVER else "journal", address=SERVER)  # or "json", "sqlite", "binary"
 
 
 # ---------------- ADD BATCH WINDOW ----------------
@@ -68,14 +61,13 @@ def open_add_window():
             messagebox.showerror("Error", "No records added.")
             return
 
-        db = load_db()
-        db.append({
+        workers.submit(add_to_db, DB_FILE, {
             "title": title,
             "date": datetime.now().strftime("%Y-%m-%d %H:%M"),
             "records": records
-        })
-        save_db(db)
-        messagebox.showinfo("Saved", "Batch saved successfully!")
+        }, write=DB_FILE,
+            on_done=lambda _: messagebox.showinfo("Saved", "Batch saved successfully!"),
+            on_error=lambda e: messagebox.showerror("Error", f"Failed to save batch: {e}"))
         add_win.destroy()
 
     tk.Button(add_win, text="Add Record", command=add_record).pack(pady=5)
@@ -88,32 +80,44 @@ def open_view_window():
     view_win.title("View Batches")
     view_win.geometry("500x400")
 
-    db = load_db()
-
-    tree = ttk.Treeview(view_win, columns=("title", "date", "count"), show="headings")
-    tree.heading("title", text="Title")
-    tree.heading("date", text="Date")
-    tree.heading("count", text="Records")
+    headers = snapshot_rows(DB_FILE, workers)
 
+    tree = VirtualTree(view_win, ("title", "date", "count"), ("Title", "Date", "Records"),
+                       to_values=lambda h: (h["title"], h["date"], h["count"]))
     tree.pack(fill="both", expand=True)
-
-    for batch in db:
-        tree.insert("", tk.END, values=(batch["title"], batch["date"], len(batch["records"])))
+    tree.set_rows(headers)
 
     def delete_selected():
-        selected = tree.selection()
-        if not selected:
+        index = tree.selected
+        if index is None:
             messagebox.showerror("Error", "Select a batch to delete.")
             return
 
-        index = tree.index(selected[0])
-
         confirm = messagebox.askyesno("Confirm", "Delete this batch?")
         if confirm:
-            del db[index]
-            save_db(db)
-            tree.delete(selected[0])
-            messagebox.showinfo("Deleted", "Batch deleted.")
+            workers.submit(delete_from_db, DB_FILE, index, expect=headers[index], write=DB_FILE,
+                           on_done=lambda at: deleted(index, at), on_error=failed)
+
+    def deleted(index, at):
+        nonlocal headers
+        if at != index:
+            # other windows saved in the meantime, show the file as it is now
+            headers = snapshot_rows(DB_FILE, workers)
+            tree.set_rows(headers)
+            return
+        del headers[index]
+        tree.selected = None
+        tree.refresh()
+        messagebox.showinfo("Deleted", "Batch deleted.")
+
+    def failed(e):
+        nonlocal headers
+        if isinstance(e, ConflictError):
+            messagebox.showerror("Error", "This batch was changed or deleted by another window.")
+        else:
+            messagebox.showerror("Error", f"Failed to delete the batch: {e}")
+        headers = snapshot_rows(DB_FILE, workers)
+        tree.set_rows(headers)
 
     tk.Button(view_win, text="Delete Selected Batch", command=delete_selected).pack(pady=10)
 
@@ -121,12 +125,15 @@ def open_view_window():
 # ---------------- MAIN GUI ----------------
 root = tk.Tk()
 root.title("Mistake App")
-root.geometry("300x250")
+root.geometry("300x300")
+workers = TkWorkers(root)  # saves run off the GUI thread, in order
 
 tk.Label(root, text="Mistake Tracking App", font=("Arial", 14)).pack(pady=10)
 
 tk.Button(root, text="Add New Batch", width=20, command=open_add_window).pack(pady=10)
 tk.Button(root, text="View / Delete Batches", width=20, command=open_view_window).pack(pady=10)
+tk.Button(root, text="Review Due", width=20, command=lambda: ReviewWindow(root, workers, DB_FILE)).pack(pady=10)
 tk.Button(root, text="Exit", width=20, command=root.quit).pack(pady=10)
 
 root.mainloop()
+workers.shutdown()
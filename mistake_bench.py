@@ -0,0 +1,302 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from mistake_search import SEARCH_SUFFIX, search
+from mistake_snapshot import snapshot_rows
+from mistake_store import (add_many_to_db, add_to_db, configure, delete_from_db, edit_in_db, generation,
+                           invalidate, load_batch, load_db, load_headers, save_db)
+from mistake_synth import BATCH_RECORDS, SCHEMAS, Synth, write_db
+from mistake_tags import tag_index, tag_query
+
+# How load, save, append, edit, delete, search and export scale, on
+# made-up files from mistake_synth:
+#
+#   python mistake_bench.py --records 1000 10000 100000 --out bench.json
+#   python mistake_bench.py --records 10000 --only load search --backend journal sqlite
+#   python mistake_bench.py --out new.json --baseline bench.json --threshold 0.25   # exit 1 on a regression
+#
+# "micro" benchmarks time one store call, "macro" ones what a window does
+# (save a batch, open the batch viewer, show a batch, export).  Every one
+# runs --repeat times on its own copy of the file per schema, size and
+# backend; the median and the best run are kept:
+#
+#   {"meta": {...}, "results": {"micro/load_db.cold/batches/10000/journal": {"median": s, "min": s, "runs": 5}, ...}}
+#
+# Against a baseline a benchmark regresses when its median is more than
+# --threshold slower and by at least NOISE seconds; a baseline taken on
+# another Python, platform or CPU count is compared anyway, with a warning.
+# Excel exports need openpyxl and are recorded as skipped without it.
+REPEAT = 5
+THRESHOLD = 0.2    # 20 % slower
+NOISE = 0.001      # seconds; anything faster is timer noise
+ADD_MANY = 100     # items per add_many_to_db
+VIEW_ROWS = 50     # rows a viewer shows at once
+MACHINE = ("python", "platform", "cpus")   # meta that has to match for a fair comparison
+BENCH_BACKENDS = ("json", "journal", "sqlite", "binary")
+
+_benchmarks = []   # (group, name, schemas, fn)
+
+
+def bench(group, name, schemas=SCHEMAS):
+    def register(fn):
+        _benchmarks.append((group, name, schemas, fn))
+        return fn
+    return register
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+
+def _kind(schema):
+    return "records" if schema == "records" else "batches"
+
+
+def _new_item(schema, run):
+    s = Synth(10000 + run)
+    return s.record() if schema == "records" else s.batch(BATCH_RECORDS)
+
+
+def _count(path, schema):
+    return len(load_db(path)) if schema == "records" else len(load_headers(path))
+
+
+def _item(path, schema, index):
+    return load_db(path)[index] if schema == "records" else load_batch(path, index)
+
+
+def _edited(item):
+    return dict(item, reason="edited") if "records" not in item else dict(item, title=item["title"] + " (edited)")
+
+
+# ---------- micro ----------
+@bench("micro", "load_db.cold")
+def bench_load_cold(path, schema, run):
+    invalidate(path)
+    return timed(load_db, path)
+
+
+@bench("micro", "load_db.warm")
+def bench_load_warm(path, schema, run):
+    load_db(path)
+    return timed(load_db, path)
+
+
+@bench("micro", "load_headers.cold", ("batches", "data"))
+def bench_headers_cold(path, schema, run):
+    invalidate(path)
+    return timed(load_headers, path)
+
+
+@bench("micro", "save_db")
+def bench_save(path, schema, run):
+    return timed(save_db, path, load_db(path))
+
+
+@bench("micro", "add")
+def bench_add(path, schema, run):
+    return timed(add_to_db, path, _new_item(schema, run))
+
+
+@bench("micro", "add_many")
+def bench_add_many(path, schema, run):
+    return timed(add_many_to_db, path, [_new_item(schema, run * ADD_MANY + i) for i in range(ADD_MANY)])
+
+
+@bench("micro", "edit")
+def bench_edit(path, schema, run):
+    index = _count(path, schema) // 2
+    return timed(edit_in_db, path, index, _edited(_item(path, schema, index)))
+
+
+@bench("micro", "delete")
+def bench_delete(path, schema, run):
+    return timed(delete_from_db, path, _count(path, schema) - 1)
+
+
+@bench("micro", "search.build")
+def bench_search_build(path, schema, run):
+    invalidate(path)
+    load_db(path)
+    if os.path.exists(path + SEARCH_SUFFIX):
+        os.remove(path + SEARCH_SUFFIX)
+    return timed(search, path, "time constant")
+
+
+@bench("micro", "search.query")
+def bench_search_query(path, schema, run):
+    search(path, "value")
+    return timed(search, path, "formula of time constant")
+
+
+@bench("micro", "tags.build")
+def bench_tags_build(path, schema, run):
+    invalidate(path)
+    load_db(path)
+    return timed(tag_index, path)
+
+
+@bench("micro", "tags.query")
+def bench_tags_query(path, schema, run):
+    tag_index(path)
+    return timed(tag_query, path, "(Easy OR Formula) AND NOT Hard", 100)
+
+
+# ---------- macro: what the windows do ----------
+# MainWindow.save_batch: one new batch, committed
+@bench("macro", "save_batch", ("batches", "data"))
+def bench_save_batch(path, schema, run):
+    return timed(add_to_db, path, _new_item(schema, run))
+
+
+# ViewBatchesDialog.__init__ after a save: generation, headers, list filled
+@bench("macro", "open_viewer", ("batches", "data"))
+def bench_open_viewer(path, schema, run):
+    add_to_db(path, _new_item(schema, run))
+
+    def open_viewer():
+        generation(path)
+        return [f"{h['title']}  ({h['date']})  [{h['count']} recs]" for h in load_headers(path)]
+    return timed(open_viewer)
+
+
+# clicking through the first VIEW_ROWS batches of an open viewer
+@bench("macro", "view_batches", ("batches", "data"))
+def bench_view_batches(path, schema, run):
+    rows = snapshot_rows(path)
+
+    def view():
+        return ["\n".join(f"Q: {r['question']}\nReason: {r['reason']}" for r in rows.batch(i).get("records", []))
+                for i in range(min(VIEW_ROWS, len(rows)))]
+    return timed(view)
+
+
+# export_batch_to_excel: the records of one batch
+@bench("macro", "export_batch", ("batches", "data"))
+def bench_export_batch(path, schema, run):
+    from mistake_export import write_records_xlsx  # needs openpyxl
+    records = load_batch(path, 0)["records"]
+    return timed(write_records_xlsx, records, path + ".batch.xlsx")
+
+
+# "Export All to Excel"
+@bench("macro", "export_all")
+def bench_export_all(path, schema, run):
+    from mistake_export import export_excel  # needs openpyxl
+    return timed(export_excel, path, path + ".all.xlsx")
+
+
+# ---------- running ----------
+def run_suite(sizes, schemas=SCHEMAS, backends=("journal",), only=None, repeat=REPEAT, seed=0, workdir=None,
+              report=print):
+    results = {}
+    chosen = [b for b in _benchmarks if not only or any(o in f"{b[0]}/{b[1]}" for o in only)]
+    with tempfile.TemporaryDirectory(dir=workdir) as tmp:
+        for schema in schemas:
+            for size in sizes:
+                template = write_db(os.path.join(tmp, f"synth_{schema}_{size}.json"), size, schema, seed)
+                for backend in backends:
+                    for group, name, bench_schemas, fn in chosen:
+                        if schema not in bench_schemas:
+                            continue
+                        key = f"{group}/{name}/{schema}/{size}/{backend}"
+                        results[key] = _run_one(fn, template, schema, backend, repeat, tmp)
+                        report(_line(key, results[key]))
+    return results
+
+
+def _run_one(fn, template, schema, backend, repeat, tmp):
+    run_dir = tempfile.mkdtemp(dir=tmp)
+    path = os.path.join(run_dir, "bench_db.json")
+    shutil.copy(template, path)
+    configure(path, backend=backend, kind=_kind(schema))
+    load_db(path)  # sqlite and binary seed themselves from the JSON here
+    times = []
+    try:
+        for run in range(repeat):
+            times.append(fn(path, schema, run))
+    except ImportError as e:
+        return {"skipped": str(e)}
+    finally:
+        invalidate(path)
+        shutil.rmtree(run_dir, ignore_errors=True)
+    return {"median": statistics.median(times), "min": min(times), "runs": len(times)}
+
+
+def _line(key, result):
+    if "skipped" in result:
+        return f"{key:60} skipped: {result['skipped']}"
+    return f"{key:60} {result['median'] * 1000:10.2f} ms  (best {result['min'] * 1000:.2f})"
+
+
+# [(key, baseline median, new median)] for the benchmarks that got slower
+def regressions(results, baseline, threshold=THRESHOLD, noise=NOISE):
+    slower = []
+    for key, new in results.items():
+        old = baseline.get(key)
+        if not old or "median" not in old or "median" not in new:
+            continue
+        if new["median"] > old["median"] * (1 + threshold) and new["median"] - old["median"] >= noise:
+            slower.append((key, old["median"], new["median"]))
+    return slower
+
+
+def run_meta(seed, repeat):
+    return {"date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "python": platform.python_version(),
+            "platform": platform.platform(), "cpus": os.cpu_count(), "seed": seed, "repeat": repeat}
+
+
+# [(key, baseline value, this run's value)] for the machine meta that differs
+def meta_mismatches(meta, baseline_meta):
+    return [(key, baseline_meta.get(key), meta.get(key)) for key in MACHINE
+            if baseline_meta.get(key) != meta.get(key)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the mistake store on made-up files.")
+    parser.add_argument("--records", type=int, nargs="+", default=[1000, 10000], help="file sizes in records")
+    parser.add_argument("--schema", nargs="+", choices=SCHEMAS, default=list(SCHEMAS))
+    parser.add_argument("--backend", nargs="+", choices=BENCH_BACKENDS, default=["journal"])
+    parser.add_argument("--only", nargs="+", help="benchmarks whose group/name contains one of these")
+    parser.add_argument("--repeat", type=int, default=REPEAT)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="write the results here as JSON")
+    parser.add_argument("--baseline", help="results JSON of an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD, help="allowed slowdown, 0.2 = 20 %%")
+    parser.add_argument("--workdir", help="where the made-up files go (default: the temp dir)")
+    args = parser.parse_args(argv)
+
+    results = run_suite(args.records, args.schema, args.backend, args.only, args.repeat, args.seed, args.workdir)
+    meta = run_meta(args.seed, args.repeat)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"meta": meta, "results": results}, f, indent=2)
+    if not args.baseline:
+        return 0
+
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        saved = json.load(f)
+    baseline = saved["results"]
+    for key, old, new in meta_mismatches(meta, saved.get("meta", {})):
+        print(f"WARNING baseline {key} was {old!r}, this run {new!r}: timings may not compare", file=sys.stderr)
+    slower = regressions(results, baseline, args.threshold)
+    for key, old, new in slower:
+        print(f"REGRESSION {key}: {old * 1000:.2f} ms -> {new * 1000:.2f} ms ({new / old - 1:+.0%})", file=sys.stderr)
+    compared = sum(1 for key in results if key in baseline)
+    print(f"{compared} benchmarks compared with {args.baseline}, {len(slower)} regressed "
+          f"by more than {args.threshold:.0%}", file=sys.stderr)
+    return 1 if slower else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,417 @@
+import io
+import json
+import os
+import shutil
+import struct
+import sys
+import tempfile
+from array import array
+
+# Compact binary copy of a mistake file.
+#
+#   header   "MSTB" | version u8 | kind u8 | n_strings u32 | n_items u32
+#   strings  n_strings x (u32 length + utf-8)   -- tags, reasons, types
+#   offsets  (n_items + 1) x u64                -- start of each item, then end of file
+#   items
+#     kind 0 (batches):  title, date, n u32, question lengths u32[n],
+#                        reason ids u32[n], tag ids u32[n], question bytes, extra
+#     kind 1 (records):  question, type id u32, reason id u32, date, n u32, n x tag id u32, extra
+#
+# Text that is not dictionary-encoded is written as u32 length + utf-8.
+# Everything is little-endian.  "extra" is empty for items that fit the
+# layout, else JSON of what does not: {"absent": [keys], "set": {key: value}}
+# for the item, plus "records": {position: {...}} for a batch's records.
+# Absent keys, non-string values and unknown keys all go there, so decoding
+# gives back exactly the JSON that was encoded.  Version 1 files (no extra,
+# u16 tag counts) are still read.
+MAGIC = b"MSTB"
+VERSION = 2
+KIND_BATCHES, KIND_RECORDS = 0, 1
+NONE_ID = 0xFFFFFFFF
+
+_HEADER = struct.Struct("<4sBBII")
+_U32 = struct.Struct("<I")
+_U16 = struct.Struct("<H")
+_RECORD = struct.Struct("<II")
+
+
+def binary_path_for(json_path):
+    return os.path.splitext(json_path)[0] + ".bin"
+
+
+# ----------------- encoding -----------------
+class _Strings:
+    def __init__(self):
+        self.ids = {}
+        self.values = []
+
+    def id(self, s):
+        if s is None:
+            return NONE_ID
+        i = self.ids.get(s)
+        if i is None:
+            i = self.ids[s] = len(self.values)
+            self.values.append(s)
+        return i
+
+
+def _text(s):
+    b = s.encode("utf-8")
+    return _U32.pack(len(b)) + b
+
+
+# What of obj the fixed layout can't hold: keys it lacks, values of the
+# wrong type and keys the layout has no slot for.  text: keys stored as
+# strings, ids: keys stored as dictionary ids (a string or None).
+class _Rest:
+    def __init__(self, obj, text, ids):
+        self.absent = [k for k in text + ids if k not in obj]
+        self.set = {k: v for k, v in obj.items()
+                    if not (k in text and isinstance(v, str) or k in ids and (v is None or isinstance(v, str)))}
+
+    def text(self, obj, key):
+        return _text(obj[key] if key in obj and key not in self.set else "")
+
+    def id(self, obj, key, strings):
+        return strings.id(obj[key] if key in obj and key not in self.set else None)
+
+    def json(self):
+        out = {}
+        if self.absent:
+            out["absent"] = self.absent
+        if self.set:
+            out["set"] = self.set
+        return out
+
+
+_NO = object()  # key not there
+
+
+def _extra(out):
+    return _text(json.dumps(out, ensure_ascii=False) if out else "")
+
+
+def _encode_batch(b, strings):
+    rest = _Rest(b, ("title", "date"), ())
+    recs = b.get("records")
+    if "records" not in b:
+        rest.absent.append("records")
+        recs = []
+    elif isinstance(recs, list) and all(isinstance(r, dict) for r in recs):
+        del rest.set["records"]
+    else:
+        recs = []  # kept as it is in rest.set
+    extra = rest.json()
+    questions = []
+    lengths, reasons, tags = array("I"), array("I"), array("I")
+    rec_extra = {}
+    for i, r in enumerate(recs):
+        # the usual {question, reason, tag} record skips the _Rest bookkeeping
+        q, reason, tag = r.get("question"), r.get("reason", _NO), r.get("tag", _NO)
+        if not (len(r) == 3 and type(q) is str and (reason is None or type(reason) is str)
+                and (tag is None or type(tag) is str)):
+            rest_r = _Rest(r, ("question",), ("reason", "tag"))
+            kept = {k: v for k, v in r.items() if k not in rest_r.set}
+            q, reason, tag = kept.get("question", ""), kept.get("reason"), kept.get("tag")
+            rec_extra[str(i)] = rest_r.json()
+        q = q.encode("utf-8")
+        questions.append(q)
+        lengths.append(len(q))
+        reasons.append(strings.id(reason))
+        tags.append(strings.id(tag))
+    if rec_extra:
+        extra["records"] = rec_extra
+    parts = [rest.text(b, "title"), rest.text(b, "date"), _U32.pack(len(recs))]
+    for a in (lengths, reasons, tags):
+        parts.append(a.tobytes() if sys.byteorder == "little" else _swapped(a))
+    parts.extend(questions)
+    parts.append(_extra(extra))
+    return b"".join(parts)
+
+
+def _encode_record(r, strings):
+    rest = _Rest(r, ("question", "date"), ("type", "reason"))
+    tag_list = r.get("tags")
+    if "tags" not in r:
+        rest.absent.append("tags")
+        tag_list = []
+    elif isinstance(tag_list, list) and all(isinstance(t, str) for t in tag_list):
+        del rest.set["tags"]
+    else:
+        tag_list = []  # kept as it is in rest.set
+    tags = array("I", [strings.id(t) for t in tag_list])
+    return b"".join([
+        rest.text(r, "question"),
+        _RECORD.pack(rest.id(r, "type", strings), rest.id(r, "reason", strings)),
+        rest.text(r, "date"),
+        _U32.pack(len(tags)),
+        tags.tobytes() if sys.byteorder == "little" else _swapped(tags),
+        _extra(rest.json()),
+    ])
+
+
+def _swapped(a):
+    a = array(a.typecode, a)
+    a.byteswap()
+    return a.tobytes()
+
+
+def detect_kind(data):
+    if data and isinstance(data[0], dict) and "records" not in data[0]:
+        return KIND_RECORDS
+    return KIND_BATCHES
+
+
+# Items are encoded one at a time into `body` while the string table
+# grows; the header, table and offsets are written to `out` at the end and
+# the body copied after them, so data can be any iterable and is never
+# held whole.
+def _write(out, body, data, kind):
+    strings = _Strings()
+    enc = _encode_batch if kind == KIND_BATCHES else _encode_record
+    offsets = array("Q")
+    pos = 0
+    for item in data:
+        chunk = enc(item, strings)
+        offsets.append(pos)
+        body.write(chunk)
+        pos += len(chunk)
+    offsets.append(pos)
+    table = b"".join(_text(s) for s in strings.values)
+    base = _HEADER.size + len(table) + 8 * len(offsets)
+    offsets = array("Q", [o + base for o in offsets])
+    out.write(_HEADER.pack(MAGIC, VERSION, kind, len(strings.values), len(offsets) - 1))
+    out.write(table)
+    out.write(offsets.tobytes() if sys.byteorder == "little" else _swapped(offsets))
+    body.seek(0)
+    shutil.copyfileobj(body, out, 1 << 20)
+
+
+def encode(data, kind=None):
+    if kind is None:
+        kind = detect_kind(data)
+    out = io.BytesIO()
+    _write(out, io.BytesIO(), data, kind)
+    return out.getvalue()
+
+
+# data may be a generator when kind is given
+def save_binary(path, data, kind=None):
+    if kind is None:
+        kind = detect_kind(data)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f, tempfile.TemporaryFile(dir=os.path.dirname(os.path.abspath(path))) as body:
+        _write(f, body, data, kind)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+# ----------------- decoding -----------------
+def _read_text(buf, pos):
+    (n,) = _U32.unpack_from(buf, pos)
+    pos += 4
+    return str(buf[pos:pos + n], "utf-8"), pos + n
+
+
+def _read_array(buf, pos, typecode, n):
+    a = array(typecode)
+    a.frombytes(buf[pos:pos + n * a.itemsize])
+    if sys.byteorder != "little":
+        a.byteswap()
+    return a, pos + n * a.itemsize
+
+
+class BinaryFile:
+    def __init__(self, buf):
+        magic, self.version, self.kind, n_strings, self.n_items = _HEADER.unpack_from(buf, 0)
+        if magic != MAGIC or self.version not in (1, VERSION):
+            raise ValueError("not a mistake binary file")
+        self.buf = buf
+        pos = _HEADER.size
+        self.strings = []
+        for _ in range(n_strings):
+            s, pos = _read_text(buf, pos)
+            self.strings.append(s)
+        self.offsets, _ = _read_array(buf, pos, "Q", self.n_items + 1)
+        self.lookup = dict(enumerate(self.strings))
+        self.lookup[NONE_ID] = None
+
+    def string(self, i):
+        return self.lookup[i]
+
+    def __len__(self):
+        return self.n_items
+
+    def header(self, index):
+        pos = self.offsets[index]
+        title, pos = _read_text(self.buf, pos)
+        date, pos = _read_text(self.buf, pos)
+        (n,) = _U32.unpack_from(self.buf, pos)
+        return {"title": title, "date": date, "count": n}
+
+    def item(self, index):
+        buf, pos = self.buf, self.offsets[index]
+        if self.kind == KIND_RECORDS:
+            question, pos = _read_text(buf, pos)
+            type_id, reason_id = _RECORD.unpack_from(buf, pos)
+            date, pos = _read_text(buf, pos + _RECORD.size)
+            if self.version == 1:
+                (n,) = _U16.unpack_from(buf, pos)
+                tags, pos = _read_array(buf, pos + 2, "I", n)
+            else:
+                (n,) = _U32.unpack_from(buf, pos)
+                tags, pos = _read_array(buf, pos + 4, "I", n)
+            rec = {"question": question, "type": self.string(type_id), "reason": self.string(reason_id),
+                   "tags": [self.strings[t] for t in tags], "date": date}
+            return _restore(rec, self._extra(pos))
+        title, pos = _read_text(buf, pos)
+        date, pos = _read_text(buf, pos)
+        (n,) = _U32.unpack_from(buf, pos)
+        lengths, pos = _read_array(buf, pos + 4, "I", n)
+        reasons, pos = _read_array(buf, pos, "I", n)
+        tags, pos = _read_array(buf, pos, "I", n)
+        questions = []
+        for length in lengths:
+            questions.append(str(buf[pos:pos + length], "utf-8"))
+            pos += length
+        s = self.lookup
+        records = [{"question": q, "reason": s[r], "tag": s[t]} for q, r, t in zip(questions, reasons, tags)]
+        extra = self._extra(pos)
+        if extra and "records" in extra:
+            for i, rec_extra in extra["records"].items():
+                _restore(records[int(i)], rec_extra)
+        return _restore({"title": title, "date": date, "records": records}, extra)
+
+    # records lo..hi of a batch, decoded without the rest of it
+    def records(self, index, lo, hi):
+        buf, pos = self.buf, self.offsets[index]
+        _, pos = _read_text(buf, pos)
+        _, pos = _read_text(buf, pos)
+        (n,) = _U32.unpack_from(buf, pos)
+        lo, hi = max(lo, 0), min(hi, n)
+        if lo >= hi:
+            return []
+        lengths, pos = _read_array(buf, pos + 4, "I", n)
+        reasons, _ = _read_array(buf, pos + 4 * lo, "I", hi - lo)
+        tags, _ = _read_array(buf, pos + 4 * (n + lo), "I", hi - lo)
+        pos += 8 * n  # past the reason and tag ids
+        start = pos + sum(lengths[:lo])
+        s = self.lookup
+        records = []
+        for i in range(hi - lo):
+            length = lengths[lo + i]
+            records.append({"question": str(buf[start:start + length], "utf-8"),
+                            "reason": s[reasons[i]], "tag": s[tags[i]]})
+            start += length
+        extra = self._extra(pos + sum(lengths))
+        if extra and "records" in extra:
+            for i, rec_extra in extra["records"].items():
+                if lo <= int(i) < hi:
+                    _restore(records[int(i) - lo], rec_extra)
+        return records
+
+    def _extra(self, pos):
+        if self.version == 1:
+            return None
+        text, _ = _read_text(self.buf, pos)
+        return json.loads(text) if text else None
+
+    def items(self):
+        return [self.item(i) for i in range(self.n_items)]
+
+
+def _restore(obj, extra):
+    if extra:
+        for k in extra.get("absent", ()):
+            obj.pop(k, None)
+        obj.update(extra.get("set", {}))
+    return obj
+
+
+def open_binary(path):
+    with open(path, "rb") as f:
+        return BinaryFile(f.read())
+
+
+def load_binary(path):
+    if not os.path.exists(path):
+        return []
+    return open_binary(path).items()
+
+
+# ----------------- store backend -----------------
+# Same calls as the journal and SQLite stores.  Writes rewrite the whole
+# file, so this backend suits read-mostly databases.
+class BinaryStore:
+    def __init__(self, path, kind="batches", seed_json=None):
+        self.path = path
+        self.kind = KIND_RECORDS if kind == "records" else KIND_BATCHES
+        if not os.path.exists(path) and seed_json and os.path.exists(seed_json):
+            json_to_binary(seed_json, path)
+
+    def load(self):
+        return load_binary(self.path)
+
+    def save(self, data):
+        save_binary(self.path, data, self.kind)
+
+    def add(self, item):
+        self.add_many([item])
+
+    def add_many(self, items):
+        data = self.load()
+        data.extend(items)
+        self.save(data)
+
+    def edit(self, index, item):
+        data = self.load()
+        data[index] = item
+        self.save(data)
+
+    def delete(self, index):
+        data = self.load()
+        del data[index]
+        self.save(data)
+
+    def count(self):
+        return len(open_binary(self.path)) if os.path.exists(self.path) else 0
+
+    def headers(self):
+        if not os.path.exists(self.path):
+            return []
+        f = open_binary(self.path)
+        return [tuple(f.header(i).values()) for i in range(len(f))]
+
+    def get(self, index):
+        f = open_binary(self.path)
+        if index < 0:
+            index += len(f)
+        if not 0 <= index < len(f):
+            raise IndexError(index)
+        return f.item(index)
+
+
+# ----------------- JSON <-> binary -----------------
+def json_to_binary(src, dst):
+    with open(src, "r", encoding="utf-8") as f:
+        save_binary(dst, json.load(f))
+
+
+def binary_to_json(src, dst):
+    with open(dst, "w", encoding="utf-8") as f:
+        json.dump(load_binary(src), f, indent=4, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    # python mistake_binary.py to-bin mistake_db.json mistake_db.bin
+    # python mistake_binary.py to-json mistake_db.bin mistake_db.json
+    if len(sys.argv) != 4 or sys.argv[1] not in ("to-bin", "to-json"):
+        print("usage: python mistake_binary.py to-bin|to-json SRC DST")
+        sys.exit(1)
+    if sys.argv[1] == "to-bin":
+        json_to_binary(sys.argv[2], sys.argv[3])
+    else:
+        binary_to_json(sys.argv[2], sys.argv[3])
+    print(f"{sys.argv[2]} ({os.path.getsize(sys.argv[2])} bytes) -> "
+          f"{sys.argv[3]} ({os.path.getsize(sys.argv[3])} bytes)")
@@ -0,0 +1,68 @@
+import atexit
+import threading
+
+from mistake_store import add_many_to_db
+
+# Write-behind buffer for fast entry (mistakedata1 adds one record per
+# <Return>).  Adds are held for at most MAX_DELAY seconds or MAX_RECORDS
+# records and then written together in one durable append, so a crash can
+# lose at most the last durability_window seconds of typing.
+#
+# A failed write keeps its records pending, in order, for the next flush.
+# flush() raises to its caller; a flush on the timer thread hands the error
+# to on_error (the window's message box) instead of losing it.
+MAX_RECORDS = 50
+MAX_DELAY = 0.5
+
+
+class WriteBuffer:
+    def __init__(self, path, max_records=MAX_RECORDS, max_delay=MAX_DELAY, on_error=None):
+        self.path = path
+        self.max_records = max_records
+        self.max_delay = max_delay
+        self.on_error = on_error
+        self.pending = []
+        self.lock = threading.Lock()
+        self.timer = None
+        atexit.register(self.flush)
+
+    @property
+    def durability_window(self):
+        return self.max_delay
+
+    def add(self, item):
+        with self.lock:
+            self.pending.append(item)
+            full = len(self.pending) >= self.max_records
+            if not full and self.timer is None:
+                self.timer = threading.Timer(self.max_delay, self._flush_later)
+                self.timer.daemon = True
+                self.timer.start()
+        if full:
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            items, self.pending = self.pending, []
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            # written under the lock so batches reach the file in order
+            if items:
+                try:
+                    add_many_to_db(self.path, items)
+                except Exception:
+                    self.pending[:0] = items
+                    raise
+
+    # runs on the timer thread, where an exception would only reach stderr
+    def _flush_later(self):
+        try:
+            self.flush()
+        except Exception as e:
+            if self.on_error is None:
+                raise
+            self.on_error(e)
+
+    def __len__(self):
+        return len(self.pending)
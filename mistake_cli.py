@@ -0,0 +1,304 @@
+import argparse
+import csv
+import json
+import signal
+import sys
+import time
+from datetime import datetime
+from itertools import islice
+
+from mistake_dates import date_key, records_between
+from mistake_import import as_batch, as_records, import_paths, map_columns
+from mistake_rollups import FIELDS, rollups
+from mistake_search import search
+from mistake_store import BACKENDS, add_many_to_db, add_to_db, configure, iter_db, load_headers, settings
+from mistake_tags import tag_matches
+
+# The store without a window, for scripts, cron jobs and servers:
+#
+#   python -m mistake_cli --db mistake_db.json add "Formula of time constant" --reason Theory --tag physics
+#   python -m mistake_cli import quizzes/                      # quiz .xlsx/.json files (mistake_import)
+#   producer | python -m mistake_cli import --format jsonl     # records or batches on stdin, streamed
+#   python -m mistake_cli list --since 2025-12-01
+#   python -m mistake_cli search "time constant"
+#   python -m mistake_cli tags 'physics AND NOT Easy'
+#   python -m mistake_cli stats --json
+#   python -m mistake_cli export all.xlsx --layout sheets      # or --format csv/jsonl to a file or stdout
+#
+# Exports stream the items through store.iter_db, so they leave no snapshot
+# behind and never hold the whole file.
+# stdin is read CHUNK rows at a time and every chunk is one add_many_to_db
+# commit.  In a batches file, rows go into batches by their title and date
+# columns (--title and the current time when they have none); a title that
+# runs across two chunks ends up as two batches.
+CHUNK = 10000
+CSV_HEADER = ["Batch Title", "Date", "Question", "Reason", "Tag"]
+RECORDS_CSV_HEADER = ["Question", "Type", "Reason", "Tags", "Date"]
+
+
+def _now():
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+# ---------- reading stdin ----------
+def read_csv(f):
+    rows = csv.reader(f)
+    cols = map_columns(next(rows, ()))
+    for row in rows:
+        rec = {field: row[i].strip() if i < len(row) else "" for field, i in cols.items()}
+        if rec["question"]:
+            yield rec
+
+
+def read_jsonl(f):
+    for line in f:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+# one chunk of rows as items for this file: records, or batches grouped by title and date
+def to_items(rows, kind, title, date):
+    if kind == "records":
+        loose = [r for r in rows if "records" not in r]
+        items = as_records({"date": date, "records": loose}) if loose else []
+        for r in rows:
+            if "records" in r:
+                items += as_records(r)
+        return items
+    batches, filling = [], None   # filling: (title, date) of the batch loose rows go into
+    for r in rows:
+        if "records" in r:
+            batches.append(as_batch(r))
+            filling = None
+            continue
+        key = (r.get("title") or title, r.get("date") or date)
+        if key != filling:
+            batches.append({"title": key[0], "date": key[1], "records": []})
+            filling = key
+        batches[-1]["records"].append(as_batch({"records": [r]})["records"][0])
+    return batches
+
+
+def ingest(path, rows, title, chunk=CHUNK):
+    kind = settings(path)[1]
+    date = _now()
+    records = commits = 0
+    rows = iter(rows)
+    start = time.perf_counter()
+    while True:
+        part = list(islice(rows, chunk))
+        if not part:
+            break
+        items = to_items(part, kind, title, date)
+        add_many_to_db(path, items)
+        commits += 1
+        records += len(items) if kind == "records" else sum(len(b["records"]) for b in items)
+    seconds = time.perf_counter() - start
+    return {"records": records, "commits": commits, "seconds": seconds,
+            "rate": records / seconds if seconds else 0.0}
+
+
+# ---------- subcommands ----------
+def cmd_add(args):
+    rec = {"question": args.question, "reason": args.reason, "tag": args.tag, "type": args.type, "date": _now()}
+    if settings(args.db)[1] == "records":
+        add_to_db(args.db, as_records({"records": [rec]})[0])
+    else:
+        add_to_db(args.db, as_batch({"title": args.title or f"CLI {rec['date'][:10]}", "date": rec["date"],
+                                     "records": [rec]}))
+    print(f"{args.db}: added")
+    return 0
+
+
+def cmd_import(args):
+    if args.paths and args.paths != ["-"]:
+        stats = import_paths(args.db, args.paths, args.processes)
+        print(f"{args.db}: {stats['records']} records in {stats['batches']} batches from {stats['files']} files, "
+              f"{stats['skipped']} skipped ({stats['rate']:.0f} records/s)", file=sys.stderr)
+        return 0
+    rows = read_csv(sys.stdin) if args.format == "csv" else read_jsonl(sys.stdin)
+    stats = ingest(args.db, rows, args.title or "Imported", args.chunk)
+    print(f"{args.db}: {stats['records']} records in {stats['commits']} commits, {stats['seconds']:.2f} s "
+          f"({stats['rate']:.0f} records/s)", file=sys.stderr)
+    return 0
+
+
+def _in_range(date, since, until):
+    key = date_key(date)
+    return key is not None and (since is None or key >= since) and (until is None or key < until)
+
+
+def cmd_list(args):
+    since = date_key(args.since) if args.since else None
+    until = date_key(args.until) if args.until else None
+    if settings(args.db)[1] == "records":
+        rows = [{"date": r.get("date", ""), "type": r.get("type", ""), "question": r.get("question", "")}
+                for _, r in records_between(args.db, args.since, args.until, args.limit)]
+    else:
+        rows = [dict(h, index=i) for i, h in enumerate(load_headers(args.db))
+                if (since is None and until is None) or _in_range(h["date"], since, until)][:args.limit]
+        rows = [{"index": h["index"], "date": h["date"], "count": h["count"], "title": h["title"]} for h in rows]
+    if args.json:
+        json.dump(rows, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+        return 0
+    for row in rows:
+        print("\t".join(str(v) for v in row.values()))
+    return 0
+
+
+def cmd_search(args):
+    hits = search(args.db, args.query, k=args.limit)
+    if args.json:
+        json.dump([{"score": round(s, 4), "title": b.get("title") if b else None, "record": r} for s, b, r in hits],
+                  sys.stdout, ensure_ascii=False, indent=2)
+        print()
+        return 0
+    for score, b, r in hits:
+        where = f"[{b.get('title', '')}] " if b else ""
+        print(f"{score:.2f}\t{where}{r.get('question', '')}")
+    return 0
+
+
+def cmd_tags(args):
+    matches, records = tag_matches(args.db, args.query, args.limit)
+    if args.json:
+        json.dump({"matches": matches, "records": [{"title": b.get("title") if b else None, "record": r}
+                                                   for b, r in records]},
+                  sys.stdout, ensure_ascii=False, indent=2)
+        print()
+        return 0
+    for b, r in records:
+        where = f"[{b.get('title', '')}] " if b else ""
+        print(f"{where}{r.get('question', '')}")
+    print(f"{matches} matching records", file=sys.stderr)
+    return 0
+
+
+def cmd_stats(args):
+    r = rollups(args.db)
+    out = {"total": r.total}
+    if settings(args.db)[1] == "batches":
+        out["batches"] = len(load_headers(args.db))
+    for f in FIELDS:
+        if f != "day":
+            out[f] = r.top(f, args.top)
+    if args.json:
+        json.dump(out, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+        return 0
+    print(f"records: {out['total']}" + (f"  batches: {out['batches']}" if "batches" in out else ""))
+    for f in FIELDS:
+        if f in out:
+            print(f"{f}: " + ", ".join(f"{k or '-'} {n}" for k, n in out[f]))
+    return 0
+
+
+def export_rows(path):
+    records_file = settings(path)[1] == "records"
+    for item in iter_db(path):
+        if records_file:
+            yield item, [item.get("question", ""), item.get("type", ""), item.get("reason", ""),
+                         ", ".join(item.get("tags") or []), item.get("date", "")]
+        else:
+            for r in item.get("records", []):
+                yield item, [item.get("title", ""), item.get("date", ""), r.get("question", ""),
+                             r.get("reason", ""), r.get("tag", "")]
+
+
+def cmd_export(args):
+    fmt = args.format or ("xlsx" if args.out.endswith((".xlsx", ".xlsm")) else "jsonl")
+    if fmt == "xlsx":
+        from mistake_export import export_excel, export_excel_split  # needs openpyxl
+        if args.parts > 1:
+            files = export_excel_split(args.db, args.out, args.parts, args.layout)
+            print(f"{args.db}: exported to {', '.join(files)}", file=sys.stderr)
+        else:
+            n = export_excel(args.db, args.out, args.layout)
+            print(f"{args.db}: {n} records exported to {args.out}", file=sys.stderr)
+        return 0
+    out = sys.stdout if args.out == "-" else open(args.out, "w", encoding="utf-8", newline="")
+    try:
+        if fmt == "csv":
+            writer = csv.writer(out)
+            writer.writerow(RECORDS_CSV_HEADER if settings(args.db)[1] == "records" else CSV_HEADER)
+            for _, row in export_rows(args.db):
+                writer.writerow(row)
+        else:
+            for item in iter_db(args.db):
+                out.write(json.dumps(item, ensure_ascii=False) + "\n")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m mistake_cli", description="Work with a mistake file without a window.")
+    parser.add_argument("--db", default="mistake_db.json", help="mistake file (default: mistake_db.json)")
+    parser.add_argument("--backend", choices=BACKENDS, default="journal")
+    parser.add_argument("--kind", choices=("batches", "records"), default="batches")
+    parser.add_argument("--server", help="use the mistake_server.py at this address, e.g. http://127.0.0.1:8765")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("add", help="save one mistake")
+    p.add_argument("question")
+    p.add_argument("--reason", default="")
+    p.add_argument("--tag", default="", help="comma separated")
+    p.add_argument("--type", default="", help="wrong / timeout")
+    p.add_argument("--title", help="batch title (batches files)")
+    p.set_defaults(run=cmd_add)
+
+    p = sub.add_parser("import", help="quiz files, or CSV/JSONL rows from stdin")
+    p.add_argument("paths", nargs="*", help="quiz .xlsx/.json files or folders; none or - reads stdin")
+    p.add_argument("--format", choices=("csv", "jsonl"), default="jsonl", help="stdin format")
+    p.add_argument("--title", help="batch title for stdin rows without one")
+    p.add_argument("--chunk", type=int, default=CHUNK, help="rows per commit")
+    p.add_argument("--processes", type=int, default=None, help="parser processes for quiz files")
+    p.set_defaults(run=cmd_import)
+
+    p = sub.add_parser("list", help="batches (or records) by date")
+    p.add_argument("--since", help="date, inclusive")
+    p.add_argument("--until", help="date, exclusive")
+    p.add_argument("--limit", type=int, default=None)
+    p.add_argument("--json", action="store_true")
+    p.set_defaults(run=cmd_list)
+
+    p = sub.add_parser("search", help="full-text search over questions and reasons")
+    p.add_argument("query")
+    p.add_argument("--limit", type=int, default=20)
+    p.add_argument("--json", action="store_true")
+    p.set_defaults(run=cmd_search)
+
+    p = sub.add_parser("tags", help="records matching a tag expression (AND, OR, NOT, parentheses)")
+    p.add_argument("query")
+    p.add_argument("--limit", type=int, default=20)
+    p.add_argument("--json", action="store_true")
+    p.set_defaults(run=cmd_tags)
+
+    p = sub.add_parser("stats", help="record counts by tag, reason and type")
+    p.add_argument("--top", type=int, default=10)
+    p.add_argument("--json", action="store_true")
+    p.set_defaults(run=cmd_stats)
+
+    p = sub.add_parser("export", help="everything to .xlsx, CSV or JSONL")
+    p.add_argument("out", nargs="?", default="-", help="output file, - for stdout")
+    p.add_argument("--format", choices=("xlsx", "csv", "jsonl"), help="default: from the file name, else jsonl")
+    p.add_argument("--layout", choices=("flat", "sheets"), default="flat", help="xlsx: one sheet or one per batch")
+    p.add_argument("--parts", type=int, default=1, help="xlsx: split over this many files, in parallel")
+    p.set_defaults(run=cmd_export)
+
+    args = parser.parse_args(argv)
+    configure(args.db, backend="remote" if args.server else args.backend, kind=args.kind, address=args.server)
+    try:
+        return args.run(args)
+    except (ValueError, OSError, ImportError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    if hasattr(signal, "SIGPIPE"):
+        signal.signal(signal.SIGPIPE, signal.SIG_DFL)  # piped into head: stop quietly, like other tools
+    sys.exit(main())
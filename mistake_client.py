@@ -0,0 +1,214 @@
+import json
+import socket
+import threading
+from urllib.parse import quote, urlsplit
+
+from mistake_store import ConflictError
+
+# Client for mistake_server.py.  It looks like the other stores (load, save,
+# add, add_many, edit, delete, headers, get), so the windows use it through
+# mistake_store without knowing:
+#
+#   configure(DB_FILE, backend="remote", address="http://127.0.0.1:8765")   # or "unix:/tmp/mistake.sock"
+#   load_db(DB_FILE), add_to_db(DB_FILE, batch), edit_in_db(DB_FILE, i, batch, expect=header, generation=gen)
+#
+# or directly:
+#
+#   c = client_for("http://127.0.0.1:8765")
+#   c.search("time constant"), c.tag_query("physics AND NOT revision"), c.stats()
+#   c.pipeline([("GET", "/items/0", None), ("GET", "/items/1", None)])   # one round trip
+#
+# One keep-alive connection per address, shared by the threads of a process.
+# A 409 from the server is raised as ConflictError, a 404 as IndexError and
+# a 400 as ValueError.
+TIMEOUT = 30.0
+WINDOW = 32   # pipelined requests in flight before reading their answers
+
+
+class ServiceError(Exception):
+    pass
+
+
+class MistakeClient:
+    def __init__(self, address, timeout=TIMEOUT):
+        self.address = address
+        self.timeout = timeout
+        url = urlsplit(address)
+        if url.scheme == "unix":
+            self.unix, self.host = url.path, "localhost"
+        elif url.scheme == "http":
+            self.unix, self.host = None, url.netloc
+        else:
+            raise ValueError(f"unsupported address {address!r}, expected http://host:port or unix:/path")
+        self.lock = threading.Lock()
+        self.sock = None
+        self.reader = None
+
+    # ---------- connection ----------
+    def _connect(self):
+        if self.unix:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.unix)
+        else:
+            host, _, port = self.host.rpartition(":")
+            sock = socket.create_connection((host, int(port)), self.timeout)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.sock = sock
+        self.reader = sock.makefile("rb")
+
+    def close(self):
+        with self.lock:
+            self._close()
+
+    def _close(self):
+        if self.sock is not None:
+            self.reader.close()
+            self.sock.close()
+            self.sock = self.reader = None
+
+    def _encode(self, method, target, body):
+        data = b"" if body is None else json.dumps(body, ensure_ascii=False).encode("utf-8")
+        return (f"{method} {target} HTTP/1.1\r\nHost: {self.host}\r\nContent-Type: application/json\r\n"
+                f"Content-Length: {len(data)}\r\n\r\n").encode("latin-1") + data
+
+    def _read(self):
+        line = self.reader.readline()
+        if not line:
+            raise ConnectionError("the server closed the connection")
+        status = int(line.split()[1])
+        length = 0
+        while True:
+            h = self.reader.readline()
+            if h in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = h.decode("latin-1").partition(":")
+            if name.strip().lower() == "content-length":
+                length = int(value)
+        return status, json.loads(self.reader.read(length)) if length else None
+
+    # [(method, target, body)] -> [(status, payload)], sent back to back
+    def _exchange(self, requests):
+        if self.sock is None:
+            self._connect()
+        out = []
+        for i in range(0, len(requests), WINDOW):
+            window = requests[i:i + WINDOW]
+            self.sock.sendall(b"".join(self._encode(*r) for r in window))
+            out += [self._read() for _ in window]
+        return out
+
+    def pipeline(self, requests):
+        requests = list(requests)
+        with self.lock:
+            try:
+                answers = self._exchange(requests)
+            except (ConnectionError, OSError):
+                # a kept-alive connection the server dropped; reads are safe to send again
+                self._close()
+                if any(method != "GET" for method, _, _ in requests):
+                    raise
+                answers = self._exchange(requests)
+        return [self._check(status, payload) for status, payload in answers]
+
+    def request(self, method, target, body=None):
+        return self.pipeline([(method, target, body)])[0]
+
+    @staticmethod
+    def _check(status, payload):
+        if status == 200:
+            return payload
+        message = payload.get("error", "") if isinstance(payload, dict) else str(payload)
+        if status == 409:
+            raise ConflictError(message)
+        if status == 404:
+            raise IndexError(message)
+        if status == 400:
+            raise ValueError(message)
+        raise ServiceError(f"HTTP {status}: {message}")
+
+    # ---------- the store interface ----------
+    # (index, generation, alone) for one write; alone is False when the
+    # server committed it together with other writes
+    def write(self, op, index=None, item=None, expect=None, seen=None):
+        if op == "add":
+            answer = self.request("POST", "/items", item)
+        elif op == "add_many":
+            answer = self.request("POST", "/items/bulk", list(item))
+        elif op == "edit":
+            answer = self.request("PUT", f"/items/{index}", {"item": item, "expect": expect, "generation": seen})
+        elif op == "delete":
+            answer = self.request("DELETE", f"/items/{index}", {"expect": expect, "generation": seen})
+        elif op == "save":
+            answer = self.request("PUT", "/items", list(item))
+        else:
+            raise ValueError(f"unknown write {op!r}")
+        return answer["index"], answer["generation"], answer["alone"]
+
+    def load(self):
+        return self.request("GET", "/items")
+
+    def save(self, data):
+        self.write("save", item=data)
+
+    def add(self, item):
+        self.write("add", item=item)
+
+    def add_many(self, items):
+        self.write("add_many", item=items)
+
+    def edit(self, index, item):
+        self.write("edit", index, item)
+
+    def delete(self, index):
+        self.write("delete", index)
+
+    def headers(self):
+        return [tuple(h) for h in self.request("GET", "/headers")]
+
+    def get(self, index):
+        return self.request("GET", f"/items/{index}")
+
+    def get_many(self, indexes):
+        return self.pipeline([("GET", f"/items/{i}", None) for i in indexes])
+
+    def generation(self):
+        return self.request("GET", "/generation")
+
+    # ---------- records inside a batch ----------
+    def get_record(self, batch, record):
+        return self.request("GET", f"/items/{batch}/records/{record}")
+
+    def add_record(self, batch, record):
+        return self.request("POST", f"/items/{batch}/records", record)["index"][1]
+
+    def edit_record(self, batch, index, record):
+        self.request("PUT", f"/items/{batch}/records/{index}", record)
+
+    def delete_record(self, batch, index):
+        self.request("DELETE", f"/items/{batch}/records/{index}")
+
+    # ---------- queries ----------
+    # [(score, batch or None, record)], like mistake_search.search
+    def search(self, query, k=20):
+        hits = self.request("GET", f"/search?q={quote(query)}&k={k}")
+        return [(h["score"], h["batch"], h["record"]) for h in hits]
+
+    # [(batch or None, record)], like mistake_tags.tag_query
+    def tag_query(self, expr, limit=None):
+        target = f"/tags?q={quote(expr)}" + (f"&limit={limit}" if limit is not None else "")
+        return [(m["batch"], m["record"]) for m in self.request("GET", target)["records"]]
+
+    def stats(self):
+        return self.request("GET", "/stats")
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def client_for(address):
+    with _clients_lock:
+        if address not in _clients:
+            _clients[address] = MistakeClient(address)
+        return _clients[address]
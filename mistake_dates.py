@@ -0,0 +1,174 @@
+import calendar
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from functools import lru_cache
+
+from mistake_store import get_index, index_lock
+
+# Records in date order.  Every date string is parsed once, when the record
+# is indexed, into an integer key (seconds since 1970, read as UTC so DST
+# never reorders anything), and the keys are kept sorted next to the record
+# ids, so a range is two bisects and "latest N" is a slice from the end.
+#
+#   records_between(DB_FILE, "2025-10-13", "2025-10-20")  -> [(batch, record), ...] oldest first
+#   latest_records(DB_FILE, 20)                            -> newest first
+#
+# Batch records take the batch's date.  Dates that match none of
+# DATE_FORMATS are left out of the index and counted in .undated.
+DATE_FORMATS = ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d")
+
+
+@lru_cache(maxsize=4096)  # a batch's records all share its date
+def _parse(value):
+    for fmt in DATE_FORMATS:
+        try:
+            return calendar.timegm(datetime.strptime(value.strip(), fmt).timetuple())
+        except ValueError:
+            pass
+    return None
+
+
+def date_key(value):
+    if isinstance(value, datetime):
+        return calendar.timegm(value.timetuple())
+    if isinstance(value, (int, float)):
+        return int(value)
+    if not isinstance(value, str):
+        return None
+    return _parse(value)
+
+
+# seconds since 1970 for a saved date, read as local time the way the apps
+# write it, for comparing with time.time(); date_key is only for ordering
+def local_timestamp(value):
+    if isinstance(value, (int, float)):
+        return int(value)
+    key = date_key(value)
+    if key is None:
+        return None
+    return int(time.mktime(time.gmtime(key)[:8] + (-1,)))
+
+
+class DateIndex:
+    def __init__(self, data=(), kind="batches"):
+        self.kind = kind
+        self.keys = array("q")    # sorted date keys
+        self.rids = array("I")    # record id at the same position; ascending within equal keys
+        self.records = []         # record id -> (batch or None, record)
+        self.record_keys = []     # record id -> date key or None
+        self.items = []           # position in the file -> [record ids]
+        self.undated = 0
+        self._bulk_load(data)
+
+    def _records_of(self, item):
+        if self.kind == "records":
+            return [(None, item, item.get("date"))]
+        return [(item, r, item.get("date")) for r in item.get("records", [])]
+
+    def _new_ids(self, item):
+        rids = []
+        for batch, rec, date in self._records_of(item):
+            rid = len(self.records)
+            key = date_key(date)
+            self.records.append((batch, rec))
+            self.record_keys.append(key)
+            if key is None:
+                self.undated += 1
+            rids.append(rid)
+        return rids
+
+    def _bulk_load(self, data):
+        for item in data:
+            self.items.append(self._new_ids(item))
+        pairs = sorted((k, rid) for rid, k in enumerate(self.record_keys) if k is not None)
+        self.keys = array("q", [k for k, _ in pairs])
+        self.rids = array("I", [rid for _, rid in pairs])
+
+    def _slot(self, key, rid):
+        lo = bisect_left(self.keys, key)
+        hi = bisect_right(self.keys, key, lo)
+        return bisect_left(self.rids, rid, lo, hi)
+
+    def _insert(self, rids):
+        for rid in rids:
+            key = self.record_keys[rid]
+            if key is not None:
+                pos = self._slot(key, rid)
+                self.keys.insert(pos, key)
+                self.rids.insert(pos, rid)
+
+    def _remove(self, rids):
+        for rid in rids:
+            key = self.record_keys[rid]
+            if key is None:
+                self.undated -= 1
+            else:
+                pos = self._slot(key, rid)
+                del self.keys[pos]
+                del self.rids[pos]
+            self.records[rid] = None
+
+    # ---------- kept current by mistake_store ----------
+    def apply(self, op, index, item):
+        if op == "add":
+            self.add(item)
+        elif op == "add_many":
+            for it in item:
+                self.add(it)
+        elif op == "edit":
+            self._remove(self.items[index])
+            self.items[index] = self._new_ids(item)
+            self._insert(self.items[index])
+        elif op == "delete":
+            self._remove(self.items.pop(index))
+
+    def add(self, item):
+        rids = self._new_ids(item)
+        self.items.append(rids)
+        self._insert(rids)
+
+    # ---------- queries ----------
+    def _range(self, start, end):
+        bounds = []
+        for value, default in ((start, 0), (end, len(self.keys))):
+            if value is None:
+                bounds.append(default)
+                continue
+            key = date_key(value)
+            if key is None:
+                raise ValueError(f"can't read date {value!r}")
+            bounds.append(bisect_left(self.keys, key))
+        return bounds
+
+    # record ids dated start <= date < end, oldest first; None leaves that side open
+    def between(self, start=None, end=None, limit=None):
+        lo, hi = self._range(start, end)
+        if limit is not None:
+            hi = min(hi, lo + limit)
+        return self.rids[lo:hi].tolist()
+
+    def latest(self, n):
+        return self.rids[max(len(self.rids) - n, 0):].tolist()[::-1]
+
+    def count_between(self, start=None, end=None):
+        lo, hi = self._range(start, end)
+        return max(hi - lo, 0)
+
+
+def date_index(path):
+    return get_index(path, "dates", DateIndex)
+
+
+# under the store lock, which writes hold while they move keys in the sorted arrays
+def records_between(path, start=None, end=None, limit=None):
+    with index_lock():
+        index = date_index(path)
+        return [index.records[rid] for rid in index.between(start, end, limit)]
+
+
+def latest_records(path, n):
+    with index_lock():
+        index = date_index(path)
+        return [index.records[rid] for rid in index.latest(n)]
@@ -0,0 +1,252 @@
+import random
+import re
+import zlib
+from functools import lru_cache
+
+from mistake_sqlite import split_tags
+from mistake_store import delete_from_db, edit_in_db, get_index, index_lock
+
+# Near-duplicate questions.  Each question is reduced to its set of words
+# (case folded, filler words dropped) and to a MinHash signature of that set;
+# the signature is cut into BANDS bands and every band is a key into a hash
+# table, so a new question is only compared with the records that share at
+# least one band with it instead of with the whole file.  Candidates are
+# then scored by the exact Jaccard similarity of the word sets.
+#
+#   find_duplicates(DB_FILE, "Formula of time constant")
+#     -> [(0.4, batch, record), ...]   best first
+#   merge_duplicates(DB_FILE, duplicate_groups(DB_FILE))
+#
+# With 20 bands of 3 rows a pair at similarity 0.4 shares a band 73% of the
+# time, one at 0.7 over 99%, and one at 0.1 about 2%.
+BANDS = 20
+ROWS = 3
+THRESHOLD = 0.4
+
+_PRIME = (1 << 61) - 1
+_rng = random.Random(20240101)  # fixed, so signatures are the same in every run
+_PERMS = [(_rng.randrange(1, _PRIME), _rng.randrange(_PRIME)) for _ in range(BANDS * ROWS)]
+_WORD = re.compile(r"\w+")
+STOP_WORDS = frozenset("a an and are as at be by for from how in is it of on or the to what when which why with".split())
+
+
+@lru_cache(maxsize=65536)  # the same question is logged again and again
+def words(text):
+    ws = frozenset(w for w in _WORD.findall(text.casefold()) if w not in STOP_WORDS)
+    return ws or frozenset(_WORD.findall(text.casefold()))
+
+
+@lru_cache(maxsize=65536)
+def bands(ws):
+    if not ws:
+        return ()
+    hashes = [zlib.crc32(w.encode("utf-8")) for w in ws]
+    sig = [min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMS]
+    return tuple(hash((i, tuple(sig[i * ROWS:(i + 1) * ROWS]))) for i in range(BANDS))
+
+
+def jaccard(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class DuplicateIndex:
+    def __init__(self, data=(), kind="batches"):
+        self.kind = kind
+        self.records = []    # record id -> (batch or None, record), None once removed
+        self.words = []      # record id -> word set
+        self.items = []      # position in the file -> [record ids]
+        self.buckets = {}    # band key -> [record ids]
+        for item in data:
+            self.add(item)
+
+    def _records_of(self, item):
+        if self.kind == "records":
+            return [(None, item)]
+        return [(item, r) for r in item.get("records", [])]
+
+    def _insert(self, item):
+        rids = []
+        for pair in self._records_of(item):
+            rid = len(self.records)
+            ws = words(pair[1].get("question") or "")
+            self.records.append(pair)
+            self.words.append(ws)
+            for key in bands(ws):
+                self.buckets.setdefault(key, []).append(rid)
+            rids.append(rid)
+        return rids
+
+    def _remove(self, rids):
+        # bucket entries are dropped lazily, see candidates()
+        for rid in rids:
+            self.records[rid] = None
+
+    # ---------- kept current by mistake_store ----------
+    def apply(self, op, index, item):
+        if op == "add":
+            self.add(item)
+        elif op == "add_many":
+            for it in item:
+                self.add(it)
+        elif op == "edit":
+            self._remove(self.items[index])
+            self.items[index] = self._insert(item)
+        elif op == "delete":
+            self._remove(self.items.pop(index))
+
+    def add(self, item):
+        self.items.append(self._insert(item))
+
+    # ---------- queries ----------
+    def candidates(self, ws):
+        found = set()
+        for key in bands(ws):
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                continue
+            live = [rid for rid in bucket if self.records[rid] is not None]
+            if len(live) != len(bucket):
+                self.buckets[key] = live
+            found.update(live)
+        return found
+
+    # [(similarity, record id), ...] best first
+    def similar(self, question, threshold=THRESHOLD, limit=None, exclude=None):
+        ws = words(question)
+        scored = []
+        for rid in self.candidates(ws):
+            if rid == exclude:
+                continue
+            score = jaccard(ws, self.words[rid])
+            if score >= threshold:
+                scored.append((score, rid))
+        scored.sort(key=lambda s: (-s[0], s[1]))
+        return scored[:limit] if limit is not None else scored
+
+    # lists of record ids that look like the same question, oldest first
+    def groups(self, threshold=THRESHOLD):
+        parent = {}
+
+        def root(x):
+            while parent.get(x, x) != x:
+                parent[x] = parent.get(parent[x], parent[x])
+                x = parent[x]
+            return x
+
+        for rid, pair in enumerate(self.records):
+            if pair is None:
+                continue
+            for score, other in self.similar(pair[1].get("question") or "", threshold, exclude=rid):
+                ra, rb = root(rid), root(other)
+                if ra != rb:
+                    parent[max(ra, rb)] = min(ra, rb)
+        out = {}
+        for rid in parent:
+            out.setdefault(root(rid), []).append(rid)
+        return [sorted(set(g) | {r}) for r, g in sorted(out.items())]
+
+    # position in the file and position within the batch of every live record
+    def locations(self):
+        where = {}
+        for pos, rids in enumerate(self.items):
+            for j, rid in enumerate(rids):
+                where[rid] = (pos, j)
+        return where
+
+
+def duplicate_index(path):
+    return get_index(path, "duplicates", DuplicateIndex)
+
+
+def find_duplicates(path, question, threshold=THRESHOLD, limit=None):
+    with index_lock():
+        index = duplicate_index(path)
+        return [(score, *index.records[rid]) for score, rid in index.similar(question, threshold, limit)]
+
+
+# the tooltip the entry windows show on a flagged row
+def duplicates_note(dupes):
+    return "Looks like a saved mistake:\n" + "\n".join(
+        f"[{b['title']}] {r.get('question', '')} ({score:.0%})" for score, b, r in dupes)
+
+
+def duplicate_groups(path, threshold=THRESHOLD):
+    with index_lock():
+        return duplicate_index(path).groups(threshold)
+
+
+# (index, groups, [[(batch or None, record), ...] per group]): what a window
+# shows before asking to merge; pass index and groups on to merge_duplicates
+def duplicate_report(path, threshold=THRESHOLD):
+    with index_lock():
+        index = duplicate_index(path)
+        groups = index.groups(threshold)
+        return index, groups, [[index.records[rid] for rid in group] for group in groups]
+
+
+# ----------------- merging -----------------
+def _merged(keeper, others):
+    tags, reasons = [], []
+    for rec in [keeper] + others:
+        for t in split_tags(rec):
+            if t.casefold() not in (x.casefold() for x in tags):
+                tags.append(t)
+        reason = (rec.get("reason") or "").strip()
+        if reason and reason not in reasons:
+            reasons.append(reason)
+    out = dict(keeper)
+    if "tags" in keeper:
+        out["tags"] = tags
+    else:
+        out["tag"] = ",".join(tags)
+    if reasons:
+        out["reason"] = "; ".join(reasons)
+    return out
+
+
+# Keep the oldest record of every group, give it the tags and reasons of the
+# others and drop the others; batches left empty are deleted.  Goes through
+# edit_in_db/delete_from_db, so other windows' saves in between are rebased
+# around rather than overwritten.  Pass the index the groups came from if
+# the file may have been reloaded since.  Returns the number of records removed.
+def merge_duplicates(path, groups, index=None):
+    with index_lock():
+        return _merge(path, groups, duplicate_index(path) if index is None else index)
+
+
+def _merge(path, groups, index):
+    where = index.locations()
+    records_kind = index.kind == "records"
+    replace, drop = {}, set()   # record id -> merged record / record ids removed
+    for group in groups:
+        group = [rid for rid in group if rid in where]
+        if len(group) < 2:
+            continue
+        keeper, others = group[0], group[1:]
+        replace[keeper] = _merged(index.records[keeper][1], [index.records[r][1] for r in others])
+        drop.update(others)
+
+    changed = {}   # position -> new item, or None to delete it
+    for rid in list(replace) + list(drop):
+        pos, _ = where[rid]
+        if pos in changed:
+            continue
+        if records_kind:
+            changed[pos] = None if rid in drop else replace[rid]
+            continue
+        batch = index.records[index.items[pos][0]][0]
+        recs = [replace.get(r, index.records[r][1]) for r in index.items[pos] if r not in drop]
+        changed[pos] = dict(batch, records=recs) if recs else None
+
+    # what every position looked like when the index was built; each write
+    # looks its item up again by this, in case the file moved on since
+    seen = {pos: (index.records[index.items[pos][0]][1] if records_kind
+                  else index.records[index.items[pos][0]][0]) for pos in changed}
+    for pos in sorted(changed, reverse=True):
+        if changed[pos] is None:
+            delete_from_db(path, pos, expect=seen[pos])
+        else:
+            edit_in_db(path, pos, changed[pos], expect=seen[pos])
+    return len(drop)
@@ -0,0 +1,131 @@
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from openpyxl import Workbook
+
+from mistake_store import address, configure, count_items, iter_db, settings
+from mistake_trace import traced
+from mistake_workers import check_cancelled, progress
+
+# Excel export of a whole mistake file.  Items are decoded one at a time
+# (store.iter_db, which never loads the file whole) and appended to an
+# openpyxl write-only workbook, which streams its rows to temp files, so
+# memory stays flat however many records there are:
+#
+#   export_excel(DB_FILE, "all.xlsx")                    # one flat sheet
+#   export_excel(DB_FILE, "all.xlsx", layout="sheets")   # one sheet per batch
+#   export_excel(DB_FILE, "week.xlsx", positions=[3, 4, 9])
+#   export_excel_split(DB_FILE, "all.xlsx", parts=4)     # all_1.xlsx .. all_4.xlsx, in parallel
+#
+# The workbook is written next to `out` and renamed over it at the end, so a
+# failed or cancelled export leaves no half-written file.
+BATCH_HEADER = ["Batch Title", "Date", "Question", "Reason", "Tag"]
+SHEET_HEADER = ["Question", "Reason", "Tag"]
+RECORD_HEADER = ["Question", "Type", "Reason", "Tags", "Date"]
+SHEET_TITLE_MAX = 31
+PROGRESS_EVERY = 64   # items between progress reports
+_BAD_TITLE = re.compile(r"[\[\]:*?/\\]")
+
+
+def _record_row(rec):
+    tags = rec.get("tags")
+    return [rec.get("question", ""), rec.get("type", ""), rec.get("reason", ""),
+            ", ".join(tags) if isinstance(tags, list) else tags or "", rec.get("date", "")]
+
+
+# Excel sheet names: at most 31 characters, none of []:*?/\, unique ignoring case
+def _sheet_title(title, used):
+    base = _BAD_TITLE.sub("_", title or "").strip("'")[:SHEET_TITLE_MAX] or "Batch"
+    name, n = base, 1
+    while name.lower() in used:
+        n += 1
+        suffix = f" ({n})"
+        name = base[:SHEET_TITLE_MAX - len(suffix)] + suffix
+    used.add(name.lower())
+    return name
+
+
+def _save(wb, out):
+    tmp = out + ".tmp"
+    wb.save(tmp)
+    os.replace(tmp, out)
+
+
+@traced("export.records_xlsx")
+def write_records_xlsx(records, out):
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Records")
+    ws.append(SHEET_HEADER)
+    for r in records:
+        ws.append([r.get("question", ""), r.get("reason", ""), r.get("tag", "")])
+    _save(wb, out)
+    return out
+
+
+@traced("export.excel")
+def export_excel(path, out, layout="flat", positions=None):
+    if layout not in ("flat", "sheets"):
+        raise ValueError(f"unknown layout {layout!r}, expected 'flat' or 'sheets'")
+    records_file = settings(path)[1] == "records"
+    if layout == "sheets" and records_file:
+        raise ValueError("one sheet per batch needs a batches file")
+    if positions is None:
+        positions = range(count_items(path))
+
+    wb = Workbook(write_only=True)
+    if layout == "flat":
+        ws = wb.create_sheet("Mistakes")
+        ws.append(RECORD_HEADER if records_file else BATCH_HEADER)
+    used = set()
+    rows = 0
+    for n, item in enumerate(iter_db(path, positions)):
+        if n % PROGRESS_EVERY == 0:
+            progress(n, len(positions))
+        if records_file:
+            ws.append(_record_row(item))
+            rows += 1
+            continue
+        if layout == "sheets":
+            ws = wb.create_sheet(_sheet_title(item.get("title"), used))
+            ws.append(SHEET_HEADER)
+        for r in item.get("records", []):
+            if layout == "sheets":
+                ws.append([r.get("question", ""), r.get("reason", ""), r.get("tag", "")])
+            else:
+                ws.append([item.get("title", ""), item.get("date", ""), r.get("question", ""),
+                           r.get("reason", ""), r.get("tag", "")])
+            rows += 1
+    if not wb.sheetnames:
+        wb.create_sheet("Mistakes")  # nothing selected; a workbook needs a sheet
+    check_cancelled()
+    _save(wb, out)
+    progress(len(positions), len(positions))
+    return rows
+
+
+# runs in a child process, which starts without the parent's configure()
+def _export_part(path, backend, kind, server, out, layout, lo, hi):
+    configure(path, backend=backend, kind=kind, address=server)
+    return export_excel(path, out, layout, range(lo, hi))
+
+
+@traced("export.excel_split")
+def export_excel_split(path, out, parts, layout="flat", processes=None):
+    n = count_items(path)
+    backend, kind = settings(path)
+    root, ext = os.path.splitext(out)
+    bounds = [n * k // parts for k in range(parts + 1)]
+    files = [f"{root}_{k + 1}{ext or '.xlsx'}" for k in range(parts)]
+    with ProcessPoolExecutor(processes) as pool:
+        futures = [pool.submit(_export_part, path, backend, kind, address(path), files[k], layout, bounds[k], bounds[k + 1])
+                   for k in range(parts)]
+        try:
+            for done, future in enumerate(as_completed(futures), start=1):
+                future.result()
+                progress(done, parts)
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+    return files
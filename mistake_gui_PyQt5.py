@@ -1,73 +1,58 @@
-from PyQt5 import QtWidgets
+from PyQt5 import QtWidgets, QtCore
 from PyQt5.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit,
-    QPushButton, QTableWidget, QTableWidgetItem, QMessageBox, QInputDialog,
-    QDialog, QListWidget, QTextEdit
+    QPushButton, QTableView, QMessageBox, QInputDialog,
+    QDialog, QListWidget, QTextEdit, QFileDialog
 )
-import sys
-import json
 import os
+import sys
 from datetime import datetime
-import pandas as pd
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
+from mistake_dupes import duplicate_report, duplicates_note, find_duplicates, merge_duplicates
+from mistake_export import export_excel, write_records_xlsx
+from mistake_import import import_paths
+from mistake_qt_debug import install_debug_panel
+from mistake_qt_models import BatchSource, RecordFilterProxy, RecordTableModel
+from mistake_qt_review import ReviewDialog
+from mistake_qt_workers import QtWorkers, run_with_progress
+from mistake_search import search
+from mistake_sheets import open_worksheet, sync_to_sheet
+from mistake_tags import tag_matches
+from mistake_snapshot import snapshot_rows
+from mistake_store import ConflictError, configure, generation, add_to_db, delete_from_db
+from mistake_trace import span, traced
 
 DB_FILE = "mistake_db.json"
 GSHEET_CREDENTIALS = "credentials.json"  # service account JSON
 GSHEET_NAME = "Mistake Tracker"          # Google Sheet name
-
-# ----------------- helpers -----------------
-def load_db():
-    if not os.path.exists(DB_FILE):
-        return []
-    with open(DB_FILE, "r", encoding="utf-8") as f:
-        return json.load(f)
-
-def save_db(data):
-    with open(DB_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=4, ensure_ascii=False)
+SERVER = os.environ.get("MISTAKE_SERVER")  # e.g. http://127.0.0.1:8765, see mistake_server.py
+configure(DB_FILE, backend="remote" if SERVER else "journal", address=SERVER)  # or "json", "sqlite", "binary"
 
 # ----------------- Google Sheets -----------------
-def upload_batches_to_sheet():
-    db = load_db()
-    try:
-        scope = ["https://spreadsheets.google.com/feeds",
-                 "https://www.googleapis.com/auth/drive"]
-        creds = ServiceAccountCredentials.from_json_keyfile_name(GSHEET_CREDENTIALS, scope)
-        client = gspread.authorize(creds)
-        sheet = client.open(GSHEET_NAME).sheet1
-        sheet.clear()
-        sheet.append_row(["Batch Title", "Date", "Question", "Reason", "Tag"])
-        for batch in db:
-            for rec in batch["records"]:
-                sheet.append_row([batch["title"], batch["date"], rec["question"], rec["reason"], rec["tag"]])
-        QMessageBox.information(None, "Success", "All batches uploaded to Google Sheets!")
-    except Exception as e:
-        QMessageBox.critical(None, "Error", f"Failed to upload: {e}")
+def upload_batches_to_sheet(workers, parent=None):
+    # only batches changed since the last sync are sent, a few requests in all
+    def done(stats):
+        QMessageBox.information(parent, "Success", f"Google Sheets is up to date "
+                                f"({stats['batches']} batches, {stats['rows']} rows sent).")
+
+    run_with_progress(parent, workers, "Sync to Google Sheets",
+                      lambda: sync_to_sheet(DB_FILE, open_worksheet(GSHEET_CREDENTIALS, GSHEET_NAME)),
+                      on_done=done, write=GSHEET_NAME)  # one sync at a time
 
 # ----------------- Excel export -----------------
-def export_batch_to_excel(table):
-    if table.rowCount() == 0:
-        QMessageBox.information(None, "No records", "No records to export.")
+def export_batch_to_excel(model, workers, parent=None):
+    if not len(model):
+        QMessageBox.information(parent, "No records", "No records to export.")
         return
 
-    title, ok = QInputDialog.getText(None, "Batch Title", "Enter title for this batch:")
+    title, ok = QInputDialog.getText(parent, "Batch Title", "Enter title for this batch:")
     if not ok or not title.strip():
-        QMessageBox.warning(None, "Title required", "Batch title cannot be empty.")
+        QMessageBox.warning(parent, "Title required", "Batch title cannot be empty.")
         return
     title = title.strip()
 
-    data = []
-    for r in range(table.rowCount()):
-        question = table.item(r, 0).text() if table.item(r,0) else ""
-        reason = table.item(r, 1).text() if table.item(r,1) else ""
-        tag = table.item(r, 2).text() if table.item(r,2) else ""
-        data.append({"Question": question, "Reason": reason, "Tag": tag})
-
-    df = pd.DataFrame(data)
-    filename = f"{title}_{pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-    df.to_excel(filename, index=False)
-    QMessageBox.information(None, "Exported", f"Batch exported to '{filename}' successfully.")
+    filename = f"{title}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
+    run_with_progress(parent, workers, "Export to Excel", write_records_xlsx, model.records(), filename,
+                      on_done=lambda name: QMessageBox.information(parent, "Exported", f"Batch exported to '{name}' successfully."))
 
 # ----------------- Main Window -----------------
 class MainWindow(QWidget):
@@ -75,7 +60,9 @@ class MainWindow(QWidget):
         super().__init__()
         self.setWindowTitle("Mistake Tracker (PyQt)")
         self.resize(800, 520)
+        self.workers = QtWorkers(parent=self)  # saves and exports run off the GUI thread
         self.init_ui()
+        install_debug_panel(self)  # Ctrl+Shift+D: latencies per operation
 
     def init_ui(self):
         main_layout = QVBoxLayout()
@@ -107,8 +94,16 @@ class MainWindow(QWidget):
         main_layout.addLayout(btn_layout)
 
         # Table
-        self.table = QTableWidget(0, 3)
-        self.table.setHorizontalHeaderLabels(["Question", "Reason", "Tag"])
+        self.model = RecordTableModel(editable=True, workers=self.workers)
+        self.proxy = RecordFilterProxy()
+        self.proxy.setSourceModel(self.model)
+        self.filter_input = QLineEdit(); self.filter_input.setPlaceholderText("Filter rows")
+        self.filter_input.textChanged.connect(self.proxy.set_filter)
+        main_layout.addWidget(self.filter_input)
+        self.table = QTableView()
+        self.table.setModel(self.proxy)
+        self.table.horizontalHeader().setSortIndicator(-1, QtCore.Qt.AscendingOrder)
+        self.table.setSortingEnabled(True)
         self.table.horizontalHeader().setStretchLastSection(True)
         self.table.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectRows)
         main_layout.addWidget(self.table)
@@ -120,14 +115,20 @@ class MainWindow(QWidget):
         view_batches_btn = QPushButton("View Batches")
         view_batches_btn.clicked.connect(self.open_view_batches)
         export_btn = QPushButton("Export to Excel")
-        export_btn.clicked.connect(lambda: export_batch_to_excel(self.table))
+        export_btn.clicked.connect(lambda: export_batch_to_excel(self.model, self.workers, self))
+        import_btn = QPushButton("Import Quiz Files")
+        import_btn.clicked.connect(self.import_quiz_files)
+        review_btn = QPushButton("Review Due")
+        review_btn.clicked.connect(lambda: ReviewDialog(self, DB_FILE).exec_())
         sync_btn = QPushButton("Sync to Google Sheets")
-        sync_btn.clicked.connect(upload_batches_to_sheet)
+        sync_btn.clicked.connect(lambda: upload_batches_to_sheet(self.workers, self))
         exit_btn = QPushButton("Exit")
         exit_btn.clicked.connect(self.close)
         bottom_layout.addWidget(save_batch_btn)
         bottom_layout.addWidget(view_batches_btn)
         bottom_layout.addWidget(export_btn)
+        bottom_layout.addWidget(import_btn)
+        bottom_layout.addWidget(review_btn)
         bottom_layout.addWidget(sync_btn)
         bottom_layout.addWidget(exit_btn)
         main_layout.addLayout(bottom_layout)
@@ -142,11 +143,13 @@ class MainWindow(QWidget):
         if not q:
             QMessageBox.warning(self, "Input required", "Please enter a question/description.")
             return
-        row = self.table.rowCount()
-        self.table.insertRow(row)
-        self.table.setItem(row, 0, QTableWidgetItem(q))
-        self.table.setItem(row, 1, QTableWidgetItem(reason))
-        self.table.setItem(row, 2, QTableWidgetItem(tag))
+        # add to table; questions that look like ones already saved are flagged
+        # when the lookup comes back from the workers
+        record = {"question": q, "reason": reason, "tag": tag}
+        self.model.append(record)
+        self.workers.submit(find_duplicates, DB_FILE, q, limit=3,
+                            on_done=lambda dupes: dupes and self.model.set_note(record, duplicates_note(dupes)))
+
         self.q_input.clear()
         self.reason_input.clear()
         self.tag_input.clear()
@@ -156,19 +159,18 @@ class MainWindow(QWidget):
         if not selected:
             QMessageBox.information(self, "No selection", "Select a row to delete.")
             return
-        for idx in sorted([r.row() for r in selected], reverse=True):
-            self.table.removeRow(idx)
+        self.model.remove_rows(self.proxy.source_rows(selected))
 
     def clear_table(self):
-        cnt = self.table.rowCount()
+        cnt = len(self.model)
         if cnt == 0:
             return
         if QMessageBox.question(self, "Confirm", f"Clear all {cnt} records?") == QMessageBox.Yes:
-            self.table.setRowCount(0)
+            self.model.clear()
 
     # ----------------- Save Batch -----------------
     def save_batch(self):
-        if self.table.rowCount() == 0:
+        if not len(self.model):
             QMessageBox.information(self, "No records", "No records to save.")
             return
 
@@ -197,17 +199,32 @@ class MainWindow(QWidget):
 
         # Create batch
         batch = {"title": title, "date": date_str, "records": []}
-        for r in range(self.table.rowCount()):
-            q = self.table.item(r, 0).text() if self.table.item(r,0) else ""
-            reason = self.table.item(r, 1).text() if self.table.item(r,1) else ""
-            tag = self.table.item(r, 2).text() if self.table.item(r,2) else ""
-            batch["records"].append({"question": q, "reason": reason, "tag": tag})
-
-        db = load_db()
-        db.append(batch)
-        save_db(db)
-        QMessageBox.information(self, "Saved", f"Saved batch '{title}' with {len(batch['records'])} records.")
-        self.table.setRowCount(0)
+        for r in self.model.records():
+            batch["records"].append({"question": r["question"], "reason": r["reason"], "tag": r["tag"]})
+
+        # saves queued on DB_FILE commit one after another, in the order they were made
+        self.workers.submit(
+            add_to_db, DB_FILE, batch, write=DB_FILE,
+            on_done=lambda _: QMessageBox.information(self, "Saved", f"Saved batch '{title}' with {len(batch['records'])} records."),
+            on_error=lambda e: QMessageBox.critical(self, "Error", f"Failed to save batch '{title}': {e}"))
+        self.model.clear()
+
+    def closeEvent(self, event):
+        self.workers.shutdown()  # let queued saves reach the file
+        super().closeEvent(event)
+
+    # quiz result spreadsheets / JSON straight into saved batches, one per file
+    def import_quiz_files(self):
+        files, _ = QFileDialog.getOpenFileNames(self, "Import Quiz Files", "", "Quiz files (*.xlsx *.xlsm *.json)")
+        if not files:
+            return
+
+        def done(stats):
+            QMessageBox.information(self, "Imported", f"Imported {stats['records']} records in {stats['batches']} batches"
+                                    f" ({stats['skipped']} already saved, {stats['rate']:.0f} records/s).")
+
+        run_with_progress(self, self.workers, "Import Quiz Files", import_paths, DB_FILE, files,
+                          on_done=done, write=DB_FILE)
 
     def open_view_batches(self):
         dialog = ViewBatchesDialog(self)
@@ -219,59 +236,214 @@ class ViewBatchesDialog(QDialog):
         super().__init__(parent)
         self.setWindowTitle("View Saved Batches")
         self.resize(700, 420)
-        self.db = load_db()
-        self.init_ui()
+        self.workers = parent.workers  # lookups and writes run off the GUI thread
+        with span("viewer.open"):
+            self.generation = generation(DB_FILE)  # read first, so later writes by others show as newer
+            self.headers = snapshot_rows(DB_FILE, self.workers)  # the headers until a snapshot is built
+            self.init_ui()
 
     def init_ui(self):
         layout = QHBoxLayout()
         left_layout = QVBoxLayout()
         self.list_widget = QListWidget()
-        for b in self.db:
-            self.list_widget.addItem(f"{b['title']}  ({b['date']})  [{len(b['records'])} recs]")
+        for h in self.headers:
+            self.list_widget.addItem(f"{h['title']}  ({h['date']})  [{h['count']} recs]")
         self.list_widget.currentRowChanged.connect(self.display_selected_batch)
         left_layout.addWidget(QLabel("Saved Batches:"))
         left_layout.addWidget(self.list_widget)
         btn_del = QPushButton("Delete Selected Batch")
         btn_del.clicked.connect(self.delete_selected_batch)
         left_layout.addWidget(btn_del)
+
+        btn_dupes = QPushButton("Merge Duplicates")
+        btn_dupes.clicked.connect(self.merge_duplicate_records)
+        left_layout.addWidget(btn_dupes)
+
+        btn_export = QPushButton("Export All to Excel")
+        btn_export.clicked.connect(self.export_all)
+        left_layout.addWidget(btn_export)
         layout.addLayout(left_layout, 2)
 
         right_layout = QVBoxLayout()
         right_layout.addWidget(QLabel("Batch Details:"))
+        filter_layout = QHBoxLayout()
+        self.tag_query_input = QLineEdit()
+        self.tag_query_input.setPlaceholderText("Tag filter, e.g. physics AND Easy AND NOT Theoretical")
+        self.tag_query_input.returnPressed.connect(self.filter_by_tags)
+        filter_btn = QPushButton("Filter")
+        filter_btn.clicked.connect(self.filter_by_tags)
+        filter_layout.addWidget(self.tag_query_input)
+        filter_layout.addWidget(filter_btn)
+        right_layout.addLayout(filter_layout)
+        search_layout = QHBoxLayout()
+        self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText("Search questions and reasons")
+        self.search_input.returnPressed.connect(self.search_records)
+        search_btn = QPushButton("Search")
+        search_btn.clicked.connect(self.search_records)
+        search_layout.addWidget(self.search_input)
+        search_layout.addWidget(search_btn)
+        right_layout.addLayout(search_layout)
+        # the selected batch, as a paged table
+        self.batch_label = QLabel("")
+        right_layout.addWidget(self.batch_label)
+        self.batch_filter_input = QLineEdit()
+        self.batch_filter_input.setPlaceholderText("Filter records in this batch")
+        right_layout.addWidget(self.batch_filter_input)
+        self.batch_model = RecordTableModel(workers=self.workers)
+        self.batch_proxy = RecordFilterProxy()
+        self.batch_proxy.setSourceModel(self.batch_model)
+        self.batch_filter_input.textChanged.connect(self.batch_proxy.set_filter)
+        self.batch_view = QTableView()
+        self.batch_view.setModel(self.batch_proxy)
+        self.batch_view.horizontalHeader().setSortIndicator(-1, QtCore.Qt.AscendingOrder)
+        self.batch_view.setSortingEnabled(True)
+        self.batch_view.horizontalHeader().setStretchLastSection(True)
+        right_layout.addWidget(self.batch_view)
+        # tag filter, search and duplicate results
         self.detail_text = QTextEdit()
         self.detail_text.setReadOnly(True)
+        self.detail_text.hide()
         right_layout.addWidget(self.detail_text)
         layout.addLayout(right_layout, 3)
 
         self.setLayout(layout)
-        if self.db:
+        if self.headers:
             self.list_widget.setCurrentRow(0)
 
+    @traced("viewer.display_batch")
     def display_selected_batch(self, index):
-        if index < 0 or index >= len(self.db):
-            self.detail_text.clear()
+        self.show_text(False)
+        if index < 0 or index >= len(self.headers):
+            self.batch_label.clear()
+            self.batch_model.clear()
+            return
+        h = self.headers[index]
+        self.batch_label.setText(f"Title: {h['title']}    Date: {h['date']}    Records: {h['count']}")
+        self.batch_view.horizontalHeader().setSortIndicator(-1, QtCore.Qt.AscendingOrder)
+        self.batch_model.set_source(BatchSource(self.headers, index))  # paged in from the store as it scrolls
+
+    # switch the right side between the batch table and the text results
+    def show_text(self, on):
+        self.detail_text.setVisible(on)
+        for w in (self.batch_label, self.batch_filter_input, self.batch_view):
+            w.setVisible(not on)
+
+    # show every saved record whose tags match the filter expression
+    def filter_by_tags(self):
+        expr = self.tag_query_input.text().strip()
+        if not expr:
+            self.display_selected_batch(self.list_widget.currentRow())
+            return
+
+        def show(result):
+            n, matches = result
+            lines = [f"Tag filter: {expr}", f"Matches: {n}", "-"*40]
+            for i, (b, r) in enumerate(matches, start=1):
+                lines.append(f"{i}. [{b['title']}] Q: {r.get('question','')}")
+                lines.append(f"    Reason: {r.get('reason','')}")
+                lines.append(f"    Tag: {r.get('tag','')}")
+            self.show_text(True)
+            self.detail_text.setPlainText("\n".join(lines))
+        self.workers.submit(tag_matches, DB_FILE, expr, 1000, on_done=show,
+                            on_error=lambda e: QMessageBox.warning(self, "Tag filter", str(e)))
+
+    # best matches for the search text, ranked by BM25
+    def search_records(self):
+        query = self.search_input.text().strip()
+        if not query:
+            self.display_selected_batch(self.list_widget.currentRow())
             return
-        b = self.db[index]
-        lines = [f"Title: {b['title']}", f"Date: {b['date']}", f"Records: {len(b['records'])}", "-"*40]
-        for i, r in enumerate(b['records'], start=1):
-            lines.append(f"{i}. Q: {r.get('question','')}")
-            lines.append(f"    Reason: {r.get('reason','')}")
-            lines.append(f"    Tag: {r.get('tag','')}")
-        self.detail_text.setPlainText("\n".join(lines))
+
+        def show(hits):
+            lines = [f"Search: {query}", f"Top {len(hits)} matches", "-"*40]
+            for i, (score, b, r) in enumerate(hits, start=1):
+                lines.append(f"{i}. [{b['title']}] Q: {r.get('question','')}  ({score:.2f})")
+                lines.append(f"    Reason: {r.get('reason','')}")
+                lines.append(f"    Tag: {r.get('tag','')}")
+            self.show_text(True)
+            self.detail_text.setPlainText("\n".join(lines))
+        self.workers.submit(search, DB_FILE, query, k=50, on_done=show,
+                            on_error=lambda e: QMessageBox.critical(self, "Search", str(e)))
 
     def delete_selected_batch(self):
         idx = self.list_widget.currentRow()
         if idx < 0:
             QMessageBox.information(self, "Select", "Choose a batch to delete.")
             return
-        b = self.db[idx]
-        if QMessageBox.question(self, "Confirm Delete", f"Delete batch '{b['title']}'? This cannot be undone.") == QMessageBox.Yes:
-            del self.db[idx]
-            save_db(self.db)
-            self.list_widget.takeItem(idx)
-            self.detail_text.clear()
+        b = self.headers[idx]
+        if QMessageBox.question(self, "Confirm Delete", f"Delete batch '{b['title']}'? This cannot be undone.") != QMessageBox.Yes:
+            return
+
+        def deleted(_):
+            if generation(DB_FILE) == self.generation + 1:
+                self.generation += 1
+                del self.headers[idx]
+                self.list_widget.takeItem(idx)
+            else:
+                self.refresh_list()  # others saved in the meantime
+            self.display_selected_batch(self.list_widget.currentRow())
             QMessageBox.information(self, "Deleted", "Batch removed.")
 
+        def failed(e):
+            if isinstance(e, ConflictError):
+                QMessageBox.warning(self, "Changed", "This batch was changed or deleted by another window.")
+                self.refresh_list()
+            else:
+                QMessageBox.critical(self, "Error", f"Failed to delete batch '{b['title']}': {e}")
+        self.workers.submit(delete_from_db, DB_FILE, idx, expect=b, generation=self.generation, write=DB_FILE,
+                            on_done=deleted, on_error=failed)
+
+    # list likely duplicate questions and offer to fold each group into its oldest record
+    def merge_duplicate_records(self):
+        self.workers.submit(duplicate_report, DB_FILE, on_done=self.offer_merge,
+                            on_error=lambda e: QMessageBox.critical(self, "Duplicates", str(e)))
+
+    def offer_merge(self, report):
+        index, groups, records = report
+        if not groups:
+            QMessageBox.information(self, "Duplicates", "No likely duplicates found.")
+            return
+        lines = [f"Likely duplicates: {len(groups)} groups", "-"*40]
+        for i, group in enumerate(records, start=1):
+            for b, r in group:
+                lines.append(f"{i}. [{b['title']}] Q: {r.get('question','')}")
+            lines.append("")
+        self.show_text(True)
+        self.detail_text.setPlainText("\n".join(lines))
+        extra = sum(len(g) - 1 for g in groups)
+        if QMessageBox.question(self, "Merge Duplicates", f"Merge {extra} records into the oldest one of their group?") != QMessageBox.Yes:
+            return
+
+        def merged(removed):
+            self.refresh_list()
+            QMessageBox.information(self, "Merged", f"Removed {removed} duplicate records.")
+
+        def failed(e):
+            self.refresh_list()
+            if isinstance(e, ConflictError):
+                QMessageBox.warning(self, "Changed", "Some batches were changed by another window, merge stopped.")
+            else:
+                QMessageBox.critical(self, "Error", f"Merge failed: {e}")
+        self.workers.submit(merge_duplicates, DB_FILE, groups, index, write=DB_FILE, on_done=merged, on_error=failed)
+
+    # every saved batch, one sheet each, streamed from the store on a worker
+    def export_all(self):
+        if not len(self.headers):
+            QMessageBox.information(self, "No batches", "No saved batches to export.")
+            return
+        filename = f"mistakes_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
+        run_with_progress(self, self.workers, "Export to Excel", export_excel, DB_FILE, filename,
+                          layout="sheets",
+                          on_done=lambda n: QMessageBox.information(self, "Exported", f"{n} records exported to '{filename}'."))
+
+    def refresh_list(self):
+        self.generation = generation(DB_FILE)
+        self.headers = snapshot_rows(DB_FILE, self.workers)
+        self.list_widget.clear()
+        for h in self.headers:
+            self.list_widget.addItem(f"{h['title']}  ({h['date']})  [{h['count']} recs]")
+
 # ----------------- run -----------------
 def main():
     app = QApplication(sys.argv)
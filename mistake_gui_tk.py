@@ -1,23 +1,21 @@
+import os
 import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog
-import json
-import os
 from datetime import datetime
+from itertools import chain
+from mistake_dupes import duplicate_report, find_duplicates, merge_duplicates
+from mistake_search import search
+from mistake_tags import tag_matches
+from mistake_snapshot import snapshot_rows
+from mistake_store import ConflictError, configure, generation, add_to_db, delete_from_db
+from mistake_tk_review import ReviewWindow
+from mistake_tk_views import VirtualTree, fill_text
+from mistake_trace import span, traced
+from mistake_workers import TkWorkers
 
 DB_FILE = "mistake_db.json"
-
-
-# ------------------ Helpers ------------------
-def load_db():
-    if not os.path.exists(DB_FILE):
-        return []
-    with open(DB_FILE, "r") as f:
-        return json.load(f)
-
-
-def save_db(data):
-    with open(DB_FILE, "w") as f:
-        json.dump(data, f, indent=4)
+SERVER = os.environ.get("MISTAKE_SERVER")  # e.g. http://127.0.0.1:8765, see mistake_server.py
+configure(DB_FILE, backend="remote" if SERVER else "journal", address=SERVER)  # or "json", "sqlite", "binary"
 
 
 # ------------------ Main GUI ------------------
@@ -27,6 +25,7 @@ class MistakeApp:
         root.title("Mistake Tracker - Tkinter")
         root.geometry("850x520")
         root.configure(bg="#f1f1f1")
+        self.workers = TkWorkers(root)  # saves run off the GUI thread
 
         self.create_widgets()
 
@@ -72,19 +71,26 @@ class MistakeApp:
             self.table.heading(col, text=col.title(), anchor="center")
             self.table.column(col, anchor="center", width=200)
 
+        self.table.tag_configure("duplicate", background="#fff3cd")
         self.table.pack(pady=10)
 
+        self.status = tk.Label(self.root, text="", bg="#f1f1f1", fg="#8a6d3b")
+        self.status.pack()
+
         # ---------- Bottom Buttons ----------
         bottom_frame = tk.Frame(self.root, bg="#f1f1f1")
         bottom_frame.pack(pady=5)
 
         save_btn = tk.Button(bottom_frame, text="Save Batch", width=20, command=self.save_batch)
         view_btn = tk.Button(bottom_frame, text="View Saved Batches", width=20, command=self.view_batches)
+        review_btn = tk.Button(bottom_frame, text="Review Due", width=20,
+                               command=lambda: ReviewWindow(self.root, self.workers, DB_FILE))
         exit_btn = tk.Button(bottom_frame, text="Exit", width=20, command=self.root.quit)
 
         save_btn.grid(row=0, column=0, padx=10)
         view_btn.grid(row=0, column=1, padx=10)
-        exit_btn.grid(row=0, column=2, padx=10)
+        review_btn.grid(row=0, column=2, padx=10)
+        exit_btn.grid(row=0, column=3, padx=10)
 
     # ---------- Add record ----------
     def add_record(self):
@@ -96,13 +102,25 @@ class MistakeApp:
             messagebox.showwarning("Input Required", "Question cannot be empty.")
             return
 
-        self.table.insert("", "end", values=(q, reason, tag))
+        # questions that look like ones already saved are flagged when the
+        # lookup comes back from the workers
+        row = self.table.insert("", "end", values=(q, reason, tag))
+        self.status.config(text="")
+        self.workers.submit(find_duplicates, DB_FILE, q, limit=3,
+                            on_done=lambda dupes: self.flag_duplicate(row, dupes))
 
         self.q_entry.delete(0, tk.END)
         self.reason_entry.delete(0, tk.END)
         self.tag_entry.delete(0, tk.END)
         self.q_entry.focus()
 
+    def flag_duplicate(self, row, dupes):
+        if not dupes or not self.table.exists(row):
+            return
+        self.table.item(row, tags=("duplicate",))
+        self.status.config(text="Looks like a saved mistake: " + "; ".join(
+            f"[{b['title']}] {r['question']} ({score:.0%})" for score, b, r in dupes))
+
     # ---------- Delete selected row ----------
     def delete_record(self):
         sel = self.table.selection()
@@ -143,22 +161,25 @@ class MistakeApp:
                 "tag": self.table.item(row, "values")[2]
             })
 
-        db = load_db()
-        db.append(batch)
-        save_db(db)
-
-        messagebox.showinfo("Saved", f"Batch '{title}' saved successfully.")
+        # saves queued on DB_FILE commit one after another, in the order they were made
+        self.workers.submit(
+            add_to_db, DB_FILE, batch, write=DB_FILE,
+            on_done=lambda _: messagebox.showinfo("Saved", f"Batch '{title}' saved successfully."),
+            on_error=lambda e: messagebox.showerror("Error", f"Failed to save batch '{title}': {e}"))
         self.clear_table()
 
     # ---------- View saved batches ----------
     def view_batches(self):
-        BatchViewer()
+        BatchViewer(self.workers)
 
 
 # ------------------ Batch Viewer Window ------------------
 class BatchViewer:
-    def __init__(self):
-        self.db = load_db()
+    def __init__(self, workers):
+        self.workers = workers  # lookups and writes run off the GUI thread
+        with span("viewer.open"):
+            self.generation = generation(DB_FILE)  # read first, so later writes by others show as newer
+            self.headers = snapshot_rows(DB_FILE, self.workers)  # the headers until a snapshot is built
 
         self.win = tk.Toplevel()
         self.win.title("Saved Batches")
@@ -170,41 +191,136 @@ class BatchViewer:
         right_frame = tk.Frame(self.win)
         right_frame.pack(side="right", fill="both", expand=True, padx=10, pady=10)
 
-        self.listbox = tk.Listbox(left_frame, width=35)
-        self.listbox.pack(fill="y")
-
-        for b in self.db:
-            self.listbox.insert("end", f"{b['title']} ({b['date']})")
-
-        self.listbox.bind("<<ListboxSelect>>", self.show_details)
+        # only the visible rows exist as widgets, the rest are read from self.headers on scroll
+        self.listbox = VirtualTree(left_frame, ("batch",), ("Batch",), (250,),
+                                   to_values=lambda h: (f"{h['title']} ({h['date']})",))
+        self.listbox.pack(fill="y", expand=True)
+        self.listbox.set_rows(self.headers)
+        self.listbox.bind("<<VirtualSelect>>", self.show_details)
 
         del_btn = tk.Button(left_frame, text="Delete Batch", command=self.delete_batch)
         del_btn.pack(pady=5)
+        tk.Button(left_frame, text="Merge Duplicates", command=self.merge_duplicate_records).pack(pady=5)
+
+        # tag filter, e.g. physics AND Easy AND NOT Theoretical
+        filter_frame = tk.Frame(right_frame)
+        filter_frame.pack(fill="x", pady=(0, 5))
+        self.tag_query_entry = tk.Entry(filter_frame)
+        self.tag_query_entry.pack(side="left", fill="x", expand=True)
+        self.tag_query_entry.bind("<Return>", lambda e: self.filter_by_tags())
+        tk.Button(filter_frame, text="Filter by Tags", command=self.filter_by_tags).pack(side="left", padx=5)
+
+        # full-text search over questions and reasons
+        search_frame = tk.Frame(right_frame)
+        search_frame.pack(fill="x", pady=(0, 5))
+        self.search_entry = tk.Entry(search_frame)
+        self.search_entry.pack(side="left", fill="x", expand=True)
+        self.search_entry.bind("<Return>", lambda e: self.search_records())
+        tk.Button(search_frame, text="Search", command=self.search_records).pack(side="left", padx=5)
 
         self.text = tk.Text(right_frame, wrap="word")
         self.text.pack(fill="both", expand=True)
 
+    @traced("viewer.show_details")
     def show_details(self, event):
-        index = self.listbox.curselection()
-        if not index:
+        index = self.listbox.selected
+        if index is None:
+            return
+        b = self.headers.batch(index)
+        head = f"Title: {b['title']}\nDate: {b['date']}\nRecords: {len(b['records'])}\n\n"
+        lines = (f"{i}. Question: {r['question']}\n   Reason: {r['reason']}\n   Tag: {r['tag']}\n\n"
+                 for i, r in enumerate(b["records"], start=1))
+        fill_text(self.text, chain([head], lines))  # big batches keep filling in after the first screen is up
+
+    def filter_by_tags(self):
+        expr = self.tag_query_entry.get().strip()
+        if not expr:
+            return
+
+        def show(result):
+            n, matches = result
+            lines = [f"Tag filter: {expr}\nMatches: {n}\n"]
+            for i, (b, r) in enumerate(matches, start=1):
+                lines.append(f"{i}. [{b['title']}] Question: {r['question']}\n   Reason: {r['reason']}\n   Tag: {r['tag']}\n")
+            fill_text(self.text, ["\n".join(lines)])
+        self.workers.submit(tag_matches, DB_FILE, expr, 1000, on_done=show,
+                            on_error=lambda e: messagebox.showwarning("Tag Filter", str(e)))
+
+    def search_records(self):
+        query = self.search_entry.get().strip()
+        if not query:
             return
-        b = self.db[index[0]]
-        txt = f"Title: {b['title']}\nDate: {b['date']}\nRecords: {len(b['records'])}\n\n"
-        for i, r in enumerate(b["records"], start=1):
-            txt += f"{i}. Question: {r['question']}\n   Reason: {r['reason']}\n   Tag: {r['tag']}\n\n"
 
-        self.text.delete("1.0", tk.END)
-        self.text.insert("1.0", txt)
+        def show(hits):
+            lines = [f"Search: {query}\nTop {len(hits)} matches\n"]
+            for i, (score, b, r) in enumerate(hits, start=1):
+                lines.append(f"{i}. [{b['title']}] Question: {r['question']}  ({score:.2f})\n   Reason: {r['reason']}\n   Tag: {r['tag']}\n")
+            fill_text(self.text, ["\n".join(lines)])
+        self.workers.submit(search, DB_FILE, query, k=50, on_done=show,
+                            on_error=lambda e: messagebox.showerror("Search", str(e)))
 
     def delete_batch(self):
-        index = self.listbox.curselection()
-        if not index:
+        index = self.listbox.selected
+        if index is None:
+            return
+        if not messagebox.askyesno("Confirm", "Delete this batch?"):
             return
-        if messagebox.askyesno("Confirm", "Delete this batch?"):
-            del self.db[index[0]]
-            save_db(self.db)
-            self.listbox.delete(index)
-            self.text.delete("1.0", tk.END)
+
+        def deleted(_):
+            if generation(DB_FILE) == self.generation + 1:
+                self.generation += 1
+                del self.headers[index]
+                self.listbox.selected = None
+                self.listbox.refresh()
+            else:
+                self.refresh_list()  # others saved in the meantime
+            fill_text(self.text, ())
+
+        def failed(e):
+            if isinstance(e, ConflictError):
+                messagebox.showwarning("Changed", "This batch was changed or deleted by another window.")
+                self.refresh_list()
+            else:
+                messagebox.showerror("Error", f"Failed to delete the batch: {e}")
+        self.workers.submit(delete_from_db, DB_FILE, index, expect=self.headers[index], generation=self.generation,
+                            write=DB_FILE, on_done=deleted, on_error=failed)
+
+    # list likely duplicate questions and offer to fold each group into its oldest record
+    def merge_duplicate_records(self):
+        self.workers.submit(duplicate_report, DB_FILE, on_done=self.offer_merge,
+                            on_error=lambda e: messagebox.showerror("Duplicates", str(e)))
+
+    def offer_merge(self, report):
+        index, groups, records = report
+        if not groups:
+            messagebox.showinfo("Duplicates", "No likely duplicates found.")
+            return
+        lines = [f"Likely duplicates: {len(groups)} groups\n"]
+        for i, group in enumerate(records, start=1):
+            for b, r in group:
+                lines.append(f"{i}. [{b['title']}] Question: {r['question']}")
+            lines.append("")
+        fill_text(self.text, ["\n".join(lines)])
+        extra = sum(len(g) - 1 for g in groups)
+        if not messagebox.askyesno("Merge Duplicates", f"Merge {extra} records into the oldest one of their group?"):
+            return
+
+        def merged(removed):
+            self.refresh_list()
+            messagebox.showinfo("Merged", f"Removed {removed} duplicate records.")
+
+        def failed(e):
+            self.refresh_list()
+            if isinstance(e, ConflictError):
+                messagebox.showwarning("Changed", "Some batches were changed by another window, merge stopped.")
+            else:
+                messagebox.showerror("Error", f"Merge failed: {e}")
+        self.workers.submit(merge_duplicates, DB_FILE, groups, index, write=DB_FILE, on_done=merged, on_error=failed)
+
+    def refresh_list(self):
+        self.generation = generation(DB_FILE)
+        self.headers = snapshot_rows(DB_FILE, self.workers)
+        self.listbox.set_rows(self.headers)
 
 
 # ------------------ Main ------------------
@@ -212,3 +328,4 @@ if __name__ == "__main__":
     root = tk.Tk()
     app = MistakeApp(root)
     root.mainloop()
+    app.workers.shutdown()  # let queued saves reach the file
@@ -0,0 +1,217 @@
+import argparse
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from mistake_store import BACKENDS, add_many_to_db, configure, load_headers, settings
+from mistake_stream import iter_items
+from mistake_workers import check_cancelled, progress
+
+# Bulk import of quiz results, so nobody retypes them.  A quiz file becomes
+# one batch, written with a single add_many_to_db:
+#
+#   "Quiz No#1_20251209_152815.xlsx" -> {"title": "Quiz No#1", "date": "2025-12-09 15:28:15", "records": [...]}
+#   MockRuleQuiz.json                -> its batches as they are (bare records are grouped under the file name)
+#
+# Spreadsheets are read row by row with openpyxl in read-only mode and JSON
+# item by item (mistake_stream.iter_items); the header row is matched
+# against COLUMNS to find the question, reason, tag, type and date columns.
+# A sheet with a title column (e.g. one written by mistake_export) becomes
+# one batch per title and date instead.  A folder is parsed in a process
+# pool and written here in file name order:
+#
+#   import_paths(DB_FILE, ["quizzes/"])  -> {"files", "batches", "records", "skipped", "seconds", "rate"}
+#   python mistake_import.py quizzes/ --db mistake_db.json
+#
+# Into a records file (database.json) every row becomes a record of its own.
+# Batches already in the file (same title and date) are skipped.
+EXTENSIONS = (".xlsx", ".xlsm", ".json")
+COLUMNS = {
+    "title": ("title", "batch title", "batch", "quiz"),
+    "question": ("question", "questions", "q", "question no", "question no."),
+    "reason": ("reason", "why", "mistake"),
+    "tag": ("tag", "tags", "topic"),
+    "type": ("type", "result", "status"),
+    "date": ("date", "time", "when"),
+}
+_STAMP = re.compile(r"^(.*?)[ _](\d{8})_(\d{6})$")
+
+
+def _text(value):
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d %H:%M:%S")
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+# title and date from "Quiz No#1_20251209_152815.xlsx", else the name and mtime
+def title_and_date(path):
+    stem = os.path.splitext(os.path.basename(path))[0]
+    m = _STAMP.match(stem)
+    if m:
+        try:
+            return m.group(1), datetime.strptime(m.group(2) + m.group(3), "%Y%m%d%H%M%S").strftime("%Y-%m-%d %H:%M:%S")
+        except ValueError:
+            pass
+    return stem, datetime.fromtimestamp(os.path.getmtime(path)).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def map_columns(header):
+    names = [_text(h).lower() for h in header]
+    found = {}
+    for field, aliases in COLUMNS.items():
+        for i, name in enumerate(names):
+            if name in aliases:
+                found[field] = i
+                break
+    if "question" not in found:
+        raise ValueError(f"no question column in header {list(header)!r}")
+    return found
+
+
+def read_xlsx(path):
+    from openpyxl import load_workbook  # only needed for spreadsheets
+    title, date = title_and_date(path)
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+        cols = map_columns(next(rows, ()))
+        batches = {}
+        for row in rows:
+            rec = {field: _text(row[i]) if i < len(row) else "" for field, i in cols.items()}
+            if not rec["question"]:
+                continue
+            if "title" in cols:
+                key = (rec.pop("title") or title, rec.pop("date", "") or date)
+            else:
+                key = (title, date)
+            batches.setdefault(key, []).append(rec)
+    finally:
+        wb.close()
+    if not batches:
+        batches[title, date] = []
+    return [{"title": t, "date": d, "records": records} for (t, d), records in batches.items()]
+
+
+def read_json(path):
+    title, date = title_and_date(path)
+    batches, loose = [], []
+    for _, _, item in iter_items(path):
+        if isinstance(item, dict) and "records" in item:
+            batches.append(item)
+        elif isinstance(item, dict) and item.get("question"):
+            loose.append(item)
+    if loose:
+        batches.append({"title": title, "date": date, "records": loose})
+    return batches
+
+
+# runs in a worker process: the batches of one file
+def read_quiz(path):
+    if path.lower().endswith(".json"):
+        return read_json(path)
+    return read_xlsx(path)
+
+
+def as_records(batch):
+    out = []
+    for r in batch.get("records", []):
+        tags = r.get("tags", r.get("tag", ""))
+        if isinstance(tags, str):
+            tags = [t.strip() for t in tags.split(",") if t.strip()]
+        out.append({"question": r.get("question", ""), "type": (r.get("type") or "").lower(),
+                    "reason": r.get("reason", ""), "tags": tags, "date": r.get("date") or batch.get("date", "")})
+    return out
+
+
+# type is kept on batch records too; every backend stores it (sqlite in its
+# extra column, binary in the per-item extras)
+def as_batch(batch):
+    records = []
+    for r in batch.get("records", []):
+        rec = {"question": r.get("question", ""), "reason": r.get("reason", ""), "tag": r.get("tag", "")}
+        if r.get("type"):
+            rec["type"] = r["type"]
+        records.append(rec)
+    return {"title": batch.get("title", ""), "date": batch.get("date", ""), "records": records}
+
+
+def quiz_files(paths):
+    files = []
+    for p in paths:
+        if os.path.isdir(p):
+            files += [os.path.join(p, name) for name in sorted(os.listdir(p))
+                      if name.lower().endswith(EXTENSIONS) and not name.startswith("~$")]
+        else:
+            files.append(p)
+    return files
+
+
+def import_paths(path, paths, processes=None):
+    files = quiz_files(paths)
+    kind = settings(path)[1]
+    existing = {(h["title"], h["date"]) for h in load_headers(path)} if kind == "batches" else set()
+    stats = {"files": len(files), "batches": 0, "records": 0, "skipped": 0}
+    start = time.perf_counter()
+
+    def write(batches):
+        if kind == "records":
+            items = [rec for b in batches for rec in as_records(b)]
+            stats["records"] += len(items)
+        else:
+            items = []
+            for b in map(as_batch, batches):
+                if (b["title"], b["date"]) in existing:
+                    stats["skipped"] += 1
+                    continue
+                existing.add((b["title"], b["date"]))
+                items.append(b)
+                stats["records"] += len(b["records"])
+        if items:
+            add_many_to_db(path, items)
+            stats["batches"] += len(batches) if kind == "records" else len(items)
+
+    if len(files) <= 1 or processes == 1:
+        parsed = map(read_quiz, files)
+        pool = None
+    else:
+        pool = ProcessPoolExecutor(processes)
+        parsed = pool.map(read_quiz, files)  # parsed in parallel, handed back in file order
+    try:
+        for done, batches in enumerate(parsed, start=1):
+            check_cancelled()
+            write(batches)
+            progress(done, len(files))
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+    stats["seconds"] = time.perf_counter() - start
+    stats["rate"] = stats["records"] / stats["seconds"] if stats["seconds"] else 0.0
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import quiz result spreadsheets and JSON files as mistake batches.")
+    parser.add_argument("paths", nargs="+", help="quiz .xlsx/.json files or folders of them")
+    parser.add_argument("--db", default="mistake_db.json", help="mistake file to import into")
+    parser.add_argument("--backend", choices=BACKENDS, default="journal")
+    parser.add_argument("--kind", choices=("batches", "records"), default="batches")
+    parser.add_argument("--processes", type=int, default=None, help="parser processes (default: one per CPU)")
+    args = parser.parse_args(argv)
+    configure(args.db, backend=args.backend, kind=args.kind)
+
+    stats = import_paths(args.db, args.paths, args.processes)
+    print(f"{args.db}: {stats['records']} records in {stats['batches']} batches from {stats['files']} files, "
+          f"{stats['skipped']} skipped, {stats['seconds']:.2f} s ({stats['rate']:.0f} records/s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
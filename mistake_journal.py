@@ -0,0 +1,222 @@
+import json
+import os
+import threading
+
+from mistake_lock import get_lock
+from mistake_stream import write_snapshot_tmp
+
+# The snapshot is the usual JSON array (mistake_db.json, database.json, ...).
+# Adds, edits and deletes are appended to "<snapshot>.journal" as one JSON
+# object per line, so saving one batch costs the size of that batch only.
+# Once the log grows past COMPACT_EVERY entries it is folded into the
+# snapshot on a background thread.
+#
+# Compaction moves the log to "<snapshot>.compacting", writes the new
+# snapshot next to the old one and, before renaming it into place, ends
+# .compacting with a FOLDED line naming that file (inode, size, mtime).
+# A .compacting whose FOLDED line names the current snapshot was already
+# folded in by a run that died before removing it, and is not replayed again.
+JOURNAL_SUFFIX = ".journal"
+COMPACT_SUFFIX = ".compacting"
+COMPACT_EVERY = 500
+FOLDED = "folded"
+
+_encode = json.JSONEncoder(ensure_ascii=False).encode
+
+
+# ----------------- helpers -----------------
+def read_snapshot(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        try:
+            return json.load(f)
+        except json.JSONDecodeError:
+            return []
+
+
+def write_snapshot(path, data):
+    os.replace(write_snapshot_tmp(path, data), path)
+
+
+def apply_entry(data, entry):
+    op = entry["op"]
+    if op == "add":
+        data.append(entry["item"])
+    elif op == "add_many":
+        data.extend(entry["items"])
+    elif op == "edit":
+        data[entry["index"]] = entry["item"]
+    elif op == "delete":
+        del data[entry["index"]]
+
+
+def read_entries(log_path):
+    if not os.path.exists(log_path):
+        return
+    with open(log_path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                return  # torn last line from a crash mid-append
+
+
+def replay(data, log_path):
+    for entry in read_entries(log_path):
+        apply_entry(data, entry)
+    return data
+
+
+def file_id(path):
+    st = os.stat(path)
+    return [st.st_ino, st.st_size, st.st_mtime_ns]
+
+
+def last_entry(log_path):
+    with open(log_path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        f.seek(max(0, f.tell() - 4096))
+        lines = f.read().splitlines()
+    try:
+        return json.loads(lines[-1]) if lines else None
+    except ValueError:
+        return None
+
+
+def count_entries(log_path):
+    if not os.path.exists(log_path):
+        return 0
+    with open(log_path, "rb") as f:
+        return sum(1 for _ in f)
+
+
+# ----------------- journal -----------------
+class Journal:
+    def __init__(self, path, compact_every=COMPACT_EVERY):
+        self.path = path
+        self.log_path = path + JOURNAL_SUFFIX
+        self.compact_path = path + COMPACT_SUFFIX
+        self.compact_every = compact_every
+        # both are file locks, so other processes writing the same file wait too
+        self.lock = get_lock(path)                            # guards the log file and counters
+        self.compact_lock = get_lock(path + COMPACT_SUFFIX)   # one snapshot rewrite at a time
+        self.compactor = None
+        self.entries = count_entries(self.log_path)
+
+    def load(self):
+        with self.lock:
+            data = read_snapshot(self.path)
+            for entry in self.compacting_entries():
+                apply_entry(data, entry)
+            return replay(data, self.log_path)
+
+    # log entries not yet folded into the snapshot, oldest first
+    def pending_entries(self):
+        with self.lock:
+            return self.compacting_entries() + list(read_entries(self.log_path))
+
+    # ---------- .compacting ----------
+    def folded(self):
+        if not os.path.exists(self.compact_path) or not os.path.exists(self.path):
+            return False
+        last = last_entry(self.compact_path)
+        return isinstance(last, dict) and last.get("op") == FOLDED and last.get("into") == file_id(self.path)
+
+    def compacting_entries(self):
+        if self.folded():
+            return []
+        return [e for e in read_entries(self.compact_path) if e.get("op") != FOLDED]
+
+    # full rewrite, same cost as the old save_db
+    def save(self, data):
+        with self.compact_lock, self.lock:
+            write_snapshot(self.path, data)
+            for p in (self.compact_path, self.log_path):
+                if os.path.exists(p):
+                    os.remove(p)
+            self.entries = 0
+
+    def add(self, item):
+        self.append({"op": "add", "item": item})
+
+    def edit(self, index, item):
+        self.append({"op": "edit", "index": index, "item": item})
+
+    def delete(self, index):
+        self.append({"op": "delete", "index": index})
+
+    # one line for the lot: a single encode, and one entry towards compaction
+    def add_many(self, items):
+        self.append({"op": "add_many", "items": items})
+
+    # several entries share one write + fsync (group commit)
+    def append(self, *entries):
+        if not entries:
+            return
+        lines = "".join(_encode(e) + "\n" for e in entries)
+        with self.lock:
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(lines)
+                f.flush()
+                os.fsync(f.fileno())
+            self.entries += len(entries)
+            due = self.entries >= self.compact_every
+        if due:
+            self.compact_in_background()
+
+    # ---------- compaction ----------
+    # not a daemon: the interpreter waits for a running compaction at exit
+    # instead of killing it halfway
+    def compact_in_background(self):
+        if self.compactor is not None and self.compactor.is_alive():
+            return
+        self.compactor = threading.Thread(target=self.compact)
+        self.compactor.start()
+
+    def compact(self):
+        with self.compact_lock:
+            with self.lock:
+                # a leftover .compacting means an earlier run died: drop it if
+                # its snapshot made it into place, else fold it first
+                if self.folded():
+                    os.remove(self.compact_path)
+                if not os.path.exists(self.compact_path):
+                    if not os.path.exists(self.log_path):
+                        return
+                    os.replace(self.log_path, self.compact_path)
+                    self.entries = 0
+
+            # new appends go to a fresh log while the snapshot is rebuilt
+            data = read_snapshot(self.path)
+            for entry in self.compacting_entries():
+                apply_entry(data, entry)
+            tmp = write_snapshot_tmp(self.path, data)
+
+            with self.lock:
+                # on a line of its own, even after a torn last entry
+                with open(self.compact_path, "a", encoding="utf-8") as f:
+                    f.write("\n" + _encode({"op": FOLDED, "into": file_id(tmp)}) + "\n")
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp, self.path)
+                os.remove(self.compact_path)
+
+    def wait(self):
+        if self.compactor is not None:
+            self.compactor.join()
+
+
+_journals = {}
+_journals_lock = threading.Lock()
+
+
+def get_journal(path):
+    key = os.path.abspath(path)
+    with _journals_lock:
+        if key not in _journals:
+            _journals[key] = Journal(path)
+        return _journals[key]
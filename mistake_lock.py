@@ -0,0 +1,89 @@
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Advisory lock shared by every process that writes a mistake file.  The lock
+# lives in "<file>.lock", which also holds the write generation: a counter
+# bumped on every commit so a window can tell whether anyone else wrote
+# since it loaded.  The lock is re-entrant within a process, so the store and
+# the journal can both take it around the same write.
+LOCK_SUFFIX = ".lock"
+
+
+class FileLock:
+    def __init__(self, path):
+        self.path = path + LOCK_SUFFIX
+        self.local = threading.RLock()
+        self.depth = 0
+        self.fd = None
+
+    def __enter__(self):
+        self.local.acquire()
+        if self.depth == 0:
+            try:
+                self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+                if fcntl is not None:
+                    fcntl.flock(self.fd, fcntl.LOCK_EX)
+                else:
+                    msvcrt.locking(self.fd, msvcrt.LK_LOCK, 1)
+            except BaseException:
+                if self.fd is not None:
+                    os.close(self.fd)
+                    self.fd = None
+                self.local.release()
+                raise
+        self.depth += 1
+        return self
+
+    def __exit__(self, *exc):
+        self.depth -= 1
+        if self.depth == 0:
+            if fcntl is not None:
+                fcntl.flock(self.fd, fcntl.LOCK_UN)
+            else:
+                os.lseek(self.fd, 0, os.SEEK_SET)
+                msvcrt.locking(self.fd, msvcrt.LK_UNLCK, 1)
+            os.close(self.fd)
+            self.fd = None
+        self.local.release()
+
+    # ---------- generation counter (call while holding the lock to bump) ----------
+    def generation(self):
+        try:
+            with open(self.path, "r") as f:
+                return int(f.read().strip() or 0)
+        except (OSError, ValueError):
+            return 0
+
+    # the generation plus the lock file's inode, since a lock file that was
+    # deleted and made again counts from 0 again
+    def version(self):
+        try:
+            ino = os.stat(self.path).st_ino
+        except OSError:
+            ino = 0
+        return (ino, self.generation())
+
+    def bump(self):
+        gen = self.generation() + 1
+        os.lseek(self.fd, 0, os.SEEK_SET)
+        os.ftruncate(self.fd, 0)
+        os.write(self.fd, str(gen).encode())
+        return gen
+
+
+_locks = {}
+_locks_lock = threading.Lock()
+
+
+def get_lock(path):
+    key = os.path.abspath(path)
+    with _locks_lock:
+        if key not in _locks:
+            _locks[key] = FileLock(path)
+        return _locks[key]
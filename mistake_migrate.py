@@ -0,0 +1,204 @@
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from functools import lru_cache
+
+from mistake_dates import DATE_FORMATS
+from mistake_journal import COMPACT_SUFFIX, JOURNAL_SUFFIX
+from mistake_sqlite import split_tags
+from mistake_store import configure, count_items, iter_db, settings, signature, signature_json
+from mistake_stream import iter_items
+
+# Streams database.json (flat records), mistake_db.json and mistake_data.json
+# (batches) into one JSONL file with one canonical record per line:
+#
+#   {"id": "mistake_db.json:0:2", "batch": "RuleQuiz1", "question": ...,
+#    "reason": ..., "type": "wrong" | "timeout" | null, "tags": [...],
+#    "date": "YYYY-MM-DD HH:MM:SS"}
+#
+# Only one source item is in memory at a time.  A source the apps still have
+# journal entries for is read as they see it, file plus pending entries,
+# without folding them in: the sources are never written.  Progress is
+# checkpointed to "<out>.checkpoint", per source path; a rerun resumes from
+# there, truncating any output written after the last checkpoint, so rows
+# are never duplicated.
+# Rejected rows go to "<out>.rejects.jsonl" with the reason.
+#
+#   python mistake_migrate.py mistakes.jsonl database.json mistake_db.json mistake_data.json
+CHECKPOINT_EVERY = 10000   # source items between checkpoints
+REPORT_EVERY = 2.0         # seconds between progress lines
+
+
+def normalize_date(value):
+    if not isinstance(value, str):
+        return None
+    return _normalize_date(value)
+
+
+@lru_cache(maxsize=4096)  # a batch's records all share its date
+def _normalize_date(value):
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value.strip(), fmt).strftime("%Y-%m-%d %H:%M:%S")
+        except ValueError:
+            pass
+    return None
+
+
+# one source item -> [(canonical record, None) or (raw row, reject reason), ...]
+def canonical_records(source, index, item):
+    if not isinstance(item, dict):
+        return [({"id": f"{source}:{index}", "raw": item}, "item is not an object")]
+    if "records" in item:
+        batch, date, recs = item.get("title"), item.get("date"), item.get("records") or []
+    else:
+        batch, date, recs = None, item.get("date"), [item]
+    out = []
+    for j, rec in enumerate(recs):
+        rid = f"{source}:{index}:{j}"
+        if not isinstance(rec, dict):
+            out.append(({"id": rid, "raw": rec}, "record is not an object"))
+            continue
+        question = (rec.get("question") or "").strip()
+        norm_date = normalize_date(rec.get("date", date))
+        if not question:
+            out.append(({"id": rid, "raw": rec}, "empty question"))
+        elif norm_date is None:
+            out.append(({"id": rid, "raw": rec}, f"bad date {rec.get('date', date)!r}"))
+        else:
+            out.append(({"id": rid, "batch": batch, "question": question,
+                         "reason": rec.get("reason", ""), "type": rec.get("type"),
+                         "tags": split_tags(rec), "date": norm_date}, None))
+    return out
+
+
+# ----------------- checkpoint -----------------
+def load_checkpoint(path):
+    if not os.path.exists(path):
+        return {"out_size": 0, "rejects_size": 0, "sources": {}}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_checkpoint(path, cp):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(cp, f, indent=4)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _sync(*files):
+    for f in files:
+        f.flush()
+        os.fsync(f.fileno())
+
+
+# ----------------- migration -----------------
+# (start, end, item) for the items of `src` after those `state` has done.
+# With journal entries pending the items come through the store, which
+# replays them over the file, and have no byte span: (None, None, item).
+def _source_items(src, state):
+    if os.path.exists(src + JOURNAL_SUFFIX) or os.path.exists(src + COMPACT_SUFFIX):
+        for item in iter_db(src, range(state["items"], count_items(src))):
+            yield None, None, item
+    else:
+        yield from iter_items(src, state["offset"])
+
+
+def migrate(out_path, sources, checkpoint_every=CHECKPOINT_EVERY, log=print):
+    cp_path = out_path + ".checkpoint"
+    rejects_path = out_path + ".rejects.jsonl"
+    cp = load_checkpoint(cp_path)
+
+    # throw away anything written after the last checkpoint
+    for p, size in ((out_path, cp["out_size"]), (rejects_path, cp["rejects_size"])):
+        with open(p, "ab") as f:
+            f.truncate(size)
+
+    totals = {"records": 0, "rejected": 0, "bytes": 0}
+    started = time.perf_counter()
+    with open(out_path, "a", encoding="utf-8") as out, open(rejects_path, "a", encoding="utf-8") as rej:
+        for src in sources:
+            name, key = os.path.basename(src), os.path.abspath(src)
+            if key not in cp["sources"] and name in cp["sources"]:
+                cp["sources"][key] = cp["sources"].pop(name)  # checkpoints used to be keyed by name
+            state = cp["sources"].get(key)
+            if state is not None and state["done"]:
+                log(f"{name}: already migrated ({state['records']} records), skipping")
+                continue
+
+            configure(src, backend="journal", kind=settings(src)[1])
+            sig = signature_json(signature(src))
+            if state is not None and state.get("signature") != sig:
+                # the file or its journal changed since the checkpoint: start it over
+                log(f"{name}: changed since last run, migrating it again")
+                for f, size in ((out, state["out_start"]), (rej, state["rejects_start"])):
+                    f.truncate(size)
+                    f.seek(size)
+                state = None
+            if state is None:
+                state = cp["sources"][key] = {
+                    "signature": sig, "out_start": out.tell(), "rejects_start": rej.tell(),
+                    "offset": 0, "items": 0, "records": 0, "rejected": 0, "done": False}
+
+            last_report = time.perf_counter()
+            since_cp = 0
+            for start, end, item in _source_items(src, state):
+                for rec, reason in canonical_records(name, state["items"], item):
+                    if reason is None:
+                        out.write(json.dumps(rec, ensure_ascii=False) + "\n")
+                        state["records"] += 1
+                        totals["records"] += 1
+                    else:
+                        rej.write(json.dumps(dict(rec, reason=reason), ensure_ascii=False) + "\n")
+                        state["rejected"] += 1
+                        totals["rejected"] += 1
+                state["items"] += 1
+                if end is not None:
+                    state["offset"] = end
+                    totals["bytes"] += end - start
+                since_cp += 1
+
+                if since_cp >= checkpoint_every:
+                    _sync(out, rej)
+                    cp["out_size"], cp["rejects_size"] = out.tell(), rej.tell()
+                    save_checkpoint(cp_path, cp)
+                    since_cp = 0
+                now = time.perf_counter()
+                if now - last_report >= REPORT_EVERY:
+                    last_report = now
+                    log(_progress(name, totals, now - started))
+
+            state["done"] = True
+            _sync(out, rej)
+            cp["out_size"], cp["rejects_size"] = out.tell(), rej.tell()
+            save_checkpoint(cp_path, cp)
+            log(f"{name}: done, {state['records']} records, {state['rejected']} rejected")
+
+    log(_progress("total", totals, time.perf_counter() - started))
+    return totals
+
+
+def _progress(name, totals, elapsed):
+    elapsed = max(elapsed, 1e-9)
+    return (f"{name}: {totals['records']} records, {totals['rejected']} rejected, "
+            f"{totals['records'] / elapsed:,.0f} rec/s, {totals['bytes'] / elapsed / 1e6:.1f} MB/s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Migrate mistake files into one canonical JSONL file.")
+    parser.add_argument("out", help="output .jsonl file")
+    parser.add_argument("sources", nargs="+", help="database.json, mistake_db.json, mistake_data.json ...")
+    parser.add_argument("--checkpoint-every", type=int, default=CHECKPOINT_EVERY,
+                        help="source items between checkpoints")
+    args = parser.parse_args(argv)
+    migrate(args.out, args.sources, args.checkpoint_every)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,91 @@
+from PyQt5.QtCore import QTimer
+from PyQt5.QtGui import QKeySequence
+from PyQt5.QtWidgets import (QCheckBox, QDialog, QFileDialog, QHBoxLayout, QHeaderView, QLabel, QPushButton,
+                             QShortcut, QTableWidget, QTableWidgetItem, QVBoxLayout)
+
+import mistake_trace
+
+# Hidden debug panel: p50/p99 latencies per traced operation (mistake_trace),
+# refreshed every REFRESH_MS while open.  Not on any menu:
+#
+#   install_debug_panel(self)   # in a main window's __init__; Ctrl+Shift+D opens it
+REFRESH_MS = 1000
+SHORTCUT = "Ctrl+Shift+D"
+COLUMNS = ["Operation", "Count", "p50 ms", "p99 ms", "Max ms"]
+
+
+class DebugPanel(QDialog):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Debug: latencies")
+        self.resize(640, 420)
+        layout = QVBoxLayout()
+
+        self.enabled_box = QCheckBox("Trace operations")
+        self.enabled_box.setChecked(mistake_trace.enabled())
+        self.enabled_box.toggled.connect(mistake_trace.enable)
+        layout.addWidget(self.enabled_box)
+
+        self.table = QTableWidget(0, len(COLUMNS))
+        self.table.setHorizontalHeaderLabels(COLUMNS)
+        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.table.verticalHeader().setVisible(False)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        layout.addWidget(self.table)
+        self.counters_label = QLabel("")
+        self.counters_label.setWordWrap(True)
+        layout.addWidget(self.counters_label)
+
+        buttons = QHBoxLayout()
+        for text, slot in (("Save Chrome Trace", self.save_trace), ("Save Metrics", self.save_metrics),
+                           ("Reset", self.reset)):
+            btn = QPushButton(text)
+            btn.clicked.connect(slot)
+            buttons.addWidget(btn)
+        layout.addLayout(buttons)
+        self.setLayout(layout)
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+        self.timer.start(REFRESH_MS)
+        self.refresh()
+
+    def refresh(self):
+        rows = mistake_trace.stats()
+        self.table.setRowCount(len(rows))
+        for i, (name, n, p50, p99, top) in enumerate(rows):
+            for j, value in enumerate((name, str(n), f"{p50 * 1000:.2f}", f"{p99 * 1000:.2f}", f"{top * 1000:.2f}")):
+                self.table.setItem(i, j, QTableWidgetItem(value))
+        counters = mistake_trace.counters()
+        self.counters_label.setText("  ".join(f"{k}: {v}" for k, v in sorted(counters.items())))
+
+    def save_trace(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Save Chrome Trace", "trace.json", "Trace (*.json)")
+        if path:
+            mistake_trace.write_chrome_trace(path)
+
+    def save_metrics(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Save Metrics", "mistake.prom", "Prometheus textfile (*.prom)")
+        if path:
+            mistake_trace.write_prometheus(path)
+
+    def reset(self):
+        mistake_trace.reset()
+        self.refresh()
+
+    def closeEvent(self, event):
+        self.timer.stop()
+        super().closeEvent(event)
+
+
+def install_debug_panel(window):
+    def show():
+        panel = getattr(window, "_debug_panel", None)
+        if panel is None:
+            panel = window._debug_panel = DebugPanel(window)
+        panel.timer.start(REFRESH_MS)
+        panel.show()
+        panel.raise_()
+    shortcut = QShortcut(QKeySequence(SHORTCUT), window)
+    shortcut.activated.connect(show)
+    return shortcut
@@ -0,0 +1,279 @@
+from bisect import bisect_left
+from collections import OrderedDict
+
+from PyQt5 import QtGui
+from PyQt5.QtCore import QAbstractTableModel, QModelIndex, QSortFilterProxyModel, Qt, QTimer
+
+# Model/view pieces for the PyQt windows.  RecordTableModel shows the
+# records of a source: the list typed into a window (ListSource) or one
+# saved batch, read from the viewer's rows a page at a time (BatchSource).
+# It tells the view about PAGE_SIZE more rows each time it scrolls to the
+# bottom (canFetchMore/fetchMore), so the view only lays out what has been
+# paged in, and of a saved batch only the last PAGE_CACHE pages are held.
+#
+# Filters and sorts are worked out as a list of row positions by row_order
+# on the workers, FILTER_DELAY_MS after the last keystroke, and swapped in
+# when they arrive; if the records changed in the meantime they are worked
+# out again.  RecordFilterProxy hands both to the model, which sees every
+# record, not just the fetched part.
+#
+#   model = RecordTableModel(workers=self.workers)
+#   model.set_source(BatchSource(self.headers, i))   # or model.set_records([...])
+#   proxy = RecordFilterProxy(); proxy.setSourceModel(model); view.setModel(proxy)
+PAGE_SIZE = 500
+PAGE_CACHE = 8
+FILTER_DELAY_MS = 200
+COLUMNS = (("question", "Question"), ("reason", "Reason"), ("tag", "Tag"))
+FLAG_COLOR = "#fff3cd"
+
+
+class ListSource:
+    def __init__(self, records=()):
+        self.list = list(records)
+
+    def __len__(self):
+        return len(self.list)
+
+    def records(self, lo, hi):
+        return self.list[lo:hi]
+
+
+# one saved batch, through a viewer's SnapshotRows or StoreRows
+class BatchSource:
+    def __init__(self, rows, index):
+        self.rows = rows
+        self.index = index
+        self.count = rows[index]["count"]
+
+    def __len__(self):
+        return self.count
+
+    def records(self, lo, hi):
+        return self.rows.records(self.index, lo, hi)
+
+
+def _text(record, field):
+    return str(record.get(field) or "").casefold()
+
+
+def matches(record, needle):
+    return any(needle in _text(record, field) for field, _ in COLUMNS)
+
+
+# runs on a worker: the positions of the first `count` records that match
+# `needle`, ordered by `sorting` (field, descending); None when that is all
+# of them as they are
+def row_order(source, count, needle, sorting):
+    if not needle and sorting is None:
+        return None
+    keyed = []
+    for lo in range(0, count, PAGE_SIZE):
+        for pos, rec in enumerate(source.records(lo, min(lo + PAGE_SIZE, count)), lo):
+            if not needle or matches(rec, needle):
+                keyed.append((_text(rec, sorting[0]) if sorting else "", pos))
+    if sorting is not None:
+        keyed.sort(key=lambda kp: kp[0], reverse=sorting[1])  # stable, so equal keys keep file order
+    return [pos for _, pos in keyed]
+
+
+class RecordTableModel(QAbstractTableModel):
+    def __init__(self, records=(), editable=False, parent=None, workers=None):
+        super().__init__(parent)
+        self.editable = editable
+        self.workers = workers    # filters and sorts run here; without, right away
+        self.source = ListSource(records)
+        self.order = None         # source positions shown, after filter and sort; None is all, in order
+        self.needle = ""
+        self.sorting = None       # (field, descending)
+        self.version = 0          # bumped when the source changes, so a stale order is redone
+        self.pending = None       # the row_order run whose result is still wanted
+        self.pages = OrderedDict()
+        self.loaded = min(PAGE_SIZE, len(self.source))
+        self.notes = {}   # id(record) -> tooltip for rows to highlight
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self._reorder)
+
+    # ---------- rows ----------
+    def _count(self):
+        return len(self.source) if self.order is None else len(self.order)
+
+    def _pos(self, row):
+        return row if self.order is None else self.order[row]
+
+    def _record(self, pos):
+        if isinstance(self.source, ListSource):
+            return self.source.list[pos]
+        page, at = divmod(pos, PAGE_SIZE)
+        records = self.pages.get(page)
+        if records is None:
+            records = self.pages[page] = self.source.records(page * PAGE_SIZE, (page + 1) * PAGE_SIZE)
+            if len(self.pages) > PAGE_CACHE:
+                self.pages.popitem(last=False)
+        else:
+            self.pages.move_to_end(page)
+        return records[at]
+
+    # ---------- Qt model interface ----------
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.loaded
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(COLUMNS)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        rec = self._record(self._pos(index.row()))
+        if role in (Qt.DisplayRole, Qt.EditRole):
+            return str(rec.get(COLUMNS[index.column()][0]) or "")
+        note = self.notes.get(id(rec))
+        if note is not None:
+            if role == Qt.BackgroundRole:
+                return QtGui.QBrush(QtGui.QColor(FLAG_COLOR))
+            if role == Qt.ToolTipRole:
+                return note
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return COLUMNS[section][1]
+        return section + 1
+
+    def flags(self, index):
+        flags = super().flags(index)
+        return flags | Qt.ItemIsEditable if self.editable else flags
+
+    def setData(self, index, value, role=Qt.EditRole):
+        if role != Qt.EditRole or not index.isValid():
+            return False
+        self._record(self._pos(index.row()))[COLUMNS[index.column()][0]] = value
+        self.version += 1
+        self.dataChanged.emit(index, index, [role])
+        return True
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self.loaded < self._count()
+
+    def fetchMore(self, parent=QModelIndex()):
+        n = min(PAGE_SIZE, self._count() - self.loaded)
+        if n <= 0:
+            return
+        self.beginInsertRows(QModelIndex(), self.loaded, self.loaded + n - 1)
+        self.loaded += n
+        self.endInsertRows()
+
+    # every record, fetched or not, in a new order worked out on the workers
+    def sort(self, column, order=Qt.AscendingOrder):
+        self.sorting = (COLUMNS[column][0], order == Qt.DescendingOrder)
+        self.timer.stop()
+        self._reorder()
+
+    # ---------- filtering ----------
+    # only records with `text` in some column (any case), once typing pauses
+    def set_filter(self, text):
+        self.needle = text.casefold()
+        self.timer.start(FILTER_DELAY_MS)
+
+    def _reorder(self):
+        token = self.pending = object()
+        version = self.version
+        args = (self.source, len(self.source), self.needle, self.sorting)
+        if self.workers is None:
+            self._set_order(token, version, row_order(*args))
+        else:
+            self.workers.submit(row_order, *args, on_done=lambda order: self._set_order(token, version, order))
+
+    def _set_order(self, token, version, order):
+        if token is not self.pending:
+            return  # a newer filter or sort is on its way
+        if version != self.version:
+            self._reorder()
+            return
+        self.pending = None
+        self.beginResetModel()
+        self.order = order
+        self.loaded = min(PAGE_SIZE, self._count())
+        self.endResetModel()
+
+    # ---------- list operations ----------
+    # a new source starts unsorted; the filter text stays and is applied to it
+    def set_source(self, source):
+        self.beginResetModel()
+        self.source = source
+        self.order = None
+        self.sorting = None
+        self.pages.clear()
+        self.notes.clear()
+        self.version += 1
+        self.loaded = min(PAGE_SIZE, len(source))
+        self.endResetModel()
+        if self.needle:
+            self._reorder()
+
+    def set_records(self, records):
+        self.set_source(ListSource(records))
+
+    def clear(self):
+        self.set_records([])
+
+    # the rest of the operations are for typed-in lists (ListSource)
+    def append(self, record, note=None):
+        if note is not None:
+            self.notes[id(record)] = note
+        pos = len(self.source.list)
+        self.source.list.append(record)
+        self.version += 1
+        if self.order is not None:
+            if self.needle and not matches(record, self.needle):
+                return
+            self.order.append(pos)  # at the end, until the next sort
+        if self.loaded < self._count() - 1:
+            return  # shows up when the view pages down to it
+        self.beginInsertRows(QModelIndex(), self.loaded, self.loaded)
+        self.loaded += 1
+        self.endInsertRows()
+
+    # a note that comes in after the row was added, e.g. from a worker
+    def set_note(self, record, note):
+        if not any(r is record for r in self.source.list):
+            return  # removed in the meantime
+        self.notes[id(record)] = note
+        for row in range(self.loaded):
+            if self._record(self._pos(row)) is record:
+                self.dataChanged.emit(self.index(row, 0), self.index(row, len(COLUMNS) - 1))
+
+    def remove_rows(self, rows):
+        positions = sorted({self._pos(row) for row in rows})
+        self.beginResetModel()
+        for pos in reversed(positions):
+            self.notes.pop(id(self.source.list[pos]), None)
+            del self.source.list[pos]
+        if self.order is not None:
+            gone = set(positions)
+            self.order = [p - bisect_left(positions, p) for p in self.order if p not in gone]
+        self.version += 1
+        self.loaded = min(self.loaded, self._count())
+        self.endResetModel()
+
+    def records(self):
+        return self.source.records(0, len(self.source))
+
+    def __len__(self):
+        return len(self.source)
+
+
+class RecordFilterProxy(QSortFilterProxyModel):
+    def sort(self, column, order=Qt.AscendingOrder):
+        # the proxy alone would only order the rows fetched so far
+        if column >= 0:
+            self.sourceModel().sort(column, order)
+
+    # filtered on the source side, which sees every record without fetching it
+    def set_filter(self, text):
+        self.sourceModel().set_filter(text)
+
+    def source_rows(self, proxy_indexes):
+        return [self.mapToSource(i).row() for i in proxy_indexes]
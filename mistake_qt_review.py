@@ -0,0 +1,65 @@
+from PyQt5.QtWidgets import QDialog, QHBoxLayout, QLabel, QMessageBox, QPushButton, QTextEdit, QVBoxLayout
+
+from mistake_review import REVIEWS_SUFFIX, due_records, record_review
+
+# Review window for the PyQt apps: saved mistakes that are due again
+# (mistake_review), one at a time, graded 0..5.  The lookups and the review
+# log run on the parent window's workers:
+#
+#   ReviewDialog(self, DB_FILE).exec_()
+REVIEW_BATCH = 20   # due records looked up at a time
+
+
+class ReviewDialog(QDialog):
+    def __init__(self, parent, path):
+        super().__init__(parent)
+        self.path = path
+        self.workers = parent.workers
+        self.setWindowTitle("Review Due Mistakes")
+        self.resize(560, 300)
+        self.due = []
+        layout = QVBoxLayout()
+        self.text = QTextEdit()
+        self.text.setReadOnly(True)
+        layout.addWidget(self.text)
+        layout.addWidget(QLabel("How well did you remember it?  0 = not at all .. 5 = perfectly"))
+        grades = QHBoxLayout()
+        self.grade_buttons = []
+        for grade in range(6):
+            btn = QPushButton(str(grade))
+            btn.clicked.connect(lambda _, g=grade: self.grade(g))
+            grades.addWidget(btn)
+            self.grade_buttons.append(btn)
+        layout.addLayout(grades)
+        self.setLayout(layout)
+        self.load_due()
+
+    def load_due(self):
+        self.show_next()
+        self.text.setPlainText("Loading...")
+        self.workers.submit(due_records, self.path, REVIEW_BATCH, on_done=self.got_due,
+                            on_error=lambda e: self.text.setPlainText(f"Failed to load the reviews: {e}"))
+
+    def got_due(self, due):
+        self.due = due
+        self.show_next()
+        if not due:
+            self.text.setPlainText("Nothing is due for review.")
+
+    def show_next(self):
+        for btn in self.grade_buttons:
+            btn.setEnabled(bool(self.due))
+        if self.due:
+            _, batch, rec = self.due[0]
+            where = f"[{batch.get('title', '')}]\n" if batch else ""
+            self.text.setPlainText(f"{where}Q: {rec.get('question', '')}\nReason: {rec.get('reason', '')}")
+
+    # the next lot is looked up once the last review of this one is logged
+    def grade(self, grade):
+        _, batch, rec = self.due.pop(0)
+        self.workers.submit(record_review, self.path, batch, rec, grade, write=self.path + REVIEWS_SUFFIX,
+                            on_done=None if self.due else lambda _: self.load_due(),
+                            on_error=lambda e: QMessageBox.critical(self, "Error", f"Failed to save the review: {e}"))
+        self.show_next()
+        if not self.due:
+            self.text.setPlainText("Saving...")
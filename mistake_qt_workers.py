@@ -0,0 +1,86 @@
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, Qt, pyqtSignal, pyqtSlot
+from PyQt5.QtWidgets import QMessageBox, QProgressDialog
+
+from mistake_workers import THREADS, Cancelled, Workers
+
+# The PyQt face of mistake_workers: jobs run as QRunnables on a QThreadPool
+# (one single-thread pool per written file, so its writes stay in order), and
+# their callbacks come back to the GUI thread through a queued signal.
+#
+#   self.workers = QtWorkers(parent=self)
+#   self.workers.submit(add_to_db, DB_FILE, batch, write=DB_FILE, on_done=...)
+#   run_with_progress(self, self.workers, "Export", write_excel, rows, filename)
+
+
+class _Runnable(QRunnable):
+    def __init__(self, job):
+        super().__init__()
+        self.job = job
+
+    def run(self):
+        self.job.run()
+
+
+class _Bridge(QObject):
+    call = pyqtSignal(object, object)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.call.connect(self.deliver)  # emitted on pool threads, delivered on ours
+
+    @pyqtSlot(object, object)
+    def deliver(self, fn, args):
+        fn(*args)
+
+
+class QtWorkers(Workers):
+    def __init__(self, threads=THREADS, parent=None):
+        super().__init__(threads)
+        self.bridge = _Bridge(parent)
+        self.pool = QThreadPool()
+        self.pool.setMaxThreadCount(threads)
+
+    def post(self, fn, *args):
+        self.bridge.call.emit(fn, args)
+
+    def _start(self, job, write):
+        pool = self.pool
+        if write is not None:
+            pool = self.writers.get(write)
+            if pool is None:
+                pool = self.writers[write] = QThreadPool()
+                pool.setMaxThreadCount(1)
+        pool.start(_Runnable(job))
+
+    def shutdown(self, wait=True):
+        for pool in [self.pool, *self.writers.values()]:
+            if wait:
+                pool.waitForDone()
+
+
+# run fn on the workers behind a modal progress dialog whose Cancel button cancels it
+def run_with_progress(parent, workers, label, fn, *args, on_done=None, write=None, **kwargs):
+    dialog = QProgressDialog(label, "Cancel", 0, 0, parent)
+    dialog.setWindowTitle(label)
+    dialog.setWindowModality(Qt.WindowModal)
+    dialog.setMinimumDuration(300)
+    dialog.setValue(0)
+
+    def progress(done, total):
+        if total:
+            dialog.setMaximum(total)
+        dialog.setValue(done)
+
+    def done(result):
+        dialog.reset()
+        if on_done is not None:
+            on_done(result)
+
+    def failed(e):
+        dialog.reset()
+        if not isinstance(e, Cancelled):
+            QMessageBox.critical(parent, "Error", f"{label} failed: {e}")
+
+    job = workers.submit(fn, *args, write=write, on_done=done, on_error=failed, on_progress=progress, **kwargs)
+    dialog.canceled.connect(job.cancel)
+    return job
@@ -0,0 +1,206 @@
+import heapq
+import json
+import os
+import time
+
+from mistake_dates import local_timestamp
+from mistake_store import get_index, index_lock
+
+# Spaced repetition over saved mistakes (SM-2).  Cards belong to record ids,
+# like the other indexes, so editing a batch (a new title, a fixed reason)
+# keeps the schedule of every record whose question it keeps.  Every review
+# is appended to "<file>.reviews" as one JSON line, {"date", "question",
+# "grade", "at"}, naming the record by its date and question, not its batch
+# title, and the schedule is rebuilt from that log on start.  Records never
+# reviewed are due from the moment they were saved, in local time.  The due
+# times sit in a heap, so
+#
+#   due_records(DB_FILE, 10)               -> [(due, batch, record), ...] most overdue first
+#   record_review(DB_FILE, batch, rec, 4)  # grade 0 (blackout) .. 5 (perfect)
+#
+# costs O(K log n); entries left behind by a review or a delete are skipped
+# when they reach the top of the heap.
+REVIEWS_SUFFIX = ".reviews"
+DAY = 86400
+MIN_EASE = 1.3
+
+
+# how the log names a record: a batch record takes the batch's date
+def record_key(batch, rec):
+    date = (batch if batch is not None else rec).get("date", "")
+    return (str(date or ""), rec.get("question", ""))
+
+
+# log lines used to be {"key": "title\x1fdate\x1fquestion" or "question\x1fdate", ...}
+def entry_key(entry):
+    if "key" not in entry:
+        return (entry["date"], entry["question"])
+    parts = entry["key"].split("\x1f")
+    return (parts[1], parts[2]) if len(parts) == 3 else (parts[1], parts[0])
+
+
+class Card:
+    __slots__ = ("ease", "interval", "reps", "due")
+
+    def __init__(self, due):
+        self.ease = 2.5
+        self.interval = 0
+        self.reps = 0
+        self.due = due
+
+    def review(self, grade, at):
+        if grade < 3:
+            self.reps = 0
+            self.interval = 1
+        else:
+            self.interval = 1 if self.reps == 0 else 6 if self.reps == 1 else round(self.interval * self.ease)
+            self.reps += 1
+        self.ease = max(MIN_EASE, self.ease + 0.1 - (5 - grade) * (0.08 + (5 - grade) * 0.02))
+        self.due = at + self.interval * DAY
+
+
+def read_log(path):
+    if not os.path.exists(path):
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                return  # torn last line from a crash
+
+
+class ReviewQueue:
+    def __init__(self, data=(), kind="batches", log=()):
+        self.kind = kind
+        self.cards = []      # record id -> Card
+        self.records = []    # record id -> (batch or None, record), None once removed
+        self.ids = {}        # record key -> [live record ids]
+        self.items = []      # position in the file -> [record ids]
+        self.heap = []       # (due, record id)
+        self.history = {}    # record key -> reviews from the log, replayed onto records saved with it
+        for entry in log:
+            self.history.setdefault(entry_key(entry), []).append((entry["grade"], entry["at"]))
+        for item in data:
+            self.add(item)
+
+    def _records_of(self, item):
+        if self.kind == "records":
+            return [(None, item)]
+        return [(item, r) for r in item.get("records", [])]
+
+    def _new_id(self, batch, rec):
+        rid = len(self.records)
+        key = record_key(batch, rec)
+        card = Card(local_timestamp(key[0]) or 0)
+        for grade, at in self.history.get(key, ()):
+            card.review(grade, at)
+        self.records.append((batch, rec))
+        self.cards.append(card)
+        self.ids.setdefault(key, []).append(rid)
+        heapq.heappush(self.heap, (card.due, rid))
+        return rid
+
+    def _forget(self, rid):
+        batch, rec = self.records[rid]
+        key = record_key(batch, rec)
+        self.ids[key].remove(rid)
+        if not self.ids[key]:
+            del self.ids[key]
+        self.records[rid] = None
+
+    # the edited item's records take over the ids (and cards) of the old
+    # records with the same question; the rest are new
+    def _edit(self, rids, item):
+        old = {}
+        for rid in rids:
+            old.setdefault(self.records[rid][1].get("question", ""), []).append(rid)
+            self._forget(rid)
+        new = []
+        for batch, rec in self._records_of(item):
+            same = old.get(rec.get("question", ""))
+            if not same:
+                new.append(self._new_id(batch, rec))
+                continue
+            rid = same.pop(0)
+            self.records[rid] = (batch, rec)
+            self.ids.setdefault(record_key(batch, rec), []).append(rid)
+            new.append(rid)
+        return new
+
+    # ---------- kept current by mistake_store ----------
+    def apply(self, op, index, item):
+        if op == "add":
+            self.add(item)
+        elif op == "add_many":
+            for it in item:
+                self.add(it)
+        elif op == "edit":
+            self.items[index] = self._edit(self.items[index], item)
+        elif op == "delete":
+            for rid in self.items.pop(index):
+                self._forget(rid)
+
+    def add(self, item):
+        self.items.append([self._new_id(batch, rec) for batch, rec in self._records_of(item)])
+
+    # ---------- scheduling ----------
+    # a review counts for every saved record with that key, as it will when replayed
+    def review(self, key, grade, at):
+        self.history.setdefault(key, []).append((grade, at))
+        for rid in self.ids.get(key, ()):
+            card = self.cards[rid]
+            card.review(grade, at)
+            heapq.heappush(self.heap, (card.due, rid))
+
+    def _live(self, due, rid):
+        return self.records[rid] is not None and self.cards[rid].due == due
+
+    # up to k (due, record id) due by now, most overdue first
+    def due(self, k, now=None):
+        now = time.time() if now is None else now
+        out, seen = [], set()
+        while self.heap and len(out) < k and self.heap[0][0] <= now:
+            due, rid = heapq.heappop(self.heap)
+            if rid not in seen and self._live(due, rid):
+                seen.add(rid)
+                out.append((due, rid))
+        for entry in out:
+            heapq.heappush(self.heap, entry)
+        return out
+
+    def due_count(self, now=None):
+        now = time.time() if now is None else now
+        return sum(1 for rid, r in enumerate(self.records) if r is not None and self.cards[rid].due <= now)
+
+
+def review_queue(path):
+    return get_index(path, "reviews",
+                     lambda data, kind: ReviewQueue(data, kind, read_log(path + REVIEWS_SUFFIX)))
+
+
+def due_records(path, k=10, now=None):
+    with index_lock():
+        queue = review_queue(path)
+        return [(due, *queue.records[rid]) for due, rid in queue.due(k, now)]
+
+
+# the record is checked before anything goes into the log, so a review of a
+# record that is not in the file never gets replayed onto a later one
+def record_review(path, batch, rec, grade, at=None):
+    if not 0 <= grade <= 5:
+        raise ValueError(f"grade must be 0..5, got {grade}")
+    at = int(time.time() if at is None else at)
+    key = record_key(batch, rec)
+    with index_lock():
+        queue = review_queue(path)
+        if key not in queue.ids:
+            raise KeyError(f"no saved record {key!r}")
+    with open(path + REVIEWS_SUFFIX, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"date": key[0], "question": key[1], "grade": grade, "at": at},
+                           ensure_ascii=False) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    with index_lock():
+        queue.review(key, grade, at)
+        return max((queue.cards[rid].due for rid in queue.ids.get(key, ())), default=None)
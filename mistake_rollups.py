@@ -0,0 +1,177 @@
+import argparse
+import json
+import os
+import sys
+from collections import Counter
+
+from mistake_sqlite import split_tags
+from mistake_store import (BACKENDS, configure, get_saved_index, invalidate, load_db, settings, signature_json,
+                           version)
+from mistake_tags import normalize
+
+# Running counts of records per tag, reason, type and day, for the
+# "most common reasons" / "timeouts vs wrong" dashboards.  The counters are
+# updated by every write through mistake_store and saved as
+# "<file>.rollups", so reading one is a dict lookup:
+#
+#   r = rollups(DB_FILE)
+#   r.count("type", "timeout"), r.top("reason", 10), r.table("day")
+#
+# Tags are counted case folded, days are the first ten characters of the
+# date ("2025-10-21").  Records without a type count under "".
+#
+#   python mistake_rollups.py verify database.json --kind records
+#   python mistake_rollups.py rebuild mistake_db.json
+ROLLUPS_SUFFIX = ".rollups"
+FIELDS = ("tag", "reason", "type", "day")
+
+
+class Rollups:
+    def __init__(self, data=(), kind="batches"):
+        self.kind = kind
+        self.counts = {f: Counter() for f in FIELDS}
+        self.total = 0
+        self.keys = []       # key id -> (tags, reason, type, day), shared by equal records
+        self.key_ids = {}
+        self.items = []      # position in the file -> [key ids], to undo edits and deletes
+        self.dirty = True    # see get_saved_index
+        self.on_disk = False
+        for item in data:
+            self.add(item)
+
+    def _key_id(self, rec, date):
+        tags = tuple(dict.fromkeys(normalize(t) for t in split_tags(rec)))
+        key = (tags, (rec.get("reason") or "").strip(), rec.get("type") or "", (rec.get("date") or date or "")[:10])
+        kid = self.key_ids.get(key)
+        if kid is None:
+            kid = self.key_ids[key] = len(self.keys)
+            self.keys.append(key)
+        return kid
+
+    def _key_ids(self, item):
+        if self.kind == "records":
+            return [self._key_id(item, None)]
+        return [self._key_id(r, item.get("date")) for r in item.get("records", [])]
+
+    def _count(self, kids, sign):
+        tag, reason, type_, day = (self.counts[f] for f in FIELDS)
+        for kid in kids:
+            tags, r, t, d = self.keys[kid]
+            for counter, value in [(tag, name) for name in tags] + [(reason, r), (type_, t), (day, d)]:
+                n = counter[value] + sign
+                if n:
+                    counter[value] = n
+                else:
+                    del counter[value]
+            self.total += sign
+
+    # ---------- kept current by mistake_store ----------
+    def apply(self, op, index, item):
+        self.dirty = True
+        if op == "add":
+            self.add(item)
+        elif op == "add_many":
+            for it in item:
+                self.add(it)
+        elif op == "edit":
+            self._count(self.items[index], -1)
+            self.items[index] = self._key_ids(item)
+            self._count(self.items[index], 1)
+        elif op == "delete":
+            self._count(self.items.pop(index), -1)
+
+    def add(self, item):
+        kids = self._key_ids(item)
+        self.items.append(kids)
+        self._count(kids, 1)
+
+    # ---------- reads ----------
+    def count(self, field, value):
+        if field == "tag":
+            value = normalize(value)
+        return self.counts[field].get(value, 0)
+
+    def top(self, field, n=10):
+        return self.counts[field].most_common(n)
+
+    def table(self, field):
+        return dict(self.counts[field])
+
+    # ---------- <file>.rollups ----------
+    def save(self, path, sig):
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"signature": signature_json(sig), "kind": self.kind, "total": self.total,
+                       "counts": self.counts, "keys": self.keys, "items": self.items}, f, ensure_ascii=False)
+        os.replace(tmp, path)
+        self.dirty = False
+        self.on_disk = True
+
+    @classmethod
+    def load(cls, path, sig):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                saved = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+        if saved.get("signature") != signature_json(sig):
+            return None
+        r = cls(kind=saved["kind"])
+        r.total = saved["total"]
+        r.counts = {f: Counter(saved["counts"][f]) for f in FIELDS}
+        r.keys = [(tuple(tags), reason, type_, day) for tags, reason, type_, day in saved["keys"]]
+        r.key_ids = {key: kid for kid, key in enumerate(r.keys)}
+        r.items = saved["items"]
+        r.dirty = False
+        r.on_disk = True
+        return r
+
+
+def rollups(path):
+    return get_saved_index(path, "rollups", Rollups, ROLLUPS_SUFFIX)
+
+
+# differences between the saved/incremental counts and a fresh count of the file
+def verify(path):
+    current = rollups(path)
+    fresh = Rollups(load_db(path), current.kind)
+    problems = []
+    if current.total != fresh.total:
+        problems.append(f"total: {current.total} != {fresh.total}")
+    for f in FIELDS:
+        for k in sorted(set(current.counts[f]) | set(fresh.counts[f])):
+            if current.counts[f][k] != fresh.counts[f][k]:
+                problems.append(f"{f} {k!r}: {current.counts[f][k]} != {fresh.counts[f][k]}")
+    return problems
+
+
+# count the file from scratch and save that over <file>.rollups
+def rebuild(path):
+    invalidate(path)
+    r = Rollups(load_db(path), settings(path)[1])
+    r.save(path + ROLLUPS_SUFFIX, version(path))
+    return r
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check or rebuild the saved rollup counts of a mistake file.")
+    parser.add_argument("command", choices=("verify", "rebuild"))
+    parser.add_argument("path", help="mistake_db.json, database.json ...")
+    parser.add_argument("--backend", choices=BACKENDS, default="journal")
+    parser.add_argument("--kind", choices=("batches", "records"), default="batches")
+    args = parser.parse_args(argv)
+    configure(args.path, backend=args.backend, kind=args.kind)
+
+    if args.command == "rebuild":
+        r = rebuild(args.path)
+        print(f"{args.path}: {r.total} records counted")
+        return 0
+    problems = verify(args.path)
+    for p in problems:
+        print(p)
+    print(f"{args.path}: {'ok' if not problems else f'{len(problems)} differences'}")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,220 @@
+import heapq
+import json
+import math
+import os
+import re
+from array import array
+from bisect import bisect_left
+from collections import Counter
+
+from mistake_store import get_saved_index, index_lock, load_batch, load_db, signature_json
+
+# Full-text search over question and reason text, ranked with BM25.
+# Every term has a posting list of (record id, term count) kept in two
+# arrays in record id order; adds, edits and deletes from mistake_store
+# update it in place.  Removed records are dropped from the lists once they
+# make up DEAD_FRACTION of all records, so document frequencies only ever
+# count that many dead ones.  The index is
+# saved as "<file>.search" after it is first built and again at exit, and
+# reused by the next run while the file is unchanged.
+#
+#   search(DB_FILE, "time constant formula", k=20) -> [(score, batch, record), ...]
+#
+# Query terms are scored rarest first; once the k-th best score can't be
+# beaten by the terms left, those terms only add to documents already found
+# (MaxScore), so common words don't cost a full scan of their lists.
+SEARCH_SUFFIX = ".search"
+K1 = 1.2
+B = 0.75
+DEAD_FRACTION = 0.1
+
+_WORD = re.compile(r"\w+")
+STOP_WORDS = frozenset("a an and are as at be by for from how in is it of on or the to what when which why with".split())
+
+
+def tokens(text):
+    return [w for w in _WORD.findall(text.casefold()) if w not in STOP_WORDS]
+
+
+def _text(rec):
+    return f"{rec.get('question') or ''} {rec.get('reason') or ''}"
+
+
+class SearchIndex:
+    def __init__(self, data=(), kind="batches"):
+        self.kind = kind
+        self.postings = {}          # term -> (record ids array("I"), counts array("H"))
+        self.doc_len = array("I")   # record id -> number of terms, 0 once removed
+        self.items = []             # position in the file -> [record ids]
+        self.total_len = 0
+        self.live = 0
+        self.dead = 0               # removed records still in the posting lists
+        self.dirty = True           # changed since it was last saved, see get_saved_index
+        self.on_disk = False
+        self._where = None          # record id -> (position, index in batch)
+        for item in data:
+            self.add(item)
+
+    def _records_of(self, item):
+        return [item] if self.kind == "records" else item.get("records", [])
+
+    def _insert(self, item):
+        rids = []
+        for rec in self._records_of(item):
+            rid = len(self.doc_len)
+            counts = Counter(tokens(_text(rec)))
+            for term, tf in counts.items():
+                p = self.postings.get(term)
+                if p is None:
+                    p = self.postings[term] = (array("I"), array("H"))
+                p[0].append(rid)
+                p[1].append(min(tf, 0xFFFF))
+            n = sum(counts.values())
+            self.doc_len.append(n)
+            self.total_len += n
+            self.live += 1
+            rids.append(rid)
+        return rids
+
+    def _remove(self, rids):
+        for rid in rids:
+            self.total_len -= self.doc_len[rid]
+            self.doc_len[rid] = 0
+            self.live -= 1
+        self.dead += len(rids)
+        if self.dead > DEAD_FRACTION * len(self.doc_len):
+            self._compact()
+
+    # drop removed records from the posting lists (record ids stay as they are)
+    def _compact(self):
+        doc_len = self.doc_len
+        for term, (rids, tfs) in list(self.postings.items()):
+            kept = [(rid, tf) for rid, tf in zip(rids, tfs) if doc_len[rid]]
+            if kept:
+                self.postings[term] = (array("I", [rid for rid, _ in kept]), array("H", [tf for _, tf in kept]))
+            else:
+                del self.postings[term]
+        self.dead = 0
+
+    # ---------- kept current by mistake_store ----------
+    def apply(self, op, index, item):
+        self.dirty = True
+        if op == "add":
+            self.add(item)
+        elif op == "add_many":
+            for it in item:
+                self.add(it)
+        elif op == "edit":
+            self._remove(self.items[index])
+            self.items[index] = self._insert(item)
+            self._where = None
+        elif op == "delete":
+            self._remove(self.items.pop(index))
+            self._where = None
+
+    def add(self, item):
+        rids = self._insert(item)
+        if self._where is not None:
+            for j, rid in enumerate(rids):
+                self._where[rid] = (len(self.items), j)
+        self.items.append(rids)
+
+    def locate(self, rid):
+        if self._where is None:
+            self._where = {r: (pos, j) for pos, rids in enumerate(self.items) for j, r in enumerate(rids)}
+        return self._where[rid]
+
+    # ---------- queries ----------
+    # [(score, record id), ...] best first
+    def search(self, query, k=20):
+        terms = [t for t in dict.fromkeys(tokens(query)) if t in self.postings]
+        if not terms or not self.live:
+            return []
+        n, avg = self.live, self.total_len / self.live or 1.0
+        weighted = []
+        for t in terms:
+            df = len(self.postings[t][0])
+            weighted.append((math.log(1 + (n - df + 0.5) / (df + 0.5)), t))
+        weighted.sort(reverse=True)
+
+        doc_len = self.doc_len
+        norm = K1 * (1 - B)
+        slope = K1 * B / avg
+        scores = {}
+        for i, (idf, t) in enumerate(weighted):
+            rids, tfs = self.postings[t]
+            rest = sum(w for w, _ in weighted[i:]) * (K1 + 1)
+            if len(scores) >= k and heapq.nlargest(k, scores.values())[-1] >= rest:
+                # nothing outside the current candidates can reach the top k any more
+                for rid in scores:
+                    j = bisect_left(rids, rid)
+                    if j < len(rids) and rids[j] == rid:
+                        tf = tfs[j]
+                        scores[rid] += idf * tf * (K1 + 1) / (tf + norm + slope * doc_len[rid])
+                continue
+            for rid, tf in zip(rids, tfs):
+                dl = doc_len[rid]
+                if dl:
+                    scores[rid] = scores.get(rid, 0.0) + idf * tf * (K1 + 1) / (tf + norm + slope * dl)
+        return [(s, rid) for rid, s in heapq.nlargest(k, scores.items(), key=lambda x: x[1])]
+
+    # ---------- <file>.search ----------
+    def save(self, path, sig):
+        # renumber the live records so the file holds no removed ones
+        new_id = {}
+        items = []
+        for rids in self.items:
+            items.append([new_id.setdefault(rid, len(new_id)) for rid in rids])
+        postings = {}
+        for term, (rids, tfs) in self.postings.items():
+            pairs = sorted((new_id[rid], tf) for rid, tf in zip(rids, tfs) if rid in new_id)
+            if pairs:
+                postings[term] = [[r for r, _ in pairs], [tf for _, tf in pairs]]
+        doc_len = [0] * len(new_id)
+        for rid, nid in new_id.items():
+            doc_len[nid] = self.doc_len[rid]
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"signature": signature_json(sig), "kind": self.kind, "items": items,
+                       "doc_len": doc_len, "postings": postings}, f, ensure_ascii=False)
+        os.replace(tmp, path)
+        self.dirty = False
+        self.on_disk = True
+
+    @classmethod
+    def load(cls, path, sig):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                saved = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+        if saved.get("signature") != signature_json(sig):
+            return None
+        idx = cls(kind=saved["kind"])
+        idx.items = saved["items"]
+        idx.doc_len = array("I", saved["doc_len"])
+        idx.total_len = sum(idx.doc_len)
+        idx.live = len(idx.doc_len)
+        idx.postings = {t: (array("I", r), array("H", tf)) for t, (r, tf) in saved["postings"].items()}
+        idx.dirty = False
+        idx.on_disk = True
+        return idx
+
+
+def search_index(path):
+    return get_saved_index(path, "search", SearchIndex, SEARCH_SUFFIX)
+
+
+def search(path, query, k=20):
+    with index_lock():
+        index = search_index(path)
+        hits = [(score, index.locate(rid)) for score, rid in index.search(query, k)]
+    data = load_db(path) if index.kind == "records" and hits else None
+    out = []
+    for score, (pos, j) in hits:
+        if data is not None:
+            out.append((score, None, data[pos]))
+        else:
+            batch = load_batch(path, pos)
+            out.append((score, batch, batch["records"][j]))
+    return out
@@ -0,0 +1,346 @@
+import argparse
+import asyncio
+import json
+import re
+import sys
+from urllib.parse import parse_qs, urlsplit
+
+from mistake_rollups import FIELDS, rollups
+from mistake_search import search
+from mistake_store import (BACKENDS, ConflictError, add_many_to_db, configure, count_items, delete_from_db,
+                           edit_in_db, generation, index_lock, load_batch, load_db, load_headers, save_db,
+                           settings)
+from mistake_tags import tag_matches
+
+# One process owns the mistake file and everyone else talks JSON over HTTP,
+# on localhost or a Unix socket:
+#
+#   python mistake_server.py mistake_db.json --port 8765
+#   python mistake_server.py mistake_db.json --unix /tmp/mistake.sock
+#
+#   GET    /items                         everything (load_db)      PUT /items  replace everything (save_db)
+#   POST   /items          item           add                       POST /items/bulk  [items]
+#   GET    /items/N                       one item (load_batch)
+#   PUT    /items/N        {"item", "expect"?, "generation"?}       edit
+#   DELETE /items/N        {"expect"?, "generation"?}               delete
+#   GET|PUT|DELETE /items/N/records/M, POST /items/N/records        records inside a batch
+#   GET    /headers, /generation, /stats, /search?q=..&k=.., /tags?q=..&limit=..
+#
+# Writes answer {"index", "generation", "alone"}; "alone" is false when the
+# commit also carried other clients' adds.  A 409 is a ConflictError, a 404 a
+# position that is not there.  Connections are kept alive and pipelined
+# requests are answered in order.  Items that are not objects, and batches
+# without a "records" list, get a 400 before they are queued.
+#
+# Every write goes through one queue.  While a commit runs, the writes that
+# arrive wait; the next commit takes all of them, and runs of adds among
+# them go to disk as one add_many_to_db (one append, one fsync).  Reads run
+# on threads, off the event loop, but still wait for the store lock a commit
+# holds while it writes and syncs.  mistake_client is the other end.
+HOST = "127.0.0.1"
+PORT = 8765
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           409: "Conflict", 500: "Internal Server Error"}
+_ITEM = re.compile(r"^/items/(\d+)$")
+_RECORDS = re.compile(r"^/items/(\d+)/records$")
+_RECORD = re.compile(r"^/items/(\d+)/records/(\d+)$")
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class Write:
+    __slots__ = ("op", "index", "item", "expect", "generation", "future")
+
+    def __init__(self, op, index=None, item=None, expect=None, generation=None, future=None):
+        self.op = op
+        self.index = index
+        self.item = item
+        self.expect = expect
+        self.generation = generation
+        self.future = future
+
+
+def check_item(item, kind):
+    if not isinstance(item, dict):
+        raise HttpError(400, f"an item must be an object, got {type(item).__name__}")
+    if kind == "batches" and not isinstance(item.get("records"), list):
+        raise HttpError(400, "a batch needs a \"records\" list")
+    return item
+
+
+def check_items(items, kind):
+    if not isinstance(items, list):
+        raise HttpError(400, f"expected a list of items, got {type(items).__name__}")
+    for item in items:
+        check_item(item, kind)
+    return items
+
+
+class MistakeServer:
+    def __init__(self, path):
+        self.path = path
+        self.kind = settings(path)[1]
+        self.queue = None
+        self.loop = None
+        self.commits = 0
+        self.writes = 0
+
+    # ---------- group commit ----------
+    async def writer(self):
+        while True:
+            group = [await self.queue.get()]
+            while not self.queue.empty():
+                group.append(self.queue.get_nowait())
+            await self.loop.run_in_executor(None, self.commit, group)
+
+    def _resolve(self, w, result=None, error=None):
+        if error is not None:
+            self.loop.call_soon_threadsafe(w.future.set_exception, error)
+        else:
+            self.loop.call_soon_threadsafe(w.future.set_result, result)
+
+    # runs on a thread; writes are applied in the order they arrived
+    def commit(self, group):
+        i = 0
+        while i < len(group):
+            w = group[i]
+            if w.op in ("add", "add_many"):
+                run = []
+                while i < len(group) and group[i].op in ("add", "add_many"):
+                    run.append(group[i])
+                    i += 1
+                self._commit_adds(run)
+                continue
+            i += 1
+            try:
+                result = self._commit_one(w)
+            except Exception as e:
+                self._resolve(w, error=e)
+            else:
+                self._resolve(w, result)
+
+    # a bad write is answered on its own; the others in the run still commit
+    def _commit_adds(self, run):
+        items, valid = [], []
+        for w in run:
+            try:
+                new = check_items(w.item, self.kind) if w.op == "add_many" else [check_item(w.item, self.kind)]
+            except HttpError as e:
+                self._resolve(w, error=e)
+                continue
+            items.extend(new)
+            valid.append(w)
+        run = valid
+        if not run:
+            return
+        try:
+            start = count_items(self.path)
+            add_many_to_db(self.path, items)
+            gen = generation(self.path)
+        except Exception as e:
+            for w in run:
+                self._resolve(w, error=e)
+            return
+        self.commits += 1
+        self.writes += len(run)
+        for w in run:
+            self._resolve(w, {"index": start, "generation": gen, "alone": len(run) == 1})
+            start += len(w.item) if w.op == "add_many" else 1
+
+    def _commit_one(self, w):
+        index = w.index
+        if w.op == "edit":
+            index = edit_in_db(self.path, index, w.item, expect=w.expect, generation=w.generation)
+        elif w.op == "delete":
+            index = delete_from_db(self.path, index, expect=w.expect, generation=w.generation)
+        elif w.op == "save":
+            save_db(self.path, w.item)
+        elif w.op == "record":
+            index = self._commit_record(w)
+        self.commits += 1
+        self.writes += 1
+        return {"index": index, "generation": generation(self.path), "alone": True}
+
+    # add (index=None), replace or delete (item=None) one record inside a batch
+    def _commit_record(self, w):
+        batch_index, rec_index = w.index
+        batch = load_batch(self.path, batch_index)
+        header = load_headers(self.path)[batch_index]
+        records = list(batch.get("records", []))
+        if rec_index is None:
+            records.append(w.item)
+            rec_index = len(records) - 1
+        elif not 0 <= rec_index < len(records):
+            raise IndexError(f"batch {batch_index} has no record {rec_index}")
+        elif w.item is None:
+            del records[rec_index]
+        else:
+            records[rec_index] = w.item
+        edit_in_db(self.path, batch_index, dict(batch, records=records), expect=header)
+        return [batch_index, rec_index]
+
+    async def write(self, op, index=None, item=None, expect=None, generation=None):
+        w = Write(op, index, item, expect, generation, self.loop.create_future())
+        await self.queue.put(w)
+        return await w.future
+
+    # ---------- requests ----------
+    async def read(self, fn, *args):
+        return await self.loop.run_in_executor(None, fn, *args)
+
+    # the commit thread updates the same counts, so they are read under the store lock
+    def _stats(self):
+        with index_lock():
+            r = rollups(self.path)
+            top = {f: r.top(f, 10) for f in FIELDS if f != "day"}
+            total = r.total
+        return {"total": total, "generation": generation(self.path), "commits": self.commits,
+                "writes": self.writes, **top}
+
+    def _tags(self, expr, limit):
+        matches, records = tag_matches(self.path, expr, limit)
+        return {"matches": matches, "records": [{"batch": b, "record": r} for b, r in records]}
+
+    def _record(self, batch_index, rec_index):
+        records = load_batch(self.path, batch_index).get("records", [])
+        if not 0 <= rec_index < len(records):
+            raise IndexError(f"batch {batch_index} has no record {rec_index}")
+        return records[rec_index]
+
+    async def dispatch(self, method, target, body):
+        url = urlsplit(target)
+        path, query = url.path.rstrip("/") or "/", parse_qs(url.query)
+        arg = lambda name, default=None: query.get(name, [default])[0]
+        data = json.loads(body) if body else None
+
+        if path == "/items":
+            if method == "GET":
+                return await self.read(load_db, self.path)
+            if method == "POST":
+                return await self.write("add", item=check_item(data, self.kind))
+            if method == "PUT":
+                return await self.write("save", item=check_items(data, self.kind))
+        elif path == "/items/bulk" and method == "POST":
+            return await self.write("add_many", item=check_items(data, self.kind))
+        elif m := _ITEM.match(path):
+            index = int(m.group(1))
+            if method == "GET":
+                return await self.read(load_batch, self.path, index)
+            data = data or {}
+            if not isinstance(data, dict):
+                raise HttpError(400, "expected an object")
+            if method == "PUT":
+                item = check_item(data.get("item"), self.kind)
+                return await self.write("edit", index, item, data.get("expect"), data.get("generation"))
+            if method == "DELETE":
+                return await self.write("delete", index, None, data.get("expect"), data.get("generation"))
+        elif m := _RECORDS.match(path):
+            if method == "POST":
+                return await self.write("record", (int(m.group(1)), None), check_item(data, "records"))
+        elif m := _RECORD.match(path):
+            index = (int(m.group(1)), int(m.group(2)))
+            if method == "GET":
+                return await self.read(self._record, *index)
+            if method == "PUT":
+                return await self.write("record", index, check_item(data, "records"))
+            if method == "DELETE":
+                return await self.write("record", index, None)
+        elif method == "GET" and path == "/headers":
+            return [[h["title"], h["date"], h["count"]] for h in await self.read(load_headers, self.path)]
+        elif method == "GET" and path == "/generation":
+            return await self.read(generation, self.path)
+        elif method == "GET" and path == "/stats":
+            return await self.read(self._stats)
+        elif method == "GET" and path == "/search":
+            hits = await self.read(search, self.path, arg("q", ""), int(arg("k", 20)))
+            return [{"score": s, "batch": b, "record": r} for s, b, r in hits]
+        elif method == "GET" and path == "/tags":
+            limit = arg("limit")
+            return await self.read(self._tags, arg("q", ""), int(limit) if limit else None)
+        else:
+            raise HttpError(404, f"no such endpoint {path}")
+        raise HttpError(405, f"{method} not allowed on {path}")
+
+    async def respond(self, method, target, body):
+        try:
+            return 200, await self.dispatch(method, target, body)
+        except HttpError as e:
+            return e.status, {"error": str(e)}
+        except ConflictError as e:
+            return 409, {"error": str(e)}
+        except IndexError as e:
+            return 404, {"error": str(e) or "no item at that position"}
+        except (ValueError, KeyError, TypeError) as e:
+            return 400, {"error": str(e)}
+        except Exception as e:
+            return 500, {"error": f"{type(e).__name__}: {e}"}
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                method, target, version = line.decode("latin-1").split()
+                headers = {}
+                while True:
+                    h = await reader.readline()
+                    if h in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = h.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                n = int(headers.get("content-length", 0))
+                body = await reader.readexactly(n) if n else b""
+                status, payload = await self.respond(method, target, body)
+                data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                writer.write(f"HTTP/1.1 {status} {REASONS[status]}\r\nContent-Type: application/json\r\n"
+                             f"Content-Length: {len(data)}\r\n\r\n".encode("latin-1") + data)
+                await writer.drain()
+                if version == "HTTP/1.0" or headers.get("connection", "").lower() == "close":
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass  # client went away or sent garbage
+        finally:
+            writer.close()
+
+    async def serve(self, host=HOST, port=PORT, unix=None):
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue()
+        writer = asyncio.create_task(self.writer())
+        if unix:
+            server = await asyncio.start_unix_server(self.handle, unix)
+        else:
+            server = await asyncio.start_server(self.handle, host, port)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            writer.cancel()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve one mistake file to local clients over HTTP/JSON.")
+    parser.add_argument("path", help="mistake_db.json, database.json ...")
+    parser.add_argument("--backend", choices=[b for b in BACKENDS if b != "remote"], default="journal")
+    parser.add_argument("--kind", choices=("batches", "records"), default="batches")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--unix", help="listen on this Unix socket instead")
+    args = parser.parse_args(argv)
+    configure(args.path, backend=args.backend, kind=args.kind)
+
+    where = f"unix:{args.unix}" if args.unix else f"http://{args.host}:{args.port}"
+    print(f"serving {args.path} on {where}", file=sys.stderr)
+    try:
+        asyncio.run(MistakeServer(args.path).serve(args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,266 @@
+import hashlib
+import json
+import os
+import random
+import re
+import time
+from collections import Counter
+from functools import lru_cache
+
+from mistake_store import load_db
+from mistake_trace import span, traced
+from mistake_workers import check_cancelled, progress
+
+# Google Sheets mirror of a batches file, one row per record under a header
+# row.  The batches sit on the sheet in file order, and "<file>.sheets"
+# remembers where each one starts and a hash of its rows, so a sync only
+# sends the rows of batches that changed or moved:
+#
+#   ws = open_worksheet("credentials.json", "Mistake Tracker")   # one client, reused
+#   sync_to_sheet(DB_FILE, ws)   -> {"batches": 2, "rows": 37, "requests": 1}
+#
+# The grid is first grown to the new extent with resize, then the changed
+# rows go out as batch_update ranges, CHUNK_ROWS rows per request, and rows
+# left over after a shrink are cleared with one batch_clear.  Every one of
+# those requests sets absolute cells or sizes, so a request whose response
+# was lost can be sent again safely: quota (429) and server (5xx) errors are
+# retried with exponential backoff.  (append_rows is not used: retrying it
+# after a lost response would add the rows twice.)
+# FakeWorksheet stands in for a gspread worksheet when trying this offline.
+STATE_SUFFIX = ".sheets"
+HEADER = ["Batch Title", "Date", "Question", "Reason", "Tag"]
+LAST_COLUMN = "E"
+CHUNK_ROWS = 1000
+RETRIES = 5
+BACKOFF = 1.0  # seconds before the first retry, doubled for each one after
+
+
+def batch_rows(batch):
+    return [[batch.get("title", ""), batch.get("date", ""), r.get("question", ""), r.get("reason", ""),
+             r.get("tag", "")] for r in batch.get("records", [])]
+
+
+def content_hash(rows):
+    return hashlib.sha1(json.dumps(rows, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def retryable(e):
+    status = getattr(getattr(e, "response", None), "status_code", None)
+    if status is not None:
+        return status == 429 or status >= 500
+    return isinstance(e, (ConnectionError, TimeoutError))
+
+
+def with_retry(fn, *args, retries=RETRIES, backoff=BACKOFF, sleep=time.sleep, **kwargs):
+    for attempt in range(retries + 1):
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            if attempt == retries or not retryable(e):
+                raise
+            sleep(backoff * 2 ** attempt * (1 + random.random() / 2))
+
+
+# gspread and oauth2client are only needed for the real sheet
+@lru_cache(maxsize=None)
+def _client(credentials):
+    import gspread
+    from oauth2client.service_account import ServiceAccountCredentials
+    scope = ["https://spreadsheets.google.com/feeds",
+             "https://www.googleapis.com/auth/drive"]
+    creds = ServiceAccountCredentials.from_json_keyfile_name(credentials, scope)
+    return gspread.authorize(creds)
+
+
+@lru_cache(maxsize=None)
+def open_worksheet(credentials, name):
+    return with_retry(_client(credentials).open, name).sheet1
+
+
+def _a1(start, end):
+    return f"A{start}:{LAST_COLUMN}{end}"
+
+
+def _sheet_id(worksheet):
+    spreadsheet = getattr(worksheet, "spreadsheet", None)
+    return f"{getattr(spreadsheet, 'id', '')}/{getattr(worksheet, 'id', '')}"
+
+
+class SheetSync:
+    def __init__(self, worksheet, state_path=None, sleep=time.sleep):
+        self.worksheet = worksheet
+        self.state_path = state_path
+        self.sleep = sleep
+        self.requests = 0
+        self.state = self.load_state()
+
+    # ---------- <file>.sheets ----------
+    def load_state(self):
+        if self.state_path is None or not os.path.exists(self.state_path):
+            return None
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+        return state if state.get("sheet") == _sheet_id(self.worksheet) else None
+
+    def save_state(self, state):
+        self.state = state
+        if self.state_path is None:
+            return
+        tmp = self.state_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(tmp, self.state_path)
+
+    def _call(self, method, *args, **kwargs):
+        check_cancelled()
+        self.requests += 1
+        with span("sheets." + method):
+            return with_retry(getattr(self.worksheet, method), *args, sleep=self.sleep, **kwargs)
+
+    # ---------- planning ----------
+    # the new layout, and the runs of rows [(first row, rows)] that differ from the sheet
+    def plan(self, db, state):
+        old = state["batches"] if state else {}
+        batches, runs = {}, []
+        seen = Counter()
+        row = 2  # under the header
+        changed = 0
+        for batch in db:
+            key = f"{batch.get('title', '')}\x1f{batch.get('date', '')}"
+            seen[key] += 1
+            if seen[key] > 1:
+                key = f"{key}\x1f{seen[key]}"  # same title and date saved twice
+            rows = batch_rows(batch)
+            h = content_hash(rows)
+            prev = old.get(key)
+            if not prev or prev["hash"] != h or prev["start"] != row:
+                changed += 1
+                if runs and runs[-1][0] + len(runs[-1][1]) == row:
+                    runs[-1][1].extend(rows)
+                elif rows:
+                    runs.append((row, list(rows)))
+            batches[key] = {"hash": h, "start": row, "rows": len(rows)}
+            row += len(rows)
+        return batches, runs, row, changed
+
+    # ---------- pushing ----------
+    def sync(self, db, force=False):
+        state = None if force else self.state
+        self.requests = 0
+        batches, runs, end, changed = self.plan(db, state)
+        if state is None:
+            # first sync with this sheet: start from an empty one
+            self._call("clear")
+            runs = [(1, [HEADER] + [r for _, rows in runs for r in rows])]
+            old_end = 1
+        else:
+            old_end = state["end"]
+
+        total = sum(len(rows) for _, rows in runs)
+        done = 0
+        if end - 1 > self.worksheet.row_count:
+            self._call("resize", rows=end - 1)
+
+        data, size = [], 0
+        for start, rows in runs:
+            for i in range(0, len(rows), CHUNK_ROWS):
+                part = rows[i:i + CHUNK_ROWS]
+                if size + len(part) > CHUNK_ROWS and data:
+                    self._call("batch_update", data, value_input_option="RAW")
+                    done += size
+                    progress(done, total)
+                    data, size = [], 0
+                data.append({"range": _a1(start + i, start + i + len(part) - 1), "values": part})
+                size += len(part)
+        if data:
+            self._call("batch_update", data, value_input_option="RAW")
+            done += size
+            progress(done, total)
+        if end < old_end:
+            self._call("batch_clear", [_a1(end, old_end - 1)])
+
+        self.save_state({"sheet": _sheet_id(self.worksheet), "end": end, "batches": batches})
+        return {"batches": changed, "rows": done, "requests": self.requests}
+
+
+@traced("export.sheets")
+def sync_to_sheet(path, worksheet, force=False):
+    return SheetSync(worksheet, path + STATE_SUFFIX).sync(load_db(path), force)
+
+
+# ---------- offline stand-in for a gspread Worksheet ----------
+class FakeResponse:
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+class FakeAPIError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.response = FakeResponse(status_code)
+
+
+class FakeWorksheet:
+    def __init__(self, row_count=1000, id=0):
+        self.id = id
+        self.values = []         # rows as lists, like get_all_values()
+        self.row_count = row_count
+        self.calls = Counter()   # method -> requests served
+        self.failures = []       # status codes to raise on the next requests
+        self.lost = []           # status codes to raise after serving the next requests
+
+    def _request(self, method):
+        if self.failures:
+            raise FakeAPIError(self.failures.pop(0))
+        self.calls[method] += 1
+
+    # the request was carried out but the response never arrived
+    def _respond(self):
+        if self.lost:
+            raise FakeAPIError(self.lost.pop(0))
+
+    def _put(self, row, values):
+        while len(self.values) < row:
+            self.values.append([])
+        self.values[row - 1] = list(values)
+
+    def _trim(self):
+        while self.values and not any(self.values[-1]):
+            self.values.pop()
+
+    def clear(self):
+        self._request("clear")
+        self.values = []
+        self._respond()
+
+    def resize(self, rows=None, cols=None):
+        self._request("resize")
+        if rows is not None:
+            self.row_count = rows
+            del self.values[rows:]
+        self._respond()
+
+    def batch_update(self, data, value_input_option="RAW"):
+        self._request("batch_update")
+        for entry in data:
+            start, end = map(int, re.findall(r"\d+", entry["range"]))
+            if end > self.row_count:
+                raise FakeAPIError(400)  # past the grid, like the real API
+            for i, row in enumerate(entry["values"]):
+                self._put(start + i, row)
+        self._respond()
+
+    def batch_clear(self, ranges):
+        self._request("batch_clear")
+        for r in ranges:
+            start, end = map(int, re.findall(r"\d+", r))
+            for row in range(start, min(end, len(self.values)) + 1):
+                self.values[row - 1] = []
+        self._trim()
+        self._respond()
+
+    def get_all_values(self):
+        return [list(row) for row in self.values]
@@ -0,0 +1,190 @@
+import json
+import mmap
+import os
+import threading
+
+from mistake_binary import BinaryFile, save_binary
+from mistake_lock import get_lock
+from mistake_store import (get_store, iter_db, load_batch, load_headers, load_records, settings, signature_json,
+                           version)
+
+# Read-only snapshots for the batch viewers.  The current contents of a
+# mistake file are written once in the binary format (mistake_binary) to
+# "<file>.snap" and opened with mmap, so every viewer in this process shares
+# one mapping and other processes share the same pages through the OS page
+# cache.  Headers and batches are decoded only when asked for:
+#
+#   snap = open_snapshot(DB_FILE)
+#   len(snap), snap.header(i) -> {"title", "date", "count"}, snap.item(i) -> batch
+#   snap.records(i, lo, hi) -> records lo..hi of batch i, decoded on their own
+#
+# The viewers hold a SnapshotRows instead of a list of headers: it indexes
+# and deletes like one but keeps nothing but the row numbers.
+#
+# "<file>.snap.meta" records which version of the file (store.version, so
+# a journal compaction keeps it) the snapshot was made from; open_snapshot
+# rebuilds it after a change, streaming the items through store.iter_db so
+# the file is never loaded whole.  A binary-backend file is already in this
+# format and is mapped as it is.
+#
+# A rebuild is O(n), so the viewers never wait for one: snapshot_rows(path,
+# workers) gives them the snapshot when it is current and otherwise StoreRows
+# over load_headers/load_batch, and has the workers build it for the next
+# open.  SQLite and remote files look headers and batches up themselves and
+# always get StoreRows.
+SNAP_SUFFIX = ".snap"
+
+_open = {}        # abspath -> (version, BinaryFile over an mmap)
+_building = set()  # abspaths with a rebuild queued on the workers
+_lock = threading.Lock()   # guards the two above, never held across a build
+
+
+def snapshot_path(path):
+    return path + SNAP_SUFFIX
+
+
+def _read_meta(path):
+    try:
+        with open(snapshot_path(path) + ".meta", "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+# the version is read before the items, so a write in between only makes
+# the next open rebuild again
+def _build(path, ver):
+    snap = snapshot_path(path)
+    save_binary(snap, iter_db(path), kind=1 if settings(path)[1] == "records" else 0)
+    tmp = snap + ".meta.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"version": ver}, f)
+    os.replace(tmp, snap + ".meta")
+
+
+def _is_built(path, ver):
+    meta = _read_meta(path)
+    return meta is not None and meta.get("version") == ver and os.path.exists(snapshot_path(path))
+
+
+def _remember(key, ver, snap):
+    with _lock:
+        _open[key] = (ver, snap)
+    return snap
+
+
+# the snapshot of the file as it is now, or None when that needs a rebuild
+def current_snapshot(path):
+    key = os.path.abspath(path)
+    ver = signature_json(version(path))
+    with _lock:
+        cached = _open.get(key)
+    if cached is not None and cached[0] == ver:
+        return cached[1]
+    if settings(path)[0] == "binary" and os.path.exists(get_store(path).path):
+        return _remember(key, ver, _map(get_store(path).path))
+    if _is_built(path, ver):
+        return _remember(key, ver, _map(snapshot_path(path)))
+    return None
+
+
+def open_snapshot(path):
+    snap = current_snapshot(path)
+    if snap is not None:
+        return snap
+    ver = signature_json(version(path))
+    # one process builds it, the others wait and then map the result
+    with get_lock(snapshot_path(path)):
+        if not _is_built(path, ver):
+            _build(path, ver)
+    return _remember(os.path.abspath(path), ver, _map(snapshot_path(path)))
+
+
+def _map(snap_path):
+    with open(snap_path, "rb") as f:
+        # the mapping outlives the file object and survives a later rebuild
+        # (os.replace leaves already-mapped pages alone)
+        m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return BinaryFile(m)
+
+
+class SnapshotRows:
+    def __init__(self, snap):
+        self.snap = snap
+        self.rows = range(len(snap))
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, index):
+        return self.snap.header(self.rows[index])
+
+    def __iter__(self):
+        for row in self.rows:
+            yield self.snap.header(row)
+
+    # a row this window deleted itself; the rest of the snapshot is still right
+    def __delitem__(self, index):
+        if isinstance(self.rows, range):
+            self.rows = list(self.rows)
+        del self.rows[index]
+
+    def batch(self, index):
+        return self.snap.item(self.rows[index])
+
+    def records(self, index, lo, hi):
+        return self.snap.records(self.rows[index], lo, hi)
+
+
+# the same calls over load_headers/load_batch; positions are the store's
+# current ones, which this window's own deletes keep in step
+class StoreRows:
+    def __init__(self, path):
+        self.path = path
+        self.headers = load_headers(path)
+
+    def __len__(self):
+        return len(self.headers)
+
+    def __getitem__(self, index):
+        return self.headers[index]
+
+    def __iter__(self):
+        return iter(self.headers)
+
+    def __delitem__(self, index):
+        del self.headers[index]
+
+    def batch(self, index):
+        return load_batch(self.path, index)
+
+    def records(self, index, lo, hi):
+        return load_records(self.path, index, lo, hi)
+
+
+def _build_later(path, workers):
+    key = os.path.abspath(path)
+    with _lock:
+        if key in _building:
+            return
+        _building.add(key)
+
+    def build():
+        try:
+            open_snapshot(path)
+        finally:
+            with _lock:
+                _building.discard(key)
+    workers.submit(build)
+
+
+# without workers a stale snapshot is left for open_snapshot to rebuild
+def snapshot_rows(path, workers=None):
+    if settings(path)[0] in ("sqlite", "remote"):
+        return StoreRows(path)
+    snap = current_snapshot(path)
+    if snap is not None:
+        return SnapshotRows(snap)
+    if workers is not None:
+        _build_later(path, workers)
+    return StoreRows(path)
@@ -0,0 +1,344 @@
+import json
+import os
+import sqlite3
+import threading
+
+# Optional SQLite backend with the same load/save/add/edit/delete calls as
+# mistake_journal.Journal.  kind="batches" stores the mistake_db.json layout
+# ({title, date, records: [{question, reason, tag}]}), kind="records" stores
+# the flat database.json layout ({question, type, reason, tags, date}).
+# Items come back exactly as they were saved: keys outside those layouts,
+# layout values a TEXT column would change (numbers, a tags list that does
+# not survive the comma join) and the layout keys an item did not have are
+# kept as JSON in the "extra" column.
+# Positions map to row ids through a list kept in memory, reread only when
+# another connection has committed (PRAGMA data_version).
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS batches (
+    id    INTEGER PRIMARY KEY,
+    title TEXT,
+    date  TEXT,
+    extra TEXT
+);
+CREATE TABLE IF NOT EXISTS records (
+    id       INTEGER PRIMARY KEY,
+    batch_id INTEGER REFERENCES batches(id) ON DELETE CASCADE,
+    question TEXT,
+    reason   TEXT,
+    tag      TEXT,
+    type     TEXT,
+    date     TEXT,
+    extra    TEXT
+);
+CREATE TABLE IF NOT EXISTS record_tags (
+    record_id INTEGER NOT NULL REFERENCES records(id) ON DELETE CASCADE,
+    tag       TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_batches_date ON batches(date);
+CREATE INDEX IF NOT EXISTS idx_records_batch ON records(batch_id, id);
+CREATE INDEX IF NOT EXISTS idx_records_date ON records(date);
+CREATE INDEX IF NOT EXISTS idx_records_type ON records(type);
+CREATE INDEX IF NOT EXISTS idx_record_tags_tag ON record_tags(tag, record_id);
+CREATE INDEX IF NOT EXISTS idx_record_tags_record ON record_tags(record_id);
+"""
+
+
+# ----------------- helpers -----------------
+def split_tags(rec):
+    if "tags" in rec:
+        tags = rec.get("tags") or []
+        if isinstance(tags, str):
+            tags = tags.split(",")
+    else:
+        tag = rec.get("tag")
+        tags = tag.split(",") if isinstance(tag, str) else []
+    return [t.strip() for t in tags if isinstance(t, str) and t.strip()]
+
+
+BATCH_KEYS = ("title", "date", "records")
+BATCH_RECORD_KEYS = ("question", "reason", "tag")
+RECORD_KEYS = ("question", "type", "reason", "tags", "date")
+ABSENT = "\x00absent"   # in extra: the layout keys the item did not have
+
+
+def _text(value):
+    return value if value is None or isinstance(value, str) else json.dumps(value, ensure_ascii=False)
+
+
+def _tag_list(joined):
+    return [t for t in (joined or "").split(",") if t]
+
+
+def _exact(key, value):
+    if key == "records":
+        return isinstance(value, list)
+    if key == "tags":
+        return (isinstance(value, list) and all(isinstance(t, str) for t in value)
+                and _tag_list(",".join(value)) == value)
+    return value is None or isinstance(value, str)
+
+
+def _extra(item, known):
+    extra = {k: v for k, v in item.items() if k not in known or not _exact(k, v)}
+    absent = [k for k in known if k not in item]
+    if absent:
+        extra[ABSENT] = absent
+    return json.dumps(extra, ensure_ascii=False) if extra else None
+
+
+def _with_extra(item, extra):
+    if extra:
+        extra = json.loads(extra)
+        for k in extra.pop(ABSENT, ()):
+            item.pop(k, None)
+        item.update(extra)
+    return item
+
+
+def _records_of(batch):
+    records = batch.get("records")
+    return records if isinstance(records, list) else []
+
+
+def sqlite_path_for(json_path):
+    return os.path.splitext(json_path)[0] + ".sqlite3"
+
+
+# ----------------- store -----------------
+class SqliteStore:
+    def __init__(self, path, kind="batches", seed_json=None):
+        self.path = path
+        self.kind = kind
+        self.lock = threading.Lock()
+        is_new = not os.path.exists(path)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        for table in ("batches", "records"):  # files made before the extra column
+            if "extra" not in {c[1] for c in self.conn.execute(f"PRAGMA table_info({table})")}:
+                self.conn.execute(f"ALTER TABLE {table} ADD COLUMN extra TEXT")
+        self._allow_null_titles()
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        self.ids = None       # position -> row id of the top-level items
+        self.version = None   # data_version self.ids was read at
+        # first open next to an existing JSON file: copy it in once
+        if is_new and seed_json and os.path.exists(seed_json):
+            with open(seed_json, "r", encoding="utf-8") as f:
+                try:
+                    self.save(json.load(f))
+                except json.JSONDecodeError:
+                    pass
+
+    # files made when title was NOT NULL; SQLite can only drop that by copying
+    # the table, with foreign keys off so the records are not cascaded away
+    def _allow_null_titles(self):
+        columns = {c[1]: c[3] for c in self.conn.execute("PRAGMA table_info(batches)")}
+        if not columns.get("title"):
+            return
+        self.conn.executescript("""
+            BEGIN;
+            CREATE TABLE batches_new (id INTEGER PRIMARY KEY, title TEXT, date TEXT, extra TEXT);
+            INSERT INTO batches_new (id, title, date, extra) SELECT id, title, date, extra FROM batches;
+            DROP TABLE batches;
+            ALTER TABLE batches_new RENAME TO batches;
+            CREATE INDEX IF NOT EXISTS idx_batches_date ON batches(date);
+            COMMIT;
+        """)
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    # ---------- inserts ----------
+    # batch records keep type and date in their columns for the lookups, and
+    # in extra too when they were given, since load only returns the base
+    # keys; their tag string is stored as it was typed
+    def _record_values(self, rec, batch=None):
+        tags = split_tags(rec)
+        if batch is None:
+            known, tag, date = RECORD_KEYS, ",".join(tags), rec.get("date")
+        else:
+            known, tag, date = BATCH_RECORD_KEYS, rec.get("tag"), rec.get("date", batch.get("date"))
+        return tags, (_text(rec.get("question")), _text(rec.get("reason")), _text(tag), _text(rec.get("type")),
+                      _text(date), _extra(rec, known))
+
+    def _insert_record(self, cur, rec, batch_id=None, batch=None):
+        tags, values = self._record_values(rec, batch)
+        cur.execute("INSERT INTO records (batch_id, question, reason, tag, type, date, extra) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)", (batch_id,) + values)
+        rid = cur.lastrowid
+        cur.executemany("INSERT INTO record_tags (record_id, tag) VALUES (?, ?)",
+                        [(rid, t) for t in tags])
+        return rid
+
+    def _insert_item(self, cur, item):
+        if self.kind == "records":
+            return self._insert_record(cur, item)
+        cur.execute("INSERT INTO batches (title, date, extra) VALUES (?, ?, ?)",
+                    (_text(item.get("title")), _text(item.get("date")), _extra(item, BATCH_KEYS)))
+        bid = cur.lastrowid
+        for rec in _records_of(item):
+            self._insert_record(cur, rec, bid, item)
+        return bid
+
+    # ---------- position -> row id ----------
+    def _positions(self, cur):
+        version = cur.execute("PRAGMA data_version").fetchone()[0]
+        if self.ids is None or version != self.version:
+            if self.kind == "records":
+                sql = "SELECT id FROM records WHERE batch_id IS NULL ORDER BY id"
+            else:
+                sql = "SELECT id FROM batches ORDER BY id"
+            self.ids = [row[0] for row in cur.execute(sql)]
+            self.version = version
+        return self.ids
+
+    def _id_at(self, cur, index):
+        ids = self._positions(cur)
+        if not -len(ids) <= index < len(ids):
+            raise IndexError(index)
+        return ids[index]
+
+    # ---------- rows -> dicts ----------
+    def _flat(self, row):
+        rid, question, reason, tag, rtype, date, extra = row
+        return _with_extra({"question": question, "type": rtype, "reason": reason,
+                            "tags": _tag_list(tag), "date": date}, extra)
+
+    def _batch(self, cur, bid, title, date, extra):
+        recs = cur.execute(
+            "SELECT question, reason, tag, extra FROM records WHERE batch_id = ? ORDER BY id", (bid,))
+        return _with_extra({"title": title, "date": date,
+                            "records": [_with_extra({"question": q, "reason": r, "tag": t}, x)
+                                        for q, r, t, x in recs]}, extra)
+
+    # ---------- load_db / save_db level API ----------
+    def load(self):
+        with self.lock:
+            cur = self.conn.cursor()
+            if self.kind == "records":
+                rows = cur.execute("SELECT id, question, reason, tag, type, date, extra FROM records "
+                                   "WHERE batch_id IS NULL ORDER BY id")
+                return [self._flat(r) for r in rows]
+            records = {}
+            for bid, q, r, t, x in cur.execute("SELECT batch_id, question, reason, tag, extra FROM records "
+                                               "WHERE batch_id IS NOT NULL ORDER BY batch_id, id"):
+                records.setdefault(bid, []).append(_with_extra({"question": q, "reason": r, "tag": t}, x))
+            return [_with_extra({"title": title, "date": date, "records": records.get(bid, [])}, extra)
+                    for bid, title, date, extra in cur.execute("SELECT id, title, date, extra FROM batches ORDER BY id")]
+
+    def save(self, data):
+        with self.lock:
+            self.ids = None
+            with self.conn:
+                cur = self.conn.cursor()
+                cur.execute("DELETE FROM record_tags")
+                cur.execute("DELETE FROM records")
+                cur.execute("DELETE FROM batches")
+                for item in data:
+                    self._insert_item(cur, item)
+
+    def add(self, item):
+        self.add_many([item])
+
+    # the position list follows our own commits; other connections' show up in data_version
+    def add_many(self, items):
+        with self.lock:
+            with self.conn:
+                cur = self.conn.cursor()
+                ids = self._positions(cur)
+                new = [self._insert_item(cur, item) for item in items]
+            ids.extend(new)
+
+    def delete(self, index):
+        with self.lock:
+            with self.conn:
+                cur = self.conn.cursor()
+                rid = self._id_at(cur, index)
+                if self.kind == "records":
+                    cur.execute("DELETE FROM records WHERE id = ?", (rid,))
+                else:
+                    cur.execute("DELETE FROM batches WHERE id = ?", (rid,))
+            del self.ids[index]
+
+    def edit(self, index, item):
+        with self.lock, self.conn:
+            cur = self.conn.cursor()
+            rid = self._id_at(cur, index)
+            if self.kind == "records":
+                tags, values = self._record_values(item)
+                cur.execute("UPDATE records SET question = ?, reason = ?, tag = ?, type = ?, date = ?, extra = ? "
+                            "WHERE id = ?", values + (rid,))
+                cur.execute("DELETE FROM record_tags WHERE record_id = ?", (rid,))
+                cur.executemany("INSERT INTO record_tags (record_id, tag) VALUES (?, ?)",
+                                [(rid, t) for t in tags])
+                return
+            cur.execute("UPDATE batches SET title = ?, date = ?, extra = ? WHERE id = ?",
+                        (_text(item.get("title")), _text(item.get("date")), _extra(item, BATCH_KEYS), rid))
+            cur.execute("DELETE FROM records WHERE batch_id = ?", (rid,))
+            for rec in _records_of(item):
+                self._insert_record(cur, rec, rid, item)
+
+    # ---------- lookups (cost follows the result, not the file) ----------
+    def count(self):
+        with self.lock:
+            return len(self._positions(self.conn.cursor()))
+
+    def get(self, index):
+        with self.lock:
+            cur = self.conn.cursor()
+            rid = self._id_at(cur, index)
+            if self.kind == "records":
+                row = cur.execute("SELECT id, question, reason, tag, type, date, extra FROM records "
+                                  "WHERE id = ?", (rid,)).fetchone()
+                return self._flat(row)
+            title, date, extra = cur.execute("SELECT title, date, extra FROM batches WHERE id = ?", (rid,)).fetchone()
+            return self._batch(cur, rid, title, date, extra)
+
+    def records(self, index, lo, hi):
+        with self.lock:
+            cur = self.conn.cursor()
+            rid = self._id_at(cur, index)
+            rows = cur.execute("SELECT question, reason, tag, extra FROM records WHERE batch_id = ? "
+                               "ORDER BY id LIMIT ? OFFSET ?", (rid, max(hi - lo, 0), max(lo, 0)))
+            return [_with_extra({"question": q, "reason": r, "tag": t}, x) for q, r, t, x in rows]
+
+    def headers(self):
+        with self.lock:
+            return self.conn.execute(
+                "SELECT b.title, b.date, COUNT(r.id) FROM batches b "
+                "LEFT JOIN records r ON r.batch_id = b.id GROUP BY b.id ORDER BY b.id").fetchall()
+
+    def find_by_tag(self, tag):
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT r.id, r.question, r.reason, r.tag, r.type, r.date, r.extra FROM record_tags t "
+                "JOIN records r ON r.id = t.record_id WHERE t.tag = ? ORDER BY r.id", (tag,))
+            return [self._flat(r) for r in rows]
+
+    def find_by_type(self, rtype):
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT id, question, reason, tag, type, date, extra FROM records WHERE type = ? ORDER BY id",
+                (rtype,))
+            return [self._flat(r) for r in rows]
+
+    def find_by_date(self, start, end):
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT id, question, reason, tag, type, date, extra FROM records "
+                "WHERE date >= ? AND date < ? ORDER BY date, id", (start, end))
+            return [self._flat(r) for r in rows]
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_sqlite_store(path, kind="batches", seed_json=None):
+    key = os.path.abspath(path)
+    with _stores_lock:
+        if key not in _stores:
+            _stores[key] = SqliteStore(path, kind, seed_json)
+        return _stores[key]
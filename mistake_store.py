@@ -0,0 +1,479 @@
+import atexit
+import json
+import os
+import threading
+
+from mistake_binary import BinaryStore, binary_path_for, open_binary
+from mistake_journal import COMPACT_SUFFIX, apply_entry, get_journal
+from mistake_lock import get_lock
+from mistake_sqlite import get_sqlite_store, sqlite_path_for
+from mistake_stream import batch_headers, header_of, read_span, write_snapshot_tmp
+from mistake_trace import count, span, traced
+
+# One place for load_db/save_db.  Every app calls configure() once for its
+# file and then load_db(path), save_db(path, data), add_to_db(path, item)...
+# load_db keeps the parsed list in memory and only re-reads the file when
+# its mtime or size changed, so reopening a viewer is free.  The "remote"
+# backend talks to mistake_server.py at the address given to configure();
+# its signature is the server's write generation.  Loads and writes are
+# timed by mistake_trace when tracing is on.
+BACKENDS = ("json", "journal", "sqlite", "binary", "remote")
+
+_settings = {}   # abspath -> (backend, kind)
+_cache = {}      # abspath -> (signature, data)
+_headers = {}    # abspath -> (signature, batch headers)
+_indexes = {}    # abspath -> {name: (version, index object)}
+_addresses = {}  # abspath -> server address, for the remote backend
+_lock = threading.RLock()
+
+
+# ----------------- plain JSON file -----------------
+class JsonFile:
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path, "r", encoding="utf-8") as f:
+            try:
+                return json.load(f)
+            except json.JSONDecodeError:
+                return []
+
+    def save(self, data):
+        os.replace(write_snapshot_tmp(self.path, data), self.path)
+
+    def add(self, item):
+        data = self.load()
+        data.append(item)
+        self.save(data)
+
+    def add_many(self, items):
+        data = self.load()
+        data.extend(items)
+        self.save(data)
+
+    def edit(self, index, item):
+        data = self.load()
+        data[index] = item
+        self.save(data)
+
+    def delete(self, index):
+        data = self.load()
+        del data[index]
+        self.save(data)
+
+
+# ----------------- setup -----------------
+def configure(path, backend="journal", kind="batches", address=None):
+    if backend not in BACKENDS:
+        raise ValueError(f"unknown backend {backend!r}, expected one of {BACKENDS}")
+    if backend == "remote" and not address:
+        raise ValueError("the remote backend needs the server address")
+    key = os.path.abspath(path)
+    with _lock:
+        _settings[key] = (backend, kind)
+        _addresses[key] = address
+        _cache.pop(key, None)
+        _headers.pop(key, None)
+        _indexes.pop(key, None)
+
+
+def settings(path):
+    return _settings.get(os.path.abspath(path), ("journal", "batches"))
+
+
+# the server address configure() was given, for the remote backend
+def address(path):
+    return _addresses.get(os.path.abspath(path))
+
+
+def get_store(path):
+    backend, kind = settings(path)
+    if backend == "remote":
+        from mistake_client import client_for
+        return client_for(_addresses[os.path.abspath(path)])
+    if backend == "sqlite":
+        return get_sqlite_store(sqlite_path_for(path), kind, seed_json=path)
+    if backend == "binary":
+        return BinaryStore(binary_path_for(path), kind, seed_json=path)
+    if backend == "journal":
+        return get_journal(path)
+    return JsonFile(path)
+
+
+def watched_files(path):
+    backend, _ = settings(path)
+    if backend == "remote":
+        return []
+    if backend == "sqlite":
+        db = sqlite_path_for(path)
+        return [db, db + "-wal"]
+    if backend == "binary":
+        return [binary_path_for(path)]
+    if backend == "journal":
+        j = get_journal(path)
+        return [path, j.compact_path, j.log_path]
+    return [path]
+
+
+def signature(path):
+    if settings(path)[0] == "remote":
+        return ((get_store(path).generation(), 0),)
+    sig = []
+    for p in watched_files(path):
+        try:
+            st = os.stat(p)
+            sig.append((st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            sig.append(None)
+    return tuple(sig)
+
+
+# What derived indexes and their sidecars are keyed on.  Journal compaction
+# and SQLite checkpoints rewrite files without changing what they hold, so
+# for those backends it is the write generation, which only store writes
+# bump; JSON and binary files change only when written, so their signature
+# is used and hand edits are noticed too.
+def version(path):
+    if settings(path)[0] in ("journal", "sqlite"):
+        return (get_lock(path).version(),)
+    return signature(path)
+
+
+# the signature or version as saved in JSON sidecars
+def signature_json(sig):
+    return [list(s) if s else None for s in sig]
+
+
+# ----------------- cached API -----------------
+@traced("store.load_db")
+def load_db(path):
+    key = os.path.abspath(path)
+    with _lock:
+        sig = signature(path)
+        cached = _cache.get(key)
+        if cached is None or cached[0] != sig:
+            count("store.load_db.miss")
+            cached = (sig, get_store(path).load())
+            _cache[key] = cached
+        # callers delete from their copy, so hand out a new list (records are shared)
+        return list(cached[1])
+
+
+def invalidate(path=None):
+    with _lock:
+        if path is None:
+            _cache.clear()
+            _headers.clear()
+            _indexes.clear()
+        else:
+            _cache.pop(os.path.abspath(path), None)
+            _headers.pop(os.path.abspath(path), None)
+            _indexes.pop(os.path.abspath(path), None)
+
+
+# ----------------- header-only API for the batch viewers -----------------
+def _build_headers(path):
+    backend, _ = settings(path)
+    if backend in ("sqlite", "binary", "remote"):
+        return [{"title": t, "date": d, "count": n} for t, d, n in get_store(path).headers()]
+    if backend != "journal":
+        return batch_headers(path)
+    journal = get_journal(path)
+    # one lock for both reads, so a compaction cannot swap the file between
+    # them and leave its entries counted twice or not at all
+    with journal.lock:
+        headers = batch_headers(path)
+        entries = journal.pending_entries()
+    for entry in entries:
+        if "item" in entry:
+            entry = dict(entry, item=dict(header_of(entry["item"]), item=entry["item"]))
+        elif "items" in entry:
+            entry = dict(entry, items=[dict(header_of(it), item=it) for it in entry["items"]])
+        apply_entry(headers, entry)
+    return headers
+
+
+# [{"title", "date", "count"}, ...] without loading any records
+@traced("store.load_headers")
+def load_headers(path):
+    key = os.path.abspath(path)
+    with _lock:
+        sig = signature(path)
+        cached = _headers.get(key)
+        if cached is None or cached[0] != sig:
+            count("store.load_headers.miss")
+            cached = (sig, _build_headers(path))
+            _headers[key] = cached
+        return list(cached[1])
+
+
+# the full batch at this position, decoded on its own
+@traced("store.load_batch")
+def load_batch(path, index):
+    if settings(path)[0] in ("sqlite", "binary", "remote"):
+        return get_store(path).get(index)
+    for attempt in range(2):
+        h = load_headers(path)[index]
+        if "item" in h:
+            return h["item"]
+        try:
+            return read_span(path, h["start"], h["end"])
+        except (ValueError, OSError):
+            invalidate(path)  # snapshot was rewritten under us, rescan once
+    raise IndexError(index)
+
+
+# records lo..hi of the batch at this position: SQLite reads just those
+# rows, the other backends decode the batch and keep only the slice
+def load_records(path, index, lo, hi):
+    if settings(path)[0] == "sqlite":
+        return get_store(path).records(index, lo, hi)
+    records = load_batch(path, index).get("records")
+    return records[lo:hi] if isinstance(records, list) else []
+
+
+# ----------------- streaming -----------------
+# Every item of the file in order (or at the given positions), decoded one
+# at a time and never put in load_db's cache: for the viewer snapshots and
+# whole-file exports.  The remote backend fetches STREAM_CHUNK per round trip.
+STREAM_CHUNK = 500
+
+
+def count_items(path):
+    backend, _ = settings(path)
+    if backend in ("sqlite", "binary"):
+        return get_store(path).count()
+    return len(load_headers(path))
+
+
+def iter_db(path, positions=None):
+    backend, _ = settings(path)
+    if backend in ("sqlite", "binary", "remote"):
+        store = get_store(path)
+        if positions is None:
+            positions = range(count_items(path))
+        if backend == "binary":
+            f = open_binary(store.path)
+            yield from (f.item(i) for i in positions)
+        elif backend == "remote":
+            positions = list(positions)
+            for lo in range(0, len(positions), STREAM_CHUNK):
+                yield from store.get_many(positions[lo:lo + STREAM_CHUNK])
+        else:
+            yield from (store.get(i) for i in positions)
+        return
+    if not os.path.exists(path):
+        # nothing compacted yet: every header carries its journal item
+        headers = load_headers(path)
+        yield from (headers[i]["item"] for i in (range(len(headers)) if positions is None else positions))
+        return
+    # opened before the headers are read, so a rewrite in between leaves
+    # this handle on the file the spans came from or makes them not match
+    with open(path, "rb") as f:
+        headers = load_headers(path)
+        if os.fstat(f.fileno()).st_ino != os.stat(path).st_ino:
+            invalidate(path)
+            yield from iter_db(path, positions)
+            return
+        for i in range(len(headers)) if positions is None else positions:
+            h = headers[i]
+            if "item" in h:
+                yield h["item"]
+            else:
+                f.seek(h["start"])
+                yield json.loads(f.read(h["end"] - h["start"]))
+
+
+# ----------------- writes -----------------
+def _apply(data, op, index, item):
+    if op == "add":
+        data.append(item)
+    elif op == "add_many":
+        data.extend(item)
+    elif op == "edit":
+        data[index] = item
+    elif op == "delete":
+        del data[index]
+
+
+class ConflictError(Exception):
+    pass
+
+
+# what a window remembers about the item it wants to change
+def _identity(x):
+    if "records" not in x and "count" not in x:
+        return ("record", x.get("question"), x.get("date"))
+    count = x["count"] if "count" in x else len(x.get("records", []))
+    return ("batch", x.get("title"), x.get("date"), count)
+
+
+# find where the item the caller saw is now, after other writers moved things
+def _rebase(path, index, expect):
+    want = _identity(expect)
+    current = load_headers(path) if settings(path)[1] == "batches" else load_db(path)
+    if 0 <= index < len(current) and _identity(current[index]) == want:
+        return index
+    matches = [i for i, c in enumerate(current) if _identity(c) == want]
+    if not matches:
+        raise ConflictError("the item was changed or deleted by another window")
+    return min(matches, key=lambda i: abs(i - index))
+
+
+def generation(path):
+    if settings(path)[0] == "remote":
+        return get_store(path).generation()
+    return get_lock(path).generation()
+
+
+# Writes hold the file lock only for the append/rewrite itself.  When the
+# caller passes expect= (the header or record it is looking at) and the
+# generation it loaded at, an index that went stale because someone else
+# wrote in between is rebased onto the item's current position.
+def _write(path, op, index, item, write, expect=None, seen=None):
+    key = os.path.abspath(path)
+    if settings(path)[0] == "remote":
+        # the server locks, rebases and numbers the commit
+        with _lock:
+            index, gen, alone = get_store(path).write(op, index, item, expect, seen)
+            before = ((gen - 1, 0),) if alone else None
+            _follow(key, op, index, item, (before, ((gen, 0),)), (before, ((gen, 0),)))
+            return index
+    with _lock, get_lock(path) as lock:
+        if expect is not None and (seen is None or seen != lock.generation()):
+            count("store.rebase")
+            index = _rebase(path, index, expect)
+        before = signature(path), version(path)
+        write(get_store(path), index)
+        lock.bump()
+        after = signature(path), version(path)
+        _follow(key, op, index, item, (before[0], after[0]), (before[1], after[1]))
+        return index
+
+
+# the cached list (by signature) and the derived indexes (by version) that
+# were current before the write take the change, stale ones are dropped
+def _follow(key, op, index, item, signatures, versions):
+    cached = _cache.get(key)
+    if cached is not None and cached[0] == signatures[0]:
+        _apply(cached[1], op, index, item)
+        _cache[key] = (signatures[1], cached[1])
+    else:
+        _cache.pop(key, None)
+    derived = _indexes.get(key, {})
+    for name, (ver, idx) in list(derived.items()):
+        if ver == versions[0]:
+            with span("index.apply." + name):
+                idx.apply(op, index, item)
+            derived[name] = (versions[1], idx)
+        else:
+            del derived[name]
+
+
+@traced("store.save_db")
+def save_db(path, data):
+    key = os.path.abspath(path)
+    if settings(path)[0] == "remote":
+        with _lock:
+            _, gen, _ = get_store(path).write("save", item=data)
+            _cache[key] = (((gen, 0),), list(data))
+            _indexes.pop(key, None)
+        return
+    with _lock, get_lock(path + COMPACT_SUFFIX), get_lock(path) as lock:
+        get_store(path).save(data)
+        lock.bump()
+        _cache[key] = (signature(path), list(data))
+        _indexes.pop(key, None)
+
+
+@traced("store.add")
+def add_to_db(path, item):
+    _write(path, "add", None, item, lambda s, i: s.add(item))
+
+
+@traced("store.add_many")
+def add_many_to_db(path, items):
+    items = list(items)
+    _write(path, "add_many", None, items, lambda s, i: s.add_many(items))
+
+
+@traced("store.edit")
+def edit_in_db(path, index, item, expect=None, generation=None):
+    return _write(path, "edit", index, item, lambda s, i: s.edit(i, item), expect, generation)
+
+
+@traced("store.delete")
+def delete_from_db(path, index, expect=None, generation=None):
+    return _write(path, "delete", index, None, lambda s, i: s.delete(i), expect, generation)
+
+
+# ----------------- derived indexes -----------------
+# An index is built once from load_db(path) by factory(data, kind) and then
+# kept current by _write through its apply(op, index, item) method, so
+# tag, search and rollup lookups never rescan the file after a save.
+# load(path, version), if given, is tried first and may return an index
+# saved earlier for exactly this version of the file.
+def get_index(path, name, factory, load=None):
+    key = os.path.abspath(path)
+    with _lock:
+        ver = version(path)
+        derived = _indexes.setdefault(key, {})
+        entry = derived.get(name)
+        if entry is None or entry[0] != ver:
+            idx = load(path, ver) if load is not None else None
+            if idx is None:
+                data = load_db(path)
+                with span("index.build." + name, items=len(data)):
+                    idx = factory(data, settings(path)[1])
+            entry = (ver, idx)
+            derived[name] = entry
+        return entry[1]
+
+
+# _write changes derived indexes while holding this; lookups from worker
+# threads take it too, so they never see an index with a change half applied
+def index_lock():
+    return _lock
+
+
+# (version, index) if the index is built and matches the file as it is now
+def current_index(path, name):
+    with _lock:
+        entry = _indexes.get(os.path.abspath(path), {}).get(name)
+        if entry is not None and entry[0] == version(path):
+            return entry
+        return None
+
+
+# ----------------- saved indexes -----------------
+# Indexes that are slow to build can be kept next to the file as
+# "<file><suffix>".  cls needs a load(path, version) classmethod that
+# returns None unless the saved copy matches, save(path, version), and
+# dirty / on_disk flags.  A fresh build is saved straight away, later
+# changes when the process exits.
+_saved = {}   # (abspath, name) -> (path, suffix)
+
+
+def get_saved_index(path, name, cls, suffix):
+    with _lock:
+        _saved[(os.path.abspath(path), name)] = (path, suffix)
+        idx = get_index(path, name, cls, load=lambda p, sig: cls.load(p + suffix, sig))
+        if not idx.on_disk:
+            save_index(path, name)
+        return idx
+
+
+def save_index(path, name):
+    with _lock:
+        entry = current_index(path, name)
+        if entry is not None and entry[1].dirty:
+            entry[1].save(path + _saved[(os.path.abspath(path), name)][1], entry[0])
+
+
+@atexit.register
+def save_indexes():
+    for (_, name), (path, _) in list(_saved.items()):
+        save_index(path, name)
@@ -0,0 +1,189 @@
+import codecs
+import json
+import mmap
+import os
+import re
+
+# Header-only access to a batches file (mistake_db.json, mistake_data.json).
+# The viewers only need title, date and the record count for their list, so
+# the file is scanned through mmap without building any record dicts, and
+# the byte span of every batch is kept so one batch can be decoded on its own
+# when it is selected.  The scan result is saved next to the file as
+# "<file>.idx" and reused while the file's size and mtime match.
+INDEX_SUFFIX = ".idx"
+
+_TOKEN = re.compile(rb'[\[\]{}"]')
+_STRING_END = re.compile(rb'["\\]')
+_COLON = re.compile(rb'\s*:')
+LBRACE, RBRACE, LBRACK, RBRACK, QUOTE, BACKSLASH = b"{}[]\"\\"
+
+
+# ----------------- scanning -----------------
+def _string_end(m, pos):
+    while True:
+        e = _STRING_END.search(m, pos)
+        if e is None:
+            return len(m)
+        if m[e.start()] == BACKSLASH:
+            pos = e.start() + 2
+            continue
+        return e.end()
+
+
+def _scan(m):
+    pos = depth = start = count = 0
+    title = date = last_key = None
+    in_records = False
+    while True:
+        t = _TOKEN.search(m, pos)
+        if t is None:
+            return
+        c = m[t.start()]
+        pos = t.end()
+        if c == QUOTE:
+            s = t.start()
+            pos = _string_end(m, pos)
+            if depth == 2:
+                if _COLON.match(m, pos):
+                    last_key = json.loads(m[s:pos])
+                elif last_key == "title":
+                    title = json.loads(m[s:pos])
+                elif last_key == "date":
+                    date = json.loads(m[s:pos])
+        elif c == LBRACE or c == LBRACK:
+            if depth == 1 and c == LBRACE:
+                start, count = t.start(), 0
+                title = date = last_key = None
+            elif depth == 2 and c == LBRACK and last_key == "records":
+                in_records = True
+            elif depth == 3 and in_records and c == LBRACE:
+                count += 1
+            depth += 1
+        else:
+            depth -= 1
+            if depth == 2:
+                in_records = False
+            elif depth == 1 and c == RBRACE:
+                yield {"title": title, "date": date, "count": count, "start": start, "end": t.end()}
+
+
+def iter_batch_headers(path):
+    if not os.path.exists(path):
+        return
+    with open(path, "rb") as f:
+        try:
+            m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # empty file
+            return
+        with m:
+            yield from _scan(m)
+
+
+# every top-level item of any mistake file as (start, end, item), decoded
+# one at a time from 1 MB chunks; pass the end of the last item seen to
+# carry on from there.  An item bigger than the buffer is retried with
+# twice as much read each time, so the retries add up to linear work
+def iter_items(path, offset=0, chunk_size=1 << 20):
+    if not os.path.exists(path):
+        return
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    text, pos, byte_pos, eof = "", 0, offset, False
+    with open(path, "rb") as f:
+        f.seek(offset)
+        while True:
+            # skip "[", "," and whitespace between items (all one byte each)
+            while True:
+                while pos < len(text) and text[pos] in " \t\r\n,[":
+                    pos += 1
+                    byte_pos += 1
+                if pos < len(text) or eof:
+                    break
+                data = f.read(chunk_size)
+                eof = not data
+                text, pos = text[pos:] + utf8.decode(data, final=eof), 0
+            if pos >= len(text) or text[pos] == "]":
+                return
+            try:
+                item, end = decoder.raw_decode(text, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                data = f.read(max(chunk_size, len(text) - pos))  # item runs past the buffer
+                eof = not data
+                text, pos = text[pos:] + utf8.decode(data, final=eof), 0
+                continue
+            size = len(text[pos:end].encode("utf-8"))
+            yield byte_pos, byte_pos + size, item
+            byte_pos += size
+            pos = end
+
+
+def read_span(path, start, end):
+    with open(path, "rb") as f:
+        f.seek(start)
+        return json.loads(f.read(end - start))
+
+
+# ----------------- .idx sidecar -----------------
+def header_of(item, start=None, end=None):
+    h = {"title": item.get("title"), "date": item.get("date"),
+         "count": len(item.get("records", []))}
+    if start is not None:
+        h["start"], h["end"] = start, end
+    return h
+
+
+def _write_index(path, st, headers):
+    tmp = path + INDEX_SUFFIX + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"size": st.st_size, "mtime_ns": st.st_mtime_ns, "headers": headers},
+                  f, ensure_ascii=False)
+    os.replace(tmp, path + INDEX_SUFFIX)
+
+
+def _read_index(path, st):
+    try:
+        with open(path + INDEX_SUFFIX, "r", encoding="utf-8") as f:
+            idx = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+    if idx.get("size") != st.st_size or idx.get("mtime_ns") != st.st_mtime_ns:
+        return None
+    return idx["headers"]
+
+
+def batch_headers(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return []
+    headers = _read_index(path, st)
+    if headers is None:
+        headers = list(iter_batch_headers(path))
+        _write_index(path, st, headers)
+    return headers
+
+
+# ----------------- writing -----------------
+# Same bytes as json.dump(data, indent=4), but written item by item so the
+# batch offsets are known and the .idx can be saved without a rescan.
+# Returns the temp file; the caller os.replace()s it over the snapshot.
+def write_snapshot_tmp(path, data):
+    tmp = path + ".tmp"
+    headers = []
+    with open(tmp, "wb") as f:
+        f.write(b"[")
+        for i, item in enumerate(data):
+            f.write(b",\n    " if i else b"\n    ")
+            chunk = json.dumps(item, indent=4, ensure_ascii=False).replace("\n", "\n    ").encode("utf-8")
+            start = f.tell()
+            f.write(chunk)
+            if isinstance(item, dict):
+                headers.append(header_of(item, start, start + len(chunk)))
+        f.write(b"\n]" if data else b"]")
+        f.flush()
+        os.fsync(f.fileno())
+    # the rename keeps size and mtime, so the index stays valid for the real file
+    _write_index(path, os.stat(tmp), headers)
+    return tmp
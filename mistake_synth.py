@@ -0,0 +1,108 @@
+import argparse
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+from itertools import accumulate
+
+from mistake_stream import write_snapshot_tmp
+
+# Made-up mistake files for benchmarks, the same ones every time for a seed:
+#
+#   python mistake_synth.py bench_db.json --records 100000                 # mistake_db.json shape
+#   python mistake_synth.py bench.json --records 1000000 --schema records  # database.json shape
+#
+#   write_db("bench_db.json", 10000, schema="data", seed=1)   # mistake_data.json shape
+#
+# Tags, reasons and words are drawn from Zipf distributions (a few are
+# everywhere, most are rare), like the real files.  Batches hold 1 to
+# 2 * BATCH_RECORDS - 1 records and are dated a few hours apart, oldest first.
+SCHEMAS = ("batches", "records", "data")
+BATCH_RECORDS = 20     # mean records per batch
+ZIPF_S = 1.1
+START = datetime(2024, 1, 1, 9, 0, 0)
+TAGS = ["Easy", "Theoretical", "Need reading", "Formula", "Hard", "Calculation", "Units", "Graph",
+        "Revision", "Silly"] + [f"topic{i}" for i in range(190)]
+REASONS = ["Not read enough theory", "Calculation mistake", "Misread the question", "Ran out of time",
+           "Forgot the formula", "Guessed", "Sign error", "Unit conversion"] + [f"reason {i}" for i in range(42)]
+WORDS = ["what", "is", "the", "value", "of", "time", "constant", "formula", "for", "current", "voltage",
+         "resistance", "capacitor", "inductor", "energy", "force", "mass", "velocity", "find", "when"] + \
+        [f"w{i}" for i in range(4980)]
+
+
+class Zipf:
+    def __init__(self, values, rng, s=ZIPF_S):
+        self.values = values
+        self.rng = rng
+        self.cum = list(accumulate(1 / (k + 1) ** s for k in range(len(values))))
+
+    def __call__(self, k=1):
+        return self.rng.choices(self.values, cum_weights=self.cum, k=k)
+
+
+class Synth:
+    def __init__(self, seed=0):
+        self.rng = random.Random(seed)
+        self.tags = Zipf(TAGS, self.rng)
+        self.reasons = Zipf(REASONS, self.rng)
+        self.words = Zipf(WORDS, self.rng)
+        self.when = START
+
+    def question(self):
+        return " ".join(self.words(self.rng.randint(4, 14))).capitalize() + "?"
+
+    def tag_list(self):
+        return list(dict.fromkeys(self.tags(self.rng.choice((1, 1, 2, 2, 3)))))
+
+    def tick(self):
+        self.when += timedelta(minutes=self.rng.randint(30, 600))
+        return self.when
+
+    def record(self):
+        return {"question": self.question(), "type": self.rng.choice(("wrong", "wrong", "timeout")),
+                "reason": self.reasons()[0], "tags": self.tag_list(),
+                "date": self.tick().strftime("%Y-%m-%d %H:%M:%S")}
+
+    def batch(self, n, date_format="%Y-%m-%d %H:%M:%S"):
+        return {"title": f"Quiz {self.rng.randint(1, 300)}", "date": self.tick().strftime(date_format),
+                "records": [{"question": self.question(), "reason": self.reasons()[0],
+                             "tag": ",".join(self.tag_list())} for _ in range(n)]}
+
+
+# items of a file holding `records` records in total
+def generate(records, schema="batches", seed=0):
+    if schema not in SCHEMAS:
+        raise ValueError(f"unknown schema {schema!r}, expected one of {SCHEMAS}")
+    s = Synth(seed)
+    if schema == "records":
+        for _ in range(records):
+            yield s.record()
+        return
+    date_format = "%Y-%m-%d %H:%M" if schema == "data" else "%Y-%m-%d %H:%M:%S"
+    left = records
+    while left > 0:
+        n = min(left, s.rng.randint(1, 2 * BATCH_RECORDS - 1))
+        yield s.batch(n, date_format)
+        left -= n
+
+
+def write_db(path, records, schema="batches", seed=0):
+    os.replace(write_snapshot_tmp(path, generate(records, schema, seed)), path)
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a made-up mistake file for benchmarks.")
+    parser.add_argument("path")
+    parser.add_argument("--records", type=int, default=10000)
+    parser.add_argument("--schema", choices=SCHEMAS, default="batches",
+                        help="batches: mistake_db.json, records: database.json, data: mistake_data.json")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    write_db(args.path, args.records, args.schema, args.seed)
+    print(f"{args.path}: {args.records} records ({args.schema}, seed {args.seed})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,211 @@
+import re
+
+from mistake_sqlite import split_tags
+from mistake_store import get_index, index_lock
+
+# Tag filter over a mistake file.  Tags are normalised (trimmed, case
+# folded) and given integer ids; every tag id maps to a bitmap of record ids
+# held in a Python int, so AND / OR / NOT are single big-int operations.
+# Works for both layouts: "tag": "physics,Easy" (batch files) and
+# "tags": [...] (database.json).
+#
+#   records = tag_query(DB_FILE, 'physics AND Easy AND NOT Theoretical')
+#   records = tag_query(DB_FILE, '"Need reading" OR (timeout hard)')
+
+_TOKEN = re.compile(r'\s*(?:(\()|(\))|"([^"]*)"|([^\s()"]+))')
+
+
+def normalize(tag):
+    return tag.strip().casefold()
+
+
+class TagIndex:
+    def __init__(self, data=(), kind="batches"):
+        self.kind = kind
+        self.vocab = {}      # normalised tag -> tag id
+        self.names = []      # tag id -> tag as first written
+        self.bitmaps = []    # tag id -> int bitmap of record ids
+        self.live = 0        # bitmap of record ids that still exist
+        self.records = []    # record id -> (batch or None, record)
+        self.items = []      # position in the file -> [record ids]
+        self._bulk_load(data)
+
+    # ---------- building ----------
+    def tag_id(self, tag):
+        key = normalize(tag)
+        tid = self.vocab.get(key)
+        if tid is None:
+            tid = self.vocab[key] = len(self.names)
+            self.names.append(tag.strip())
+            self.bitmaps.append(0)
+        return tid
+
+    def _records_of(self, item):
+        if self.kind == "records":
+            return [(None, item)]
+        return [(item, r) for r in item.get("records", [])]
+
+    def _new_ids(self, item):
+        rids = []
+        for pair in self._records_of(item):
+            rids.append(len(self.records))
+            self.records.append(pair)
+        return rids
+
+    def _tag_ids(self, rec, seen):
+        raw = rec.get("tag") if "tags" not in rec else tuple(rec.get("tags") or ())
+        tids = seen.get(raw)
+        if tids is None:
+            tids = seen[raw] = [self.tag_id(t) for t in split_tags(rec)]
+        return tids
+
+    def _bulk_load(self, data):
+        members = {}
+        seen = {}  # the same tag strings repeat thousands of times
+        for item in data:
+            rids = self._new_ids(item)
+            self.items.append(rids)
+            for rid in rids:
+                for tid in self._tag_ids(self.records[rid][1], seen):
+                    members.setdefault(tid, []).append(rid)
+        size = (len(self.records) + 7) // 8
+        for tid, rids in members.items():
+            buf = bytearray(size)
+            for rid in rids:
+                buf[rid >> 3] |= 1 << (rid & 7)
+            self.bitmaps[tid] = int.from_bytes(buf, "little")
+        self.live = (1 << len(self.records)) - 1
+
+    def _set(self, rids, on):
+        for rid in rids:
+            bit = 1 << rid
+            for tag in split_tags(self.records[rid][1]):
+                tid = self.tag_id(tag)
+                self.bitmaps[tid] = self.bitmaps[tid] | bit if on else self.bitmaps[tid] & ~bit
+            self.live = self.live | bit if on else self.live & ~bit
+            if not on:
+                self.records[rid] = None
+
+    # ---------- kept current by mistake_store ----------
+    def apply(self, op, index, item):
+        if op == "add":
+            self.add(item)
+        elif op == "add_many":
+            for it in item:
+                self.add(it)
+        elif op == "edit":
+            self._set(self.items[index], False)
+            self.items[index] = self._new_ids(item)
+            self._set(self.items[index], True)
+        elif op == "delete":
+            self._set(self.items.pop(index), False)
+
+    def add(self, item):
+        rids = self._new_ids(item)
+        self.items.append(rids)
+        self._set(rids, True)
+
+    # ---------- queries ----------
+    def bitmap(self, tag):
+        tid = self.vocab.get(normalize(tag))
+        return self.bitmaps[tid] if tid is not None else 0
+
+    def query(self, expr):
+        tokens = _tokenize(expr)
+        bits, pos = self._or(tokens, 0)
+        if pos != len(tokens):
+            raise ValueError(f"unexpected {tokens[pos][1]!r} in tag query")
+        return bits & self.live
+
+    # expr := term (OR term)* ; term := factor ((AND)? factor)* ; factor := NOT factor | ( expr ) | tag
+    def _or(self, tokens, pos):
+        bits, pos = self._and(tokens, pos)
+        while pos < len(tokens) and tokens[pos] == ("word", "OR"):
+            rhs, pos = self._and(tokens, pos + 1)
+            bits |= rhs
+        return bits, pos
+
+    def _and(self, tokens, pos):
+        bits, pos = self._not(tokens, pos)
+        while pos < len(tokens) and tokens[pos] not in (("word", "OR"), (")", ")")):
+            if tokens[pos] == ("word", "AND"):
+                pos += 1
+            rhs, pos = self._not(tokens, pos)
+            bits &= rhs
+        return bits, pos
+
+    def _not(self, tokens, pos):
+        if pos >= len(tokens):
+            raise ValueError("tag query ends too early")
+        kind, value = tokens[pos]
+        if kind == "word" and value == "NOT":
+            bits, pos = self._not(tokens, pos + 1)
+            return self.live & ~bits, pos
+        if kind == "(":
+            bits, pos = self._or(tokens, pos + 1)
+            if pos >= len(tokens) or tokens[pos][0] != ")":
+                raise ValueError("missing ) in tag query")
+            return bits, pos + 1
+        if kind == ")":
+            raise ValueError("unexpected ) in tag query")
+        return self.bitmap(value), pos + 1
+
+    def count(self, expr):
+        return bin(self.query(expr)).count("1")
+
+    def ids(self, bits, limit=None):
+        out = []
+        raw = bits.to_bytes((bits.bit_length() + 7) // 8, "little")
+        for m in re.finditer(b"[^\x00]", raw):
+            byte, base = raw[m.start()], m.start() * 8
+            for i in range(8):
+                if byte >> i & 1:
+                    out.append(base + i)
+                    if limit is not None and len(out) >= limit:
+                        return out
+        return out
+
+    # [(batch or None, record), ...] in insertion order
+    def matching(self, expr, limit=None):
+        return [self.records[rid] for rid in self.ids(self.query(expr), limit)]
+
+    def tags(self):
+        return [self.names[tid] for tid in range(len(self.names)) if self.bitmaps[tid] & self.live]
+
+
+def _tokenize(expr):
+    tokens = []
+    pos = 0
+    expr = expr.rstrip()
+    while pos < len(expr):
+        m = _TOKEN.match(expr, pos)
+        if m is None:
+            raise ValueError(f"can't parse tag query near {expr[pos:]!r}")
+        pos = m.end()
+        if m.group(1):
+            tokens.append(("(", "("))
+        elif m.group(2):
+            tokens.append((")", ")"))
+        elif m.group(3) is not None:
+            tokens.append(("tag", m.group(3)))
+        else:
+            word = m.group(4)
+            tokens.append(("word", word.upper()) if word.upper() in ("AND", "OR", "NOT") else ("tag", word))
+    return tokens
+
+
+def tag_index(path):
+    return get_index(path, "tags", TagIndex)
+
+
+def tag_query(path, expr, limit=None):
+    with index_lock():
+        return tag_index(path).matching(expr, limit)
+
+
+# (number of matches, [(batch or None, record), ...] for the first `limit`)
+def tag_matches(path, expr, limit=None):
+    with index_lock():
+        index = tag_index(path)
+        bits = index.query(expr)
+        return bin(bits).count("1"), [index.records[rid] for rid in index.ids(bits, limit)]
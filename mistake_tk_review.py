@@ -0,0 +1,71 @@
+import tkinter as tk
+from tkinter import messagebox
+
+from mistake_review import REVIEWS_SUFFIX, due_records, record_review
+
+# Review window for the Tk apps: saved mistakes that are due again
+# (mistake_review), one at a time, graded 0..5.  The lookups and the review
+# log run on the app's TkWorkers:
+#
+#   ReviewWindow(root, workers, DB_FILE)
+REVIEW_BATCH = 20   # due records looked up at a time
+
+
+class ReviewWindow:
+    def __init__(self, master, workers, path):
+        self.path = path
+        self.workers = workers
+        self.due = []
+        self.win = tk.Toplevel(master)
+        self.win.title("Review Due Mistakes")
+        self.win.geometry("560x300")
+
+        self.text = tk.Text(self.win, height=10, wrap="word")
+        self.text.pack(fill="both", expand=True, padx=10, pady=10)
+        tk.Label(self.win, text="How well did you remember it?  0 = not at all .. 5 = perfectly").pack()
+        grades = tk.Frame(self.win)
+        grades.pack(pady=5)
+        self.grade_buttons = []
+        for grade in range(6):
+            btn = tk.Button(grades, text=str(grade), width=4, command=lambda g=grade: self.grade(g))
+            btn.pack(side="left", padx=3)
+            self.grade_buttons.append(btn)
+        self.load_due()
+
+    def set_text(self, text):
+        self.text.config(state="normal")
+        self.text.delete("1.0", tk.END)
+        self.text.insert(tk.END, text)
+        self.text.config(state="disabled")
+
+    def load_due(self):
+        self.show_next()
+        self.set_text("Loading...")
+        self.workers.submit(due_records, self.path, REVIEW_BATCH, on_done=self.got_due,
+                            on_error=lambda e: self.set_text(f"Failed to load the reviews: {e}"))
+
+    def got_due(self, due):
+        if not self.win.winfo_exists():
+            return  # closed while loading
+        self.due = due
+        self.show_next()
+        if not due:
+            self.set_text("Nothing is due for review.")
+
+    def show_next(self):
+        for btn in self.grade_buttons:
+            btn.config(state="normal" if self.due else "disabled")
+        if self.due:
+            _, batch, rec = self.due[0]
+            where = f"[{batch.get('title', '')}]\n" if batch else ""
+            self.set_text(f"{where}Q: {rec.get('question', '')}\nReason: {rec.get('reason', '')}")
+
+    # the next lot is looked up once the last review of this one is logged
+    def grade(self, grade):
+        _, batch, rec = self.due.pop(0)
+        self.workers.submit(record_review, self.path, batch, rec, grade, write=self.path + REVIEWS_SUFFIX,
+                            on_done=None if self.due else lambda _: self.win.winfo_exists() and self.load_due(),
+                            on_error=lambda e: messagebox.showerror("Error", f"Failed to save the review: {e}"))
+        self.show_next()
+        if not self.due:
+            self.set_text("Saving...")
@@ -0,0 +1,153 @@
+import tkinter as tk
+from itertools import islice
+from tkinter import ttk
+
+# Views for the Tk apps that stay quick on huge batches.
+#
+# VirtualTree looks like a ttk.Treeview but only ever holds `height` items:
+# scrolling rewrites their values from the backing sequence (a list, or the
+# SnapshotRows the viewers get from mistake_snapshot), so the first paint
+# costs the same for 10 rows as for 100k.  Row numbers are absolute:
+#
+#   view = VirtualTree(frame, ("title", "date"), to_values=lambda h: (h["title"], h["date"]))
+#   view.set_rows(headers); view.bind("<<VirtualSelect>>", ...); view.selected -> index or None
+#
+# fill_text() writes a long report into a tk.Text CHUNK_LINES lines at a
+# time from after() callbacks, so the window keeps painting while it fills.
+CHUNK_LINES = 500
+
+
+class VirtualTree(tk.Frame):
+    def __init__(self, master, columns, headings=None, widths=None, height=20, to_values=None, **kw):
+        super().__init__(master, **kw)
+        self.rows = []
+        self.to_values = to_values or (lambda row: row)
+        self.height = height
+        self.offset = 0
+        self.selected = None
+        self._drawing = False
+
+        self.tree = ttk.Treeview(self, columns=columns, show="headings", height=height, selectmode="browse")
+        for i, col in enumerate(columns):
+            self.tree.heading(col, text=headings[i] if headings else col.title())
+            if widths:
+                self.tree.column(col, width=widths[i])
+        self.scroll = ttk.Scrollbar(self, orient="vertical", command=self._on_scrollbar)
+        self.tree.pack(side="left", fill="both", expand=True)
+        self.scroll.pack(side="right", fill="y")
+        self.items = []
+
+        self.tree.bind("<<TreeviewSelect>>", self._on_select)
+        self.tree.bind("<MouseWheel>", lambda e: self.scroll_by(-1 if e.delta > 0 else 1, "units", 3))
+        self.tree.bind("<Button-4>", lambda e: self.scroll_by(-1, "units", 3))
+        self.tree.bind("<Button-5>", lambda e: self.scroll_by(1, "units", 3))
+        self.tree.bind("<Up>", lambda e: self.move_selection(-1))
+        self.tree.bind("<Down>", lambda e: self.move_selection(1))
+        self.tree.bind("<Prior>", lambda e: self.move_selection(-self.height))
+        self.tree.bind("<Next>", lambda e: self.move_selection(self.height))
+
+    # ---------- contents ----------
+    def set_rows(self, rows, to_values=None):
+        self.rows = rows
+        if to_values is not None:
+            self.to_values = to_values
+        self.offset = 0
+        self.selected = None
+        self.refresh()
+
+    def refresh(self):
+        n = len(self.rows)
+        if self.selected is not None and self.selected >= n:
+            self.selected = None
+        self.offset = max(0, min(self.offset, n - self.height))
+        shown = min(self.height, n)
+        while len(self.items) < shown:
+            self.items.append(self.tree.insert("", "end"))
+        while len(self.items) > shown:
+            self.tree.delete(self.items.pop())
+        self._drawing = True
+        try:
+            for i, item in enumerate(self.items):
+                self.tree.item(item, values=self.to_values(self.rows[self.offset + i]))
+            row = self.selected
+            if row is not None and self.offset <= row < self.offset + shown:
+                self.tree.selection_set(self.items[row - self.offset])
+            else:
+                self.tree.selection_set(())
+        finally:
+            # the selection events fire from the idle loop, after this returns
+            self.after_idle(self._done_drawing)
+        self.scroll.set(*self._fractions())
+
+    def _done_drawing(self):
+        self._drawing = False
+
+    # ---------- scrolling ----------
+    def _fractions(self):
+        n = len(self.rows)
+        if n <= self.height:
+            return 0.0, 1.0
+        return self.offset / n, (self.offset + self.height) / n
+
+    def _on_scrollbar(self, action, amount, unit=None):
+        if action == "moveto":
+            self.scroll_to(int(float(amount) * len(self.rows)))
+        else:
+            self.scroll_by(int(amount), unit)
+
+    def scroll_to(self, offset):
+        self.offset = offset
+        self.refresh()
+
+    def scroll_by(self, n, unit="units", step=1):
+        self.scroll_to(self.offset + n * (self.height if unit == "pages" else step))
+        return "break"
+
+    def see(self, row):
+        if row < self.offset:
+            self.scroll_to(row)
+        elif row >= self.offset + self.height:
+            self.scroll_to(row - self.height + 1)
+
+    # ---------- selection ----------
+    def _on_select(self, event):
+        if self._drawing:
+            return
+        sel = self.tree.selection()
+        if sel and sel[0] in self.items:
+            self.select(self.offset + self.items.index(sel[0]))
+
+    def select(self, row):
+        if not 0 <= row < len(self.rows):
+            return
+        self.selected = row
+        self.see(row)
+        self.event_generate("<<VirtualSelect>>")
+
+    def move_selection(self, n):
+        if self.rows:
+            self.select(max(0, min(len(self.rows) - 1, (self.selected if self.selected is not None else -1) + n)))
+        return "break"
+
+
+# replaces the text of `widget` with the strings from `chunks` (any
+# iterable, read lazily), chunk_lines of them per event-loop turn
+def fill_text(widget, chunks, chunk_lines=CHUNK_LINES):
+    token = object()
+    widget._fill_token = token  # a newer fill stops this one
+    widget.delete("1.0", tk.END)
+    it = iter(chunks)
+
+    def step():
+        if getattr(widget, "_fill_token", None) is not token:
+            return
+        part = list(islice(it, chunk_lines))
+        if not part:
+            return
+        try:
+            widget.insert(tk.END, "".join(part))
+        except tk.TclError:  # window closed
+            return
+        widget.after(1, step)
+
+    step()
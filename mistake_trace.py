@@ -0,0 +1,199 @@
+import atexit
+import json
+import os
+import threading
+import time
+from collections import deque
+from functools import wraps
+
+# Timing spans and counters for "the viewer is slow" reports.  Off unless
+# enable() is called or MISTAKE_TRACE / MISTAKE_METRICS is set; while off a
+# span is one flag test and a shared do-nothing context manager.
+#
+#   with span("viewer.open", rows=n): ...
+#   @traced("store.load_db")
+#   def load_db(path): ...
+#   count("store.cache_miss")
+#
+#   MISTAKE_TRACE=trace.json MISTAKE_METRICS=mistake.prom python mistake_gui_PyQt5.py
+#
+# At exit the spans go to the Chrome trace file (open it in chrome://tracing
+# or https://ui.perfetto.dev) and the per-operation latencies and counters to
+# a Prometheus textfile (node_exporter --collector.textfile).  stats() gives
+# the same numbers to the debug panel (mistake_qt_debug).
+KEEP = 2048            # latest durations per operation, for the percentiles
+MAX_EVENTS = 200000    # spans kept for the Chrome trace, oldest dropped first
+PREFIX = "mistake"
+
+_on = False
+_lock = threading.Lock()
+_durations = {}        # name -> deque of seconds
+_totals = {}           # name -> [count, sum of seconds]
+_counters = {}         # name -> value
+_events = deque(maxlen=MAX_EVENTS)
+_origin = time.perf_counter_ns()
+
+
+def enabled():
+    return _on
+
+
+def enable(on=True):
+    global _on
+    _on = on
+
+
+def reset():
+    with _lock:
+        _durations.clear()
+        _totals.clear()
+        _counters.clear()
+        _events.clear()
+
+
+def _record(name, start, end, args):
+    seconds = (end - start) / 1e9
+    with _lock:
+        if name not in _durations:
+            _durations[name] = deque(maxlen=KEEP)
+            _totals[name] = [0, 0.0]
+        _durations[name].append(seconds)
+        total = _totals[name]
+        total[0] += 1
+        total[1] += seconds
+        _events.append((name, start, end, threading.get_ident(), args))
+
+
+class _Span:
+    __slots__ = ("name", "args", "start")
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        _record(self.name, self.start, time.perf_counter_ns(), self.args)
+
+
+class _NoSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+_NO_SPAN = _NoSpan()
+
+
+def span(name, **args):
+    return _Span(name, args) if _on else _NO_SPAN
+
+
+def traced(name):
+    def wrap(fn):
+        @wraps(fn)
+        def call(*a, **kw):
+            if not _on:
+                return fn(*a, **kw)
+            start = time.perf_counter_ns()
+            try:
+                return fn(*a, **kw)
+            finally:
+                _record(name, start, time.perf_counter_ns(), None)
+        return call
+    return wrap
+
+
+def count(name, n=1):
+    if _on:
+        with _lock:
+            _counters[name] = _counters.get(name, 0) + n
+
+
+# ---------- reading ----------
+def _quantile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+# [(name, count, sum, sorted latest durations)]; the caller holds _lock
+def _snapshot():
+    return [(name, _totals[name][0], _totals[name][1], sorted(d)) for name, d in _durations.items()]
+
+
+def _summary(snapshot):
+    return sorted((name, n, total, _quantile(d, 0.5), _quantile(d, 0.99), d[-1]) for name, n, total, d in snapshot)
+
+
+# [(name, count, p50, p99, max)] in seconds, over the latest KEEP spans of each
+def stats():
+    with _lock:
+        snapshot = _snapshot()
+    return [(name, n, p50, p99, top) for name, n, _, p50, p99, top in _summary(snapshot)]
+
+
+def counters():
+    with _lock:
+        return dict(_counters)
+
+
+# ---------- export ----------
+def _replace(path, text):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+def write_chrome_trace(path):
+    pid = os.getpid()
+    with _lock:
+        events = list(_events)
+    trace = [{"name": name, "cat": name.split(".")[0], "ph": "X", "pid": pid, "tid": tid,
+              "ts": (start - _origin) / 1000, "dur": (end - start) / 1000, **({"args": args} if args else {})}
+             for name, start, end, tid, args in events]
+    _replace(path, json.dumps({"traceEvents": trace, "displayTimeUnit": "ms"}, default=str))
+    return len(trace)
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# quantiles, sum and count all read under one lock, so they agree
+def prometheus_text():
+    with _lock:
+        snapshot = _snapshot()
+        events = dict(_counters)
+    lines = [f"# HELP {PREFIX}_operation_seconds Time spent in traced operations.",
+             f"# TYPE {PREFIX}_operation_seconds summary"]
+    for name, n, total, p50, p99, _ in _summary(snapshot):
+        op = _label(name)
+        lines += [f'{PREFIX}_operation_seconds{{op="{op}",quantile="0.5"}} {p50:.9f}',
+                  f'{PREFIX}_operation_seconds{{op="{op}",quantile="0.99"}} {p99:.9f}',
+                  f'{PREFIX}_operation_seconds_sum{{op="{op}"}} {total:.9f}',
+                  f'{PREFIX}_operation_seconds_count{{op="{op}"}} {n}']
+    lines += [f"# HELP {PREFIX}_events_total Counted events.", f"# TYPE {PREFIX}_events_total counter"]
+    lines += [f'{PREFIX}_events_total{{event="{_label(name)}"}} {value}' for name, value in sorted(events.items())]
+    return "\n".join(lines) + "\n"
+
+
+# textfile collectors read whatever is there, so the file is swapped in whole
+def write_prometheus(path):
+    _replace(path, prometheus_text())
+
+
+@atexit.register
+def _dump():
+    if os.environ.get("MISTAKE_TRACE"):
+        write_chrome_trace(os.environ["MISTAKE_TRACE"])
+    if os.environ.get("MISTAKE_METRICS"):
+        write_prometheus(os.environ["MISTAKE_METRICS"])
+
+
+if os.environ.get("MISTAKE_TRACE") or os.environ.get("MISTAKE_METRICS"):
+    enable()
@@ -0,0 +1,186 @@
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Runs loads, saves and exports off the GUI thread.  A job is a plain call,
+#
+#   job = workers.submit(load_db, DB_FILE, on_done=self.show)
+#   workers.submit(add_to_db, DB_FILE, batch, write=DB_FILE, on_error=self.failed)
+#
+# and its callbacks (on_done(result), on_error(exc), on_progress(done, total))
+# run on the GUI thread: TkWorkers polls for them with after(), QtWorkers in
+# mistake_qt_workers hands them over through a queued signal.
+#
+# Jobs with write=<path> go through one thread per path, so writes to a file
+# commit in the order they were submitted.  after=<job> holds a job until
+# that one finishes, and cancels it if that one failed or was cancelled.
+# Long calls report and notice cancel through progress() and
+# check_cancelled(), which do nothing outside a job; a cancelled job ends
+# with on_error(Cancelled()).
+THREADS = 4
+POLL_MS = 30
+PROGRESS_EVERY = 0.05  # seconds between progress callbacks
+
+_local = threading.local()
+
+
+class Cancelled(Exception):
+    pass
+
+
+def current_job():
+    return getattr(_local, "job", None)
+
+
+def progress(done, total=None):
+    job = current_job()
+    if job is not None:
+        job.progress(done, total)
+
+
+def check_cancelled():
+    job = current_job()
+    if job is not None:
+        job.check()
+
+
+class Job:
+    def __init__(self, workers, fn, args, kwargs, after=None, on_done=None, on_error=None, on_progress=None):
+        self.workers = workers
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.after = after
+        self.on_done = on_done
+        self.on_error = on_error
+        self.on_progress = on_progress
+        self.state = "pending"   # running, done, failed, cancelled
+        self.result = None
+        self.error = None
+        self._cancel = threading.Event()
+        self._finished = threading.Event()
+        self._reported = 0.0
+
+    def cancel(self):
+        self._cancel.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def check(self):
+        if self._cancel.is_set():
+            raise Cancelled()
+
+    def progress(self, done, total=None):
+        self.check()
+        if self.on_progress is None:
+            return
+        now = time.monotonic()
+        if done == total or now - self._reported >= PROGRESS_EVERY:
+            self._reported = now
+            self.workers.post(self.on_progress, done, total)
+
+    def wait(self, timeout=None):
+        return self._finished.wait(timeout)
+
+    @property
+    def finished(self):
+        return self._finished.is_set()
+
+    # called on a worker thread
+    def run(self):
+        try:
+            if self.after is not None:
+                self.after.wait()
+                if self.after.state != "done":
+                    raise Cancelled()
+            self.check()
+            self.state = "running"
+            _local.job = self
+            try:
+                self.result = self.fn(*self.args, **self.kwargs)
+            finally:
+                _local.job = None
+            self.state = "done"
+            if self.on_done is not None:
+                self.workers.post(self.on_done, self.result)
+        except Cancelled as e:
+            self.state = "cancelled"
+            self.error = e
+            if self.on_error is not None:
+                self.workers.post(self.on_error, e)
+        except Exception as e:
+            self.state = "failed"
+            self.error = e
+            if self.on_error is not None:
+                self.workers.post(self.on_error, e)
+        finally:
+            self.workers.jobs.discard(self)
+            self._finished.set()
+
+
+class Workers:
+    def __init__(self, threads=THREADS):
+        self.threads = threads
+        self.pool = None
+        self.writers = {}   # path -> single thread, so writes to it commit in order
+        self.jobs = set()
+
+    # runs fn(*args) on the GUI thread; plain Workers call it right away, on the worker
+    def post(self, fn, *args):
+        fn(*args)
+
+    def submit(self, fn, *args, write=None, after=None, on_done=None, on_error=None, on_progress=None, **kwargs):
+        job = Job(self, fn, args, kwargs, after, on_done, on_error, on_progress)
+        self.jobs.add(job)
+        self._start(job, write)
+        return job
+
+    def _start(self, job, write):
+        if write is None:
+            if self.pool is None:
+                self.pool = ThreadPoolExecutor(self.threads, thread_name_prefix="mistake-io")
+            self.pool.submit(job.run)
+        else:
+            writer = self.writers.get(write)
+            if writer is None:
+                writer = self.writers[write] = ThreadPoolExecutor(1, thread_name_prefix="mistake-write")
+            writer.submit(job.run)
+
+    def cancel_all(self):
+        for job in list(self.jobs):
+            job.cancel()
+
+    # queued writes still run, so nothing typed is lost on exit
+    def shutdown(self, wait=True):
+        for pool in [self.pool, *self.writers.values()]:
+            if pool is not None:
+                pool.shutdown(wait=wait)
+
+
+class TkWorkers(Workers):
+    def __init__(self, widget, threads=THREADS, interval=POLL_MS):
+        import tkinter  # here, so PyQt apps and scripts don't load Tk
+        super().__init__(threads)
+        self.tcl_error = tkinter.TclError
+        self.widget = widget
+        self.interval = interval
+        self.queue = queue.Queue()
+        self._poll()
+
+    def post(self, fn, *args):
+        self.queue.put((fn, args))
+
+    def _poll(self):
+        try:
+            while True:
+                fn, args = self.queue.get_nowait()
+                fn(*args)
+        except queue.Empty:
+            pass
+        try:
+            self.widget.after(self.interval, self._poll)
+        except self.tcl_error:  # window closed
+            pass
@@ -1,22 +1,14 @@
-import json
 import os
 from datetime import datetime
 import tkinter as tk
 from tkinter import ttk, messagebox
+from mistake_store import configure, load_db, add_to_db
+from mistake_tk_views import fill_text
+from mistake_workers import TkWorkers
 
 DATABASE_FILE = "database.json"
-
-# Load data
-def load_data():
-    if os.path.exists(DATABASE_FILE):
-        with open(DATABASE_FILE, "r") as f:
-            return json.load(f)
-    return []
-
-# Save data
-def save_data(data):
-    with open(DATABASE_FILE, "w") as f:
-        json.dump(data, f, indent=4)
+SERVER = os.environ.get("MISTAKE_SERVER")  # e.g. http://127.0.0.1:8765, see mistake_server.py
+configure(DATABASE_FILE, backend="remote" if SERVER else "journal", kind="records", address=SERVER)  # or "json", "sqlite", "binary"
 
 # Add record
 def add_record():
@@ -37,36 +29,36 @@ def add_record():
         "date": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     }
 
-    data = load_data()
-    data.append(record)
-    save_data(data)
+    workers.submit(add_to_db, DATABASE_FILE, record, write=DATABASE_FILE,
+                   on_done=lambda _: messagebox.showinfo("Success", "Record added!"),
+                   on_error=lambda e: messagebox.showerror("Error", f"Could not save the record: {e}"))
 
-    messagebox.showinfo("Success", "Record added!")
     question_entry.delete(0, tk.END)
     reason_entry.delete(0, tk.END)
     tags_entry.delete(0, tk.END)
 
 # View all records
 def view_records():
-    data = load_data()
-    display.delete(1.0, tk.END)
+    # queued behind any adds still being written, so they show up
+    workers.submit(load_db, DATABASE_FILE, write=DATABASE_FILE, on_done=show_records,
+                   on_error=lambda e: messagebox.showerror("Error", f"Could not read records: {e}"))
+
 
+def show_records(data):
     if not data:
-        display.insert(tk.END, "No records found.\n")
+        fill_text(display, ["No records found.\n"])
         return
 
-    for i, r in enumerate(data, 1):
-        display.insert(tk.END, f"--- Record {i} ---\n")
-        display.insert(tk.END, f"Question: {r['question']}\n")
-        display.insert(tk.END, f"Type: {r['type']}\n")
-        display.insert(tk.END, f"Reason: {r['reason']}\n")
-        display.insert(tk.END, f"Tags: {', '.join(r['tags'])}\n")
-        display.insert(tk.END, f"Date: {r['date']}\n\n")
+    # one string per record, inserted a slice at a time so the window stays responsive
+    fill_text(display, (f"--- Record {i} ---\nQuestion: {r['question']}\nType: {r['type']}\n"
+                        f"Reason: {r['reason']}\nTags: {', '.join(r['tags'])}\nDate: {r['date']}\n\n"
+                        for i, r in enumerate(data, 1)))
 
 # GUI Window
 root = tk.Tk()
 root.title("Question Mistake Database")
 root.geometry("600x600")
+workers = TkWorkers(root)
 
 tk.Label(root, text="Question:").pack()
 question_entry = tk.Entry(root, width=60)
@@ -92,4 +84,5 @@ display = tk.Text(root, height=18, width=70)
 display.pack(pady=10)
 
 root.mainloop()
+workers.shutdown()  # let queued adds reach the file
 
@@ -1,25 +1,16 @@
-import json
 import os
 from datetime import datetime
 import tkinter as tk
 from tkinter import ttk, messagebox
+from mistake_store import configure, load_db
+from mistake_buffer import WriteBuffer
+from mistake_tk_review import ReviewWindow
+from mistake_tk_views import fill_text
+from mistake_workers import TkWorkers
 
 DATABASE_FILE = "database.json"
-
-# Load data
-def load_data():
-    if os.path.exists(DATABASE_FILE):
-        try:
-            with open(DATABASE_FILE, "r") as f:
-                return json.load(f)
-        except json.JSONDecodeError:
-            return []
-    return []
-
-# Save data
-def save_data(data):
-    with open(DATABASE_FILE, "w") as f:
-        json.dump(data, f, indent=4)
+SERVER = os.environ.get("MISTAKE_SERVER")  # e.g. http://127.0.0.1:8765, see mistake_server.py
+configure(DATABASE_FILE, backend="remote" if SERVER else "journal", kind="records", address=SERVER)  # or "json", "sqlite", "binary"
 
 # Add record
 def add_record(event=None):
@@ -42,9 +33,11 @@ def add_record(event=None):
         "date": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     }
 
-    data = load_data()
-    data.append(record)
-    save_data(data)
+    try:
+        buffer.add(record)
+    except Exception as e:  # kept in the buffer, written with the next flush
+        messagebox.showerror("Error", f"Records not saved yet: {e}")
+        return
 
     messagebox.showinfo("Success", "Record added!")
     question_entry.delete(0, tk.END)
@@ -53,25 +46,34 @@ def add_record(event=None):
 
 # View all records
 def view_records():
-    data = load_data()
-    display.delete(1.0, tk.END)
+    workers.submit(load_records, on_done=show_records,
+                   on_error=lambda e: messagebox.showerror("Error", f"Could not read records: {e}"))
+
+
+# runs on a worker thread
+def load_records():
+    buffer.flush()
+    return load_db(DATABASE_FILE)
 
+
+def show_records(data):
     if not data:
-        display.insert(tk.END, "No records found.\n")
+        fill_text(display, ["No records found.\n"])
         return
 
-    for i, r in enumerate(data, 1):
-        display.insert(tk.END, f"--- Record {i} ---\n")
-        display.insert(tk.END, f"Question: {r['question']}\n")
-        display.insert(tk.END, f"Type: {r['type']}\n")
-        display.insert(tk.END, f"Reason: {r['reason']}\n")
-        display.insert(tk.END, f"Tags: {', '.join(r['tags'])}\n")
-        display.insert(tk.END, f"Date: {r['date']}\n\n")
+    # one string per record, inserted a slice at a time so the window stays responsive
+    fill_text(display, (f"--- Record {i} ---\nQuestion: {r['question']}\nType: {r['type']}\n"
+                        f"Reason: {r['reason']}\nTags: {', '.join(r['tags'])}\nDate: {r['date']}\n\n"
+                        for i, r in enumerate(data, 1)))
 
 # GUI Window
 root = tk.Tk()
 root.title("Question Mistake Database")
 root.geometry("650x650")
+workers = TkWorkers(root)
+# adds typed within 0.5 s (or 50 records) go to disk in one write
+buffer = WriteBuffer(DATABASE_FILE, max_records=50, max_delay=0.5,
+                     on_error=lambda e: workers.post(messagebox.showerror, "Error", f"Records not saved yet: {e}"))
 
 tk.Label(root, text="Question:").pack()
 question_entry = tk.Entry(root, width=60)
@@ -92,6 +94,7 @@ tags_entry.pack()
 
 tk.Button(root, text="Add Record", command=add_record).pack(pady=10)
 tk.Button(root, text="View Records", command=view_records).pack(pady=5)
+tk.Button(root, text="Review Due", command=lambda: ReviewWindow(root, workers, DATABASE_FILE)).pack(pady=5)
 
 # Scrollable Text
 frame = tk.Frame(root)
@@ -108,4 +111,11 @@ scrollbar.config(command=display.yview)
 # Bind Enter to add_record
 root.bind("<Return>", add_record)
 
+# Write out buffered records before the window goes away
+def on_close():
+    buffer.flush()
+    root.destroy()
+
+root.protocol("WM_DELETE_WINDOW", on_close)
+
 root.mainloop()
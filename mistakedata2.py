@@ -1,26 +1,14 @@
-import json
 import os
 import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog
 from datetime import datetime
+from mistake_snapshot import snapshot_rows
+from mistake_store import ConflictError, configure, add_to_db, edit_in_db, generation
+from mistake_tk_views import VirtualTree
 
 DB_FILE = "mistake_data.json"
-
-
-# ---------------- DATABASE ----------------
-def load_db():
-    if not os.path.exists(DB_FILE):
-        return []
-    with open(DB_FILE, "r", encoding="utf-8") as f:
-        try:
-            return json.load(f)
-        except json.JSONDecodeError:
-            return []
-
-
-def save_db(data):
-    with open(DB_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=4, ensure_ascii=False)
+SERVER = os.environ.get("MISTAKE_SERVER")  # e.g. http://127.0.0.1:8765, see mistake_server.py
+configure(DB_FILE, backend="remote" if SERVER else "journal", address=SERVER)  # or "json", "sqlite", "binary"
 
 
 # ---------------- Add Batch Window ----------------
@@ -91,9 +79,7 @@ class AddBatchWindow:
             "records": records
         }
 
-        db = load_db()
-        db.append(batch)
-        save_db(db)
+        add_to_db(DB_FILE, batch)
         messagebox.showinfo("Saved", f"Batch '{title}' saved with {len(records)} records.")
         self.win.destroy()
 
@@ -142,11 +128,14 @@ class EditBatchWindow:
     def __init__(self, master, batch_index):
         self.master = master
         self.batch_index = batch_index
-        self.db = load_db()
-        if batch_index < 0 or batch_index >= len(self.db):
+        self.generation = generation(DB_FILE)  # read first, so later writes by others show as newer
+        self.rows = snapshot_rows(DB_FILE)
+        if batch_index < 0 or batch_index >= len(self.rows):
             messagebox.showerror("Error", "Batch not found.")
             return
-        self.batch = self.db[batch_index]
+        self.header = self.rows[batch_index]  # what edits expect to find, wherever the batch has moved
+        # decoded from the snapshot just for this window, so it can be edited in place
+        self.batch = self.rows.batch(batch_index)
 
         self.win = tk.Toplevel(master)
         self.win.title(f"Edit Batch — {self.batch['title']}")
@@ -161,3 +150,33 @@ class EditBatchWindow:
         self.title_entry.pack(side="left", padx=6)
 
         tk.Label(top_frame, text=f"Saved: {self.batch.get('date', '')}").pack(side="left", padx=6)
+
+        # Records: only the rows on screen are real Treeview items, so huge batches open at once
+        self.tree = VirtualTree(self.win, ("question", "reason", "tag"), ("Question", "Reason", "Tag"),
+                                (480, 240, 120), height=20,
+                                to_values=lambda r: (r.get("question", ""), r.get("reason", ""), r.get("tag", "")))
+        self.tree.pack(fill="both", expand=True, padx=8, pady=6)
+        self.tree.set_rows(self.batch["records"])
+        self.tree.tree.bind("<Double-1>", lambda e: self.edit_selected())
+
+    def edit_selected(self):
+        index = self.tree.selected
+        if index is None:
+            return
+
+        # saved straight away; the batch is found again if others moved it
+        def on_save(record):
+            records = list(self.batch["records"])
+            records[index] = record
+            try:
+                self.batch_index = edit_in_db(DB_FILE, self.batch_index, dict(self.batch, records=records),
+                                              expect=self.header, generation=self.generation)
+            except (ConflictError, IndexError) as e:
+                messagebox.showerror("Error", f"Could not save the record: {e}")
+                return
+            if generation(DB_FILE) == self.generation + 1:
+                self.generation += 1  # nobody else wrote in between
+            self.batch["records"][index] = record
+            self.tree.refresh()
+
+        EditRecordPopup(self.win, self.batch["records"][index], on_save)
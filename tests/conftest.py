@@ -0,0 +1,19 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mistake_store import configure, invalidate  # noqa: E402
+
+
+# a mistake file in a fresh directory, configured for the store
+@pytest.fixture
+def db(tmp_path):
+    def make(name="mistake_db.json", backend="journal", kind="batches", **kw):
+        path = str(tmp_path / name)
+        configure(path, backend=backend, kind=kind, **kw)
+        return path
+    yield make
+    invalidate()
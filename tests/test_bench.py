@@ -0,0 +1,52 @@
+import json
+
+import mistake_bench
+from mistake_bench import meta_mismatches, regressions, run_meta, run_suite
+
+BASE = {"a": {"median": 0.100, "min": 0.09, "runs": 5},
+        "b": {"median": 0.100, "min": 0.09, "runs": 5},
+        "c": {"median": 0.0002, "min": 0.0001, "runs": 5},
+        "d": {"skipped": "No module named 'openpyxl'"}}
+
+
+def test_only_real_slowdowns_are_regressions():
+    new = {"a": {"median": 0.130}, "b": {"median": 0.115}, "c": {"median": 0.0008},
+           "d": {"median": 5.0}, "e": {"median": 9.0}}
+    assert regressions(new, BASE) == [("a", 0.100, 0.130)]
+    assert regressions(new, BASE, threshold=0.1) == [("a", 0.100, 0.130), ("b", 0.100, 0.115)]
+    assert regressions({"a": {"skipped": "x"}}, BASE) == []
+
+
+def test_only_machine_meta_has_to_match():
+    meta = run_meta(seed=0, repeat=5)
+    same_machine = dict(meta, date="2020-01-01 00:00:00", seed=7, repeat=1)
+    assert meta_mismatches(meta, same_machine) == []
+    other = dict(meta, python="2.7.18", cpus=(meta["cpus"] or 0) + 1)
+    assert meta_mismatches(meta, other) == [("python", "2.7.18", meta["python"]),
+                                            ("cpus", other["cpus"], meta["cpus"])]
+
+
+def test_main_flags_regressions_against_a_baseline(tmp_path, monkeypatch, capsys):
+    baseline = tmp_path / "base.json"
+    baseline.write_text(json.dumps({"meta": dict(run_meta(0, 5), platform="elsewhere"), "results": BASE}))
+    out = tmp_path / "new.json"
+    monkeypatch.setattr(mistake_bench, "run_suite",
+                        lambda *a, **kw: {"a": {"median": 0.5, "min": 0.4, "runs": 5}, "b": BASE["b"]})
+
+    assert mistake_bench.main(["--out", str(out), "--baseline", str(baseline)]) == 1
+    err = capsys.readouterr().err
+    assert "WARNING baseline platform" in err
+    assert "REGRESSION a:" in err and "REGRESSION b" not in err
+    assert "2 benchmarks compared" in err
+    assert json.loads(out.read_text())["results"]["a"]["median"] == 0.5
+
+    assert mistake_bench.main(["--baseline", str(out)]) == 0
+
+
+def test_suite_runs_on_a_small_made_up_file(tmp_path):
+    results = run_suite([20], schemas=("batches",), backends=("journal", "sqlite"), only=["load_db", "add"],
+                        repeat=2, workdir=str(tmp_path), report=lambda line: None)
+    assert set(results) == {f"micro/{name}/batches/20/{backend}"
+                            for name in ("load_db.cold", "load_db.warm", "add", "add_many")
+                            for backend in ("journal", "sqlite")}
+    assert all(r["runs"] == 2 and r["min"] <= r["median"] for r in results.values())
@@ -0,0 +1,44 @@
+import struct
+
+from mistake_binary import KIND_BATCHES, KIND_RECORDS, BinaryFile, encode
+
+
+def test_batches_round_trip_exactly():
+    data = [
+        {"title": "T", "date": "d", "records": [{"question": "q", "reason": "r", "tag": "a"}]},
+        {"title": "T2", "note": "x", "records": [{"question": "q", "reason": None, "type": "wrong"},
+                                                {"question": None, "tag": 5},
+                                                {"reason": "r", "tag": "a", "x": 1}]},
+        {"title": None, "date": "d"},
+        {"title": "x", "date": "d", "records": "weird"},
+    ]
+    assert BinaryFile(encode(data, KIND_BATCHES)).items() == data
+
+
+def test_records_round_trip_exactly():
+    data = [
+        {"question": "q", "type": "wrong", "reason": "r", "tags": ["a"], "date": "d"},
+        {"question": "q", "tags": [f"t{i}" for i in range(70000)], "source": "quiz"},
+        {"question": 3, "type": None, "reason": None, "tags": "a,b", "date": None},
+    ]
+    assert BinaryFile(encode(data, KIND_RECORDS)).items() == data
+
+
+def test_reads_version_1():
+    def text(s):
+        return struct.pack("<I", len(s)) + s.encode()
+    strings = text("r") + text("a")
+    item = text("T") + text("d") + struct.pack("<IIII", 1, 1, 0, 1) + b"q"
+    start = 14 + len(strings) + 16
+    buf = struct.pack("<4sBBII", b"MSTB", 1, KIND_BATCHES, 2, 1) + strings + struct.pack(
+        "<QQ", start, start + len(item)) + item
+    assert BinaryFile(buf).items() == [{"title": "T", "date": "d",
+                                        "records": [{"question": "q", "reason": "r", "tag": "a"}]}]
+
+
+def test_record_pages_match_the_whole_batch():
+    batch = {"title": "T", "date": "d", "records": [{"question": f"q{i}", "reason": "r", "tag": "a"} for i in range(7)]}
+    batch["records"][4] = {"question": 4, "tag": "b", "x": 1}
+    f = BinaryFile(encode([batch], KIND_BATCHES))
+    for lo, hi in ((0, 3), (3, 7), (2, 5), (6, 50), (9, 12)):
+        assert f.records(0, lo, hi) == batch["records"][lo:hi]
@@ -0,0 +1,57 @@
+import time
+
+import pytest
+
+import mistake_buffer
+from mistake_buffer import WriteBuffer
+from mistake_store import load_db
+
+
+def _rec(i):
+    return {"question": f"q{i}", "type": "wrong", "reason": "r", "tags": ["a"], "date": "2025-01-01"}
+
+
+def test_flushes_when_full(db):
+    path = db(name="database.json", kind="records")
+    buffer = WriteBuffer(path, max_records=3, max_delay=60)
+    buffer.add(_rec(0))
+    buffer.add(_rec(1))
+    assert load_db(path) == [] and len(buffer) == 2
+    buffer.add(_rec(2))
+    assert load_db(path) == [_rec(0), _rec(1), _rec(2)] and len(buffer) == 0
+
+
+def test_flushes_after_the_delay(db):
+    path = db(name="database.json", kind="records")
+    buffer = WriteBuffer(path, max_records=50, max_delay=0.05)
+    buffer.add(_rec(0))
+    deadline = time.time() + 5
+    while len(buffer) and time.time() < deadline:
+        time.sleep(0.01)
+    assert load_db(path) == [_rec(0)]
+
+
+def test_a_failed_write_keeps_the_records(db, monkeypatch):
+    path = db(name="database.json", kind="records")
+    write = mistake_buffer.add_many_to_db
+    errors = []
+    buffer = WriteBuffer(path, max_records=2, max_delay=0.05, on_error=errors.append)
+
+    def broken(path, items):
+        raise OSError("disk full")
+    monkeypatch.setattr(mistake_buffer, "add_many_to_db", broken)
+    buffer.add(_rec(0))
+    with pytest.raises(OSError):
+        buffer.add(_rec(1))
+    assert len(buffer) == 2
+
+    buffer.max_records = 50
+    buffer.add(_rec(2))  # the timer flush fails too and reports it
+    deadline = time.time() + 5
+    while not errors and time.time() < deadline:
+        time.sleep(0.01)
+    assert [str(e) for e in errors] == ["disk full"] and len(buffer) == 3
+
+    monkeypatch.setattr(mistake_buffer, "add_many_to_db", write)
+    buffer.flush()
+    assert load_db(path) == [_rec(0), _rec(1), _rec(2)]
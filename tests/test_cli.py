@@ -0,0 +1,60 @@
+import csv
+import json
+import os
+
+import pytest
+
+from mistake_cli import main
+from mistake_snapshot import snapshot_path
+from mistake_store import add_many_to_db, load_db
+
+BATCHES = [
+    {"title": "Quiz 1", "date": "2025-12-01 10:00:00", "records": [
+        {"question": "Formula of time constant", "reason": "Theory", "tag": "physics,Easy"},
+        {"question": "Ohm's law", "reason": "sign error", "tag": "physics"}]},
+    {"title": "Quiz 2", "date": "2025-12-02 10:00:00", "records": [
+        {"question": "Derivative of sin", "reason": "Theory", "tag": "maths"}]},
+]
+
+
+@pytest.fixture
+def filled(db):
+    path = db()
+    add_many_to_db(path, BATCHES)
+    return path
+
+
+def _run(capsys, path, *args):
+    assert main(["--db", path, *args]) == 0
+    return capsys.readouterr().out
+
+
+def test_export_streams_csv_and_jsonl(filled, tmp_path, capsys):
+    out = str(tmp_path / "all.csv")
+    _run(capsys, filled, "export", out, "--format", "csv")
+    with open(out, newline="", encoding="utf-8") as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == ["Batch Title", "Date", "Question", "Reason", "Tag"]
+    assert [r[2] for r in rows[1:]] == ["Formula of time constant", "Ohm's law", "Derivative of sin"]
+
+    lines = _run(capsys, filled, "export", "-").splitlines()
+    assert [json.loads(line) for line in lines] == load_db(filled)
+    assert not os.path.exists(snapshot_path(filled))
+
+
+def test_search(filled, capsys):
+    hits = json.loads(_run(capsys, filled, "search", "time constant", "--json"))
+    assert hits[0]["title"] == "Quiz 1" and hits[0]["record"]["question"] == "Formula of time constant"
+    assert "Formula of time constant" in _run(capsys, filled, "search", "time constant")
+
+
+def test_tags(filled, capsys):
+    found = json.loads(_run(capsys, filled, "tags", "physics AND NOT easy", "--json"))
+    assert found["matches"] == 1 and found["records"][0]["record"]["question"] == "Ohm's law"
+    assert _run(capsys, filled, "tags", "physics OR maths", "--limit", "2").count("\n") == 2
+
+
+def test_stats(filled, capsys):
+    stats = json.loads(_run(capsys, filled, "stats", "--json"))
+    assert stats["total"] == 3 and stats["batches"] == 2
+    assert _run(capsys, filled, "stats").startswith("records: 3  batches: 2")
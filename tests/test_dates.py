@@ -0,0 +1,47 @@
+import pytest
+
+from mistake_dates import date_index, latest_records, records_between
+from mistake_store import add_many_to_db, add_to_db, delete_from_db, edit_in_db
+
+
+def _batch(title, date, n=1):
+    return {"title": title, "date": date, "records": [{"question": f"{title}.{i}"} for i in range(n)]}
+
+
+def _questions(pairs):
+    return [r["question"] for _, r in pairs]
+
+
+def test_range_bounds(db):
+    path = db()
+    add_many_to_db(path, [_batch("b", "2025-10-14 09:00:00"), _batch("a", "2025-10-13"),
+                          _batch("c", "2025-10-20"), _batch("d", "2025-10-20 00:00:01")])
+    assert _questions(records_between(path, "2025-10-13", "2025-10-20")) == ["a.0", "b.0"]
+    assert _questions(records_between(path, "2025-10-14 09:00", None)) == ["b.0", "c.0", "d.0"]
+    assert _questions(records_between(path, None, "2025-10-14")) == ["a.0"]
+    assert _questions(records_between(path, limit=2)) == ["a.0", "b.0"]
+    assert records_between(path, "2025-10-21", "2025-10-13") == []
+    with pytest.raises(ValueError):
+        records_between(path, "last tuesday")
+
+
+def test_undated_records_are_counted_not_listed(db):
+    path = db()
+    add_many_to_db(path, [_batch("a", "2025-10-13", 2), _batch("x", "sometime", 3), _batch("y", None)])
+    assert date_index(path).undated == 4
+    assert _questions(records_between(path)) == ["a.0", "a.1"]
+    edit_in_db(path, 1, _batch("x", "2025-10-12"))
+    assert date_index(path).undated == 1
+    assert _questions(records_between(path)) == ["x.0", "a.0", "a.1"]
+
+
+def test_order_follows_edits_and_deletes(db):
+    path = db()
+    add_many_to_db(path, [_batch("a", "2025-10-13"), _batch("b", "2025-10-15"), _batch("c", "2025-10-14")])
+    assert _questions(latest_records(path, 2)) == ["b.0", "c.0"]
+    edit_in_db(path, 0, _batch("a", "2025-10-16"))
+    assert _questions(records_between(path)) == ["c.0", "b.0", "a.0"]
+    delete_from_db(path, 1)
+    add_to_db(path, _batch("d", "2025-10-14"))  # same date as c: the older record comes first
+    assert _questions(records_between(path)) == ["c.0", "d.0", "a.0"]
+    assert _questions(latest_records(path, 10)) == ["a.0", "d.0", "c.0"]
@@ -0,0 +1,55 @@
+import os
+
+import pytest
+
+openpyxl = pytest.importorskip("openpyxl")
+
+from mistake_export import BATCH_HEADER, RECORD_HEADER, SHEET_HEADER, export_excel, export_excel_split  # noqa: E402
+from mistake_store import add_many_to_db, add_to_db  # noqa: E402
+
+
+def _batch(i):
+    return {"title": f"T{i}", "date": "2025-01-01",
+            "records": [{"question": f"q{i}.{j}", "reason": "r", "tag": "a"} for j in range(i % 3)]}
+
+
+def _sheets(out):
+    wb = openpyxl.load_workbook(out, read_only=True)
+    try:
+        return {ws.title: [list(row) for row in ws.iter_rows(values_only=True)] for ws in wb.worksheets}
+    finally:
+        wb.close()
+
+
+def test_split_parts_add_up_to_the_whole_export(db, tmp_path):
+    path = db()
+    add_many_to_db(path, [_batch(i) for i in range(10)])
+    whole = str(tmp_path / "all.xlsx")
+    assert export_excel(path, whole) == sum(i % 3 for i in range(10))
+
+    files = export_excel_split(path, str(tmp_path / "part.xlsx"), parts=3, processes=2)
+    assert files == [str(tmp_path / f"part_{k}.xlsx") for k in (1, 2, 3)]
+    rows = []
+    for f in files:
+        (name, sheet), = _sheets(f).items()
+        assert name == "Mistakes" and sheet[0] == BATCH_HEADER
+        rows += sheet[1:]
+    assert rows == _sheets(whole)["Mistakes"][1:]
+    assert not [f for f in os.listdir(tmp_path) if f.endswith(".tmp")]
+
+
+def test_split_records_file_and_sheet_layout(db, tmp_path):
+    path = db(name="database.json", kind="records")
+    for i in range(7):
+        add_to_db(path, {"question": f"q{i}", "type": "wrong", "reason": "r", "tags": ["a", "b"], "date": "d"})
+    files = export_excel_split(path, str(tmp_path / "records.xlsx"), parts=2, processes=2)
+    sheets = [_sheets(f)["Mistakes"] for f in files]
+    assert all(s[0] == RECORD_HEADER for s in sheets)
+    assert [r[0] for s in sheets for r in s[1:]] == [f"q{i}" for i in range(7)]
+
+    batches = db(name="mistake_db.json")
+    add_many_to_db(batches, [dict(_batch(i), title="Same/Title") for i in range(4)])
+    files = export_excel_split(batches, str(tmp_path / "sheets.xlsx"), parts=2, layout="sheets", processes=2)
+    names = [name for f in files for name in _sheets(f)]
+    assert names == ["Same_Title", "Same_Title (2)"] * 2
+    assert all(sheet[0] == SHEET_HEADER for f in files for sheet in _sheets(f).values())
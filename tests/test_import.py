@@ -0,0 +1,52 @@
+import json
+
+import pytest
+
+import mistake_store
+from mistake_cli import main as cli_main
+from mistake_import import import_paths, map_columns
+from mistake_snapshot import open_snapshot
+from mistake_store import load_db
+
+QUIZ = [
+    {"question": "q1", "reason": "sign error", "tag": "Easy", "type": "wrong"},
+    {"question": "q2", "reason": "ran out", "tag": "Hard", "type": "timeout"},
+    {"question": "q3", "reason": "misread", "tag": "Easy"},
+]
+
+
+def _snapshot_items(path):
+    expected = load_db(path)
+    mistake_store.invalidate(path)
+    snap = open_snapshot(path)
+    assert [snap.item(i) for i in range(len(snap))] == expected
+    return expected
+
+
+@pytest.mark.parametrize("backend", ["json", "journal", "binary", "sqlite"])
+def test_imported_types_survive_the_snapshot(db, tmp_path, backend):
+    quiz = tmp_path / "Quiz No#1_20251209_152815.json"
+    quiz.write_text(json.dumps(QUIZ))
+    path = db(backend=backend)
+    assert import_paths(path, [str(quiz)], processes=1)["records"] == 3
+    assert cli_main(["--db", path, "--backend", backend, "add", "q4", "--reason", "slip", "--tag", "Easy", "--type", "wrong"]) == 0
+
+    items = _snapshot_items(path)
+    assert [(b["title"], b["date"]) for b in items][0] == ("Quiz No#1", "2025-12-09 15:28:15")
+    assert [r.get("type") for r in items[0]["records"]] == ["wrong", "timeout", None]
+    assert items[1]["records"][0]["type"] == "wrong"
+
+
+def test_records_file_import_survives_the_snapshot(db, tmp_path):
+    quiz = tmp_path / "Quiz No#2_20251210_090000.json"
+    quiz.write_text(json.dumps(QUIZ))
+    path = db(name="database.json", backend="binary", kind="records")
+    import_paths(path, [str(quiz)], processes=1)
+    items = _snapshot_items(path)
+    assert [r["type"] for r in items] == ["wrong", "timeout", ""]
+    assert items[0]["tags"] == ["Easy"]
+
+
+def test_map_columns_finds_the_title():
+    assert map_columns(["Batch Title", "Date", "Question", "Reason", "Tag"]) == {
+        "title": 0, "question": 2, "reason": 3, "tag": 4, "date": 1}
@@ -0,0 +1,36 @@
+import os
+
+from mistake_journal import get_journal
+from mistake_search import SEARCH_SUFFIX, search, search_index
+from mistake_store import add_to_db, invalidate, load_db, signature, version
+from mistake_tags import tag_index, tag_query
+
+
+def _batch(i):
+    return {"title": f"T{i}", "date": "2025-01-01",
+            "records": [{"question": f"question {i}", "reason": "sign error", "tag": "Easy"}]}
+
+
+def test_compaction_keeps_indexes_and_sidecars(db):
+    path = db()
+    add_to_db(path, _batch(0))
+    tags, found = tag_index(path), search_index(path)
+    journal = get_journal(path)
+    for i in range(1, 20):
+        add_to_db(path, _batch(i))
+    before = signature(path), version(path)
+    journal.compact()
+    assert signature(path) != before[0]
+    assert version(path) == before[1]
+
+    assert tag_index(path) is tags
+    assert search_index(path) is found
+    assert len(tag_query(path, "Easy")) == 20
+
+    # a new process reads the sidecar saved before compaction
+    search_index(path).save(path + SEARCH_SUFFIX, version(path))
+    invalidate(path)
+    mtime = os.stat(path + SEARCH_SUFFIX).st_mtime_ns
+    assert search(path, "question 7")
+    assert os.stat(path + SEARCH_SUFFIX).st_mtime_ns == mtime
+    assert len(load_db(path)) == 20
@@ -0,0 +1,78 @@
+import os
+
+import pytest
+
+import mistake_journal
+from mistake_journal import Journal
+
+
+def _fresh(path):
+    # what the next process sees: a new Journal over the files left behind
+    return Journal(path, compact_every=10 ** 6)
+
+
+def _fill(path, n):
+    journal = _fresh(path)
+    journal.save([{"title": "T0"}])
+    for i in range(1, n):
+        journal.add({"title": f"T{i}"})
+    return journal
+
+
+def _titles(journal):
+    return [b["title"] for b in journal.load()]
+
+
+def test_death_after_the_snapshot_is_in_place(tmp_path, monkeypatch):
+    path = str(tmp_path / "mistake_db.json")
+    journal = _fill(path, 5)
+    remove = os.remove
+
+    def dies(p):
+        if p == journal.compact_path:
+            raise KeyboardInterrupt("killed")
+        remove(p)
+    monkeypatch.setattr(mistake_journal.os, "remove", dies)
+    with pytest.raises(KeyboardInterrupt):
+        journal.compact()
+    monkeypatch.setattr(mistake_journal.os, "remove", remove)
+
+    assert os.path.exists(journal.compact_path)
+    again = _fresh(path)
+    assert _titles(again) == [f"T{i}" for i in range(5)]
+    assert again.pending_entries() == []
+    again.add({"title": "T5"})
+    again.compact()
+    assert not os.path.exists(again.compact_path)
+    assert _titles(_fresh(path)) == [f"T{i}" for i in range(6)]
+
+
+def test_death_before_the_snapshot_is_in_place(tmp_path, monkeypatch):
+    path = str(tmp_path / "mistake_db.json")
+    journal = _fill(path, 5)
+    replace = os.replace
+
+    def dies(src, dst):
+        if dst == path:
+            raise KeyboardInterrupt("killed")
+        replace(src, dst)
+    monkeypatch.setattr(mistake_journal.os, "replace", dies)
+    with pytest.raises(KeyboardInterrupt):
+        journal.compact()
+    monkeypatch.setattr(mistake_journal.os, "replace", replace)
+
+    again = _fresh(path)
+    assert _titles(again) == [f"T{i}" for i in range(5)]
+    assert len(again.pending_entries()) == 4
+    again.compact()
+    assert _titles(_fresh(path)) == [f"T{i}" for i in range(5)]
+    assert _fresh(path).pending_entries() == []
+
+
+def test_background_compaction_is_not_a_daemon(tmp_path):
+    journal = Journal(str(tmp_path / "mistake_db.json"), compact_every=2)
+    journal.add({"title": "a"})
+    journal.add({"title": "b"})
+    assert not journal.compactor.daemon
+    journal.wait()
+    assert _titles(journal) == ["a", "b"] and journal.pending_entries() == []
@@ -0,0 +1,52 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from mistake_store import ConflictError, add_to_db, delete_from_db, generation, load_db, load_headers
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# one writer process: n batches added one commit at a time
+WRITER = """
+import sys
+from mistake_store import add_to_db, configure
+path, name, n = sys.argv[1], sys.argv[2], int(sys.argv[3])
+configure(path, backend=sys.argv[4])
+for i in range(n):
+    add_to_db(path, {"title": f"{name}-{i}", "date": "2025-01-01", "records": []})
+"""
+
+
+def _batch(title):
+    return {"title": title, "date": "2025-01-01", "records": [{"question": "q", "reason": "r", "tag": "a"}]}
+
+
+@pytest.mark.parametrize("backend", ["json", "journal", "sqlite"])
+def test_writers_in_other_processes_do_not_lose_commits(db, backend):
+    path = db(backend=backend)
+    writers = [subprocess.Popen([sys.executable, "-c", WRITER, path, f"w{w}", "25", backend], cwd=ROOT)
+               for w in range(4)]
+    assert [p.wait(timeout=60) for p in writers] == [0] * 4
+
+    titles = [b["title"] for b in load_db(path)]
+    assert sorted(titles) == sorted(f"w{w}-{i}" for w in range(4) for i in range(25))
+    for w in range(4):  # each writer's commits land in its own order
+        assert [t for t in titles if t.startswith(f"w{w}-")] == [f"w{w}-{i}" for i in range(25)]
+    assert generation(path) == 100
+
+
+def test_a_stale_delete_is_rebased_onto_the_item(db):
+    path = db()
+    for t in "ABCD":
+        add_to_db(path, _batch(t))
+    seen, headers = generation(path), load_headers(path)
+
+    delete_from_db(path, 0)  # another window removes A
+    assert delete_from_db(path, 2, expect=headers[2], generation=seen) == 1
+    assert [b["title"] for b in load_db(path)] == ["B", "D"]
+
+    with pytest.raises(ConflictError):  # C is gone now
+        delete_from_db(path, 2, expect=headers[2], generation=seen)
+    assert [b["title"] for b in load_db(path)] == ["B", "D"]
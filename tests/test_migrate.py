@@ -0,0 +1,85 @@
+import json
+import os
+
+import pytest
+
+import mistake_migrate
+from mistake_journal import get_journal
+from mistake_migrate import migrate
+from mistake_stream import iter_items
+
+
+def _batch(i, n=2):
+    return {"title": f"T{i}", "date": "2025-01-01 10:00:00",
+            "records": [{"question": f"q{i}.{j}", "reason": "r", "tag": "a"} for j in range(n)]}
+
+
+def _write(path, items):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(items, f)
+    return str(path)
+
+
+def _rows(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_a_rerun_after_a_crash_resumes_without_duplicates(tmp_path, monkeypatch):
+    src = _write(tmp_path / "mistake_db.json", [_batch(i) for i in range(25)])
+    out = str(tmp_path / "out.jsonl")
+    clean = str(tmp_path / "clean.jsonl")
+    migrate(clean, [src], log=lambda _: None)
+
+    real = mistake_migrate.canonical_records
+
+    def dies_at_17(source, index, item):
+        if index == 17:
+            raise KeyboardInterrupt
+        return real(source, index, item)
+
+    monkeypatch.setattr(mistake_migrate, "canonical_records", dies_at_17)
+    with pytest.raises(KeyboardInterrupt):
+        migrate(out, [src], checkpoint_every=5, log=lambda _: None)
+    monkeypatch.setattr(mistake_migrate, "canonical_records", real)
+
+    assert len(_rows(out)) > 30  # items past the last checkpoint were written too
+    migrate(out, [src], checkpoint_every=5, log=lambda _: None)
+    assert _rows(out) == _rows(clean)
+    assert len(_rows(out)) == 50
+
+
+def test_same_named_sources_keep_their_own_checkpoints(tmp_path):
+    (tmp_path / "a").mkdir()
+    (tmp_path / "b").mkdir()
+    a = _write(tmp_path / "a" / "mistake_db.json", [_batch(0)])
+    b = _write(tmp_path / "b" / "mistake_db.json", [_batch(1, n=3)])
+    out = str(tmp_path / "out.jsonl")
+    migrate(out, [a, b], log=lambda _: None)
+    assert len(_rows(out)) == 5
+
+    migrate(out, [a, b], log=lambda _: None)  # both done: nothing written again
+    assert len(_rows(out)) == 5
+    with open(out + ".checkpoint", encoding="utf-8") as f:
+        assert set(json.load(f)["sources"]) == {os.path.abspath(a), os.path.abspath(b)}
+
+
+def test_pending_journal_entries_are_read_but_not_folded_in(tmp_path):
+    src = _write(tmp_path / "mistake_db.json", [_batch(0), _batch(1)])
+    journal = get_journal(src)
+    journal.add(_batch(2))
+    journal.delete(0)
+    before = {p: os.stat(p).st_mtime_ns for p in (src, journal.log_path)}
+
+    out = str(tmp_path / "out.jsonl")
+    migrate(out, [src], log=lambda _: None)
+    assert [r["batch"] for r in _rows(out)] == ["T1", "T1", "T2", "T2"]
+    assert {p: os.stat(p).st_mtime_ns for p in before} == before
+
+
+def test_items_bigger_than_the_buffer(tmp_path):
+    items = [_batch(0, n=1), _batch(1, n=400), "tail"]
+    src = _write(tmp_path / "mistake_db.json", items)
+    assert [item for _, _, item in iter_items(src, chunk_size=64)] == items
+    spans = [(s, e) for s, e, _ in iter_items(src, chunk_size=64)]
+    assert [item for _, _, item in iter_items(src, spans[1][0], chunk_size=64)] == items[1:]
@@ -0,0 +1,59 @@
+import json
+import os
+import time
+
+import pytest
+
+from mistake_review import DAY, REVIEWS_SUFFIX, due_records, record_review
+from mistake_store import add_to_db, edit_in_db, invalidate
+
+BATCH = {"title": "T", "date": "2025-01-01", "records": [{"question": "q", "reason": "r", "tag": "a"}]}
+
+
+def test_unknown_record_is_not_logged(db):
+    path = db()
+    add_to_db(path, BATCH)
+    with pytest.raises(KeyError):
+        record_review(path, BATCH, {"question": "never saved"}, 4)
+    assert not os.path.exists(path + REVIEWS_SUFFIX)
+
+    (due, batch, rec), = due_records(path)
+    record_review(path, batch, rec, 5)
+    assert due_records(path) == []
+
+
+def test_renaming_a_batch_keeps_its_schedule(db):
+    path = db()
+    add_to_db(path, BATCH)
+    (due, batch, rec), = due_records(path)
+    next_due = record_review(path, batch, rec, 5, at=due)
+    edit_in_db(path, 0, dict(BATCH, title="Renamed"))
+    assert due_records(path, now=next_due - 1) == []
+
+    invalidate(path)  # a restart rebuilds the schedule from the log
+    assert due_records(path, now=next_due - 1) == []
+    (again, batch, _), = due_records(path, now=next_due)
+    assert again == next_due and batch["title"] == "Renamed"
+
+
+def test_new_records_are_due_from_their_local_save_time(db, monkeypatch):
+    monkeypatch.setenv("TZ", "Asia/Kolkata")
+    time.tzset()
+    try:
+        path = db()
+        add_to_db(path, dict(BATCH, date="2025-01-01 10:00:00"))
+        saved = time.mktime((2025, 1, 1, 10, 0, 0, 0, 0, -1))
+        assert due_records(path, now=saved - 1) == []
+        assert [due for due, _, _ in due_records(path, now=saved)] == [saved]
+    finally:
+        monkeypatch.undo()
+        time.tzset()
+
+
+def test_old_log_lines_still_replay(db):
+    path = db()
+    with open(path + REVIEWS_SUFFIX, "w", encoding="utf-8") as f:
+        f.write(json.dumps({"key": "T\x1f2025-01-01\x1fq", "grade": 5, "at": 2_000_000_000}) + "\n")
+    add_to_db(path, BATCH)
+    assert due_records(path, now=2_000_000_000) == []
+    assert len(due_records(path, now=2_000_000_000 + DAY)) == 1
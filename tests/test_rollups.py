@@ -0,0 +1,63 @@
+import pytest
+
+from mistake_rollups import ROLLUPS_SUFFIX, Rollups, rollups, verify
+from mistake_store import (add_many_to_db, add_to_db, delete_from_db, edit_in_db, invalidate, save_index,
+                           version)
+
+
+def _batch(i, tags="Easy", type_="wrong"):
+    return {"title": f"T{i}", "date": f"2025-01-0{i % 9 + 1} 10:00:00",
+            "records": [{"question": f"q{i}", "reason": f"reason {i % 3}", "tag": tags, "type": type_},
+                        {"question": f"q{i}b", "reason": "slip", "tags": ["physics", tags]}]}
+
+
+def _record(i):
+    return {"question": f"q{i}", "reason": f"reason {i % 3}", "type": "timeout" if i % 2 else "wrong",
+            "tags": ["Easy", "math"][: i % 3], "date": f"2025-01-0{i % 9 + 1} 10:00:00"}
+
+
+@pytest.mark.parametrize("backend", ["json", "journal", "binary", "sqlite"])
+def test_counts_stay_right_through_edits_and_deletes(db, backend):
+    path = db(backend=backend)
+    for i in range(5):
+        add_to_db(path, _batch(i))
+    r = rollups(path)
+    assert r.count("tag", "easy") == 10 and r.count("type", "") == 5
+
+    edit_in_db(path, 1, _batch(1, tags="Hard", type_="timeout"))
+    delete_from_db(path, 3)
+    add_many_to_db(path, [_batch(7), _batch(8, tags="EASY")])
+    edit_in_db(path, 0, {"title": "T0", "date": "2025-02-01", "records": []})
+    delete_from_db(path, 2)
+
+    assert rollups(path) is r  # kept current, not rebuilt
+    assert verify(path) == []
+    assert r.count("tag", "Hard") == 2 and r.count("type", "timeout") == 1
+    assert r.total == 8
+
+
+def test_records_file_counts_stay_right(db):
+    path = db(name="database.json", kind="records")
+    for i in range(6):
+        add_to_db(path, _record(i))
+    rollups(path)
+    edit_in_db(path, 2, dict(_record(2), type="timeout", tags=["Hard"]))
+    delete_from_db(path, 0)
+    delete_from_db(path, 3)
+    assert verify(path) == []
+    assert rollups(path).table("type") == {"timeout": 4}
+
+
+def test_saved_counts_are_read_back_and_still_verify(db):
+    path = db()
+    for i in range(4):
+        add_to_db(path, _batch(i))
+    rollups(path)
+    delete_from_db(path, 1)
+    edit_in_db(path, 0, _batch(0, tags="Hard"))
+    save_index(path, "rollups")
+
+    invalidate(path)  # a new process
+    assert Rollups.load(path + ROLLUPS_SUFFIX, version(path)) is not None
+    assert rollups(path).on_disk
+    assert verify(path) == []
@@ -0,0 +1,15 @@
+from mistake_search import SearchIndex
+
+
+def _batch(question):
+    return {"title": "T", "date": "d", "records": [{"question": question, "reason": "", "tag": ""}]}
+
+
+def test_removed_records_leave_the_posting_lists():
+    idx = SearchIndex([_batch("alpha beta") for _ in range(10)] + [_batch("gamma")])
+    for _ in range(8):
+        idx.apply("delete", 0, None)
+    # compacted on every second delete (more than 10 % of 11 records dead)
+    assert len(idx.postings["alpha"][0]) == 2
+    assert sorted(idx.locate(rid)[0] for _, rid in idx.search("alpha")) == [0, 1]
+    assert idx.search("gamma") and idx.live == 3
@@ -0,0 +1,82 @@
+import asyncio
+import json
+
+from mistake_server import MistakeServer, Write
+from mistake_store import load_db
+
+
+def _batch(i):
+    return {"title": f"T{i}", "date": "2025-01-01", "records": [{"question": f"q{i}", "reason": "r", "tag": "a"}]}
+
+
+# the requests, sent one after another, against a server with its writer running
+def _run(path, requests):
+    async def go():
+        server = MistakeServer(path)
+        server.loop = asyncio.get_running_loop()
+        server.queue = asyncio.Queue()
+        writer = asyncio.create_task(server.writer())
+        try:
+            return [await server.respond(method, target, json.dumps(body).encode())
+                    for method, target, body in requests]
+        finally:
+            writer.cancel()
+    return asyncio.run(go())
+
+
+def test_bad_items_are_rejected_before_the_queue(db):
+    path = db()
+    answers = _run(path, [
+        ("POST", "/items", ["not", "a", "batch"]),
+        ("POST", "/items", {"title": "no records"}),
+        ("POST", "/items/bulk", [_batch(0), {"title": "x", "records": "q"}]),
+        ("PUT", "/items", {"title": "not a list"}),
+        ("POST", "/items", _batch(1)),
+        ("PUT", "/items/0", {"item": 3}),
+        ("POST", "/items/0/records", "q"),
+    ])
+    assert [status for status, _ in answers] == [400, 400, 400, 400, 200, 400, 400]
+    assert load_db(path) == [_batch(1)]
+
+
+def test_a_bad_add_does_not_fail_the_others_in_its_commit(db):
+    path = db(name="database.json", kind="records")
+    server = MistakeServer(path)
+
+    async def go():
+        server.loop = asyncio.get_running_loop()
+        group = [Write("add", item={"question": "a"}, future=server.loop.create_future()),
+                 Write("add", item="oops", future=server.loop.create_future()),
+                 Write("add_many", item=[{"question": "b"}, {"question": "c"}], future=server.loop.create_future())]
+        await server.loop.run_in_executor(None, server.commit, group)
+        return await asyncio.gather(*(w.future for w in group), return_exceptions=True)
+
+    first, bad, many = asyncio.run(go())
+    assert first["index"] == 0 and many["index"] == 1
+    assert getattr(bad, "status", None) == 400
+    assert [r["question"] for r in load_db(path)] == ["a", "b", "c"]
+
+
+def test_reads_overlapping_group_commits(db):
+    path = db()
+    requests = []
+    for i in range(30):
+        requests += [("POST", "/items", _batch(i)), ("GET", "/stats", None), ("GET", "/tags?q=a&limit=5", None)]
+    requests.append(("GET", "/generation", None))
+
+    async def go():
+        server = MistakeServer(path)
+        server.loop = asyncio.get_running_loop()
+        server.queue = asyncio.Queue()
+        writer = asyncio.create_task(server.writer())
+        try:
+            return await asyncio.gather(*(server.respond(m, t, json.dumps(b).encode() if b else b"")
+                                          for m, t, b in requests))
+        finally:
+            writer.cancel()
+
+    answers = asyncio.run(go())
+    assert {status for status, _ in answers} == {200}
+    assert answers[-2][1]["matches"] <= 30
+    stats = _run(path, [("GET", "/stats", None), ("GET", "/tags?q=a", None)])
+    assert stats[0][1]["total"] == 30 and stats[1][1]["matches"] == 30
@@ -0,0 +1,34 @@
+from mistake_sheets import HEADER, FakeWorksheet, SheetSync, batch_rows
+
+
+def _batch(i, n):
+    return {"title": f"T{i}", "date": "d", "records": [{"question": f"q{i}.{j}", "reason": "r", "tag": ""}
+                                                        for j in range(n)]}
+
+
+def _expected(db):
+    return [HEADER] + [row for b in db for row in batch_rows(b)]
+
+
+def test_lost_responses_are_retried_without_duplicate_rows():
+    ws = FakeWorksheet(row_count=5)
+    sync = SheetSync(ws, sleep=lambda s: None)
+    db = [_batch(i, 3) for i in range(4)]
+    ws.lost = [503, 502]   # the clear and the resize are carried out, their responses lost
+    sync.sync(db)
+    assert ws.get_all_values() == _expected(db)
+
+    db = db[:1] + [_batch(9, 2)] + db[2:] + [_batch(5, 4)]
+    ws.lost = [500]
+    ws.failures = [429]
+    out = sync.sync(db)
+    assert ws.get_all_values() == _expected(db)
+    assert out["rows"] == 2 + 3 + 3 + 4
+
+
+def test_unchanged_file_sends_nothing():
+    ws = FakeWorksheet()
+    sync = SheetSync(ws, sleep=lambda s: None)
+    db = [_batch(i, 2) for i in range(3)]
+    sync.sync(db)
+    assert sync.sync(db) == {"batches": 0, "rows": 0, "requests": 0}
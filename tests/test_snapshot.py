@@ -0,0 +1,107 @@
+import os
+import threading
+
+import pytest
+
+import mistake_store
+from mistake_snapshot import open_snapshot, snapshot_rows
+from mistake_store import add_to_db, delete_from_db, edit_in_db, load_db, save_db
+
+DATA = [
+    {"title": "T0", "date": "2025-01-01", "records": [{"question": "q", "reason": "r", "tag": "a", "type": "wrong"}]},
+    {"title": "T1", "date": None, "source": "quiz", "records": [{"question": None, "reason": "r"}]},
+    {"title": "T2", "date": "2025-01-02", "records": []},
+]
+
+
+@pytest.mark.parametrize("backend", ["json", "journal", "binary"])
+def test_snapshot_matches_the_file_without_load_db(db, backend):
+    path = db(backend=backend)
+    save_db(path, DATA)
+    add_to_db(path, {"title": "T3", "date": "2025-01-03", "records": [{"question": "x", "extra": [1]}]})
+    edit_in_db(path, 0, dict(DATA[0], title="edited"))
+    delete_from_db(path, 1)
+    expected = load_db(path)
+    mistake_store.invalidate(path)
+
+    snap = open_snapshot(path)
+    assert [snap.item(i) for i in range(len(snap))] == expected
+    assert mistake_store._cache == {}
+    rows = snapshot_rows(path)
+    assert [h["title"] for h in rows] == ["edited", "T2", "T3"]
+    assert rows.batch(2) == expected[2]
+
+
+def test_sqlite_viewers_read_through_the_store(db):
+    path = db(backend="sqlite")
+    save_db(path, DATA)
+    rows = snapshot_rows(path)
+    assert [h["title"] for h in rows] == ["T0", "T1", "T2"]
+    delete_from_db(path, 0)
+    del rows[0]
+    assert rows.batch(1) == DATA[2]
+
+
+def test_snapshot_is_kept_over_a_compaction_and_built_on_the_workers(db):
+    from mistake_journal import get_journal
+    from mistake_snapshot import SnapshotRows, StoreRows, snapshot_path
+    from mistake_workers import Workers
+
+    path = db()
+    save_db(path, DATA)
+    add_to_db(path, DATA[0])
+    workers = Workers()
+    try:
+        assert isinstance(snapshot_rows(path, workers), StoreRows)
+        workers.shutdown()
+        mtime = os.stat(snapshot_path(path)).st_mtime_ns
+        rows = snapshot_rows(path)
+        assert isinstance(rows, SnapshotRows) and len(rows) == 4
+
+        get_journal(path).compact()
+        mistake_store.invalidate(path)
+        assert isinstance(snapshot_rows(path), SnapshotRows)
+        assert os.stat(snapshot_path(path)).st_mtime_ns == mtime
+
+        delete_from_db(path, 0)
+        assert isinstance(snapshot_rows(path), StoreRows)  # stale, and no workers to rebuild it
+        assert [open_snapshot(path).header(i)["title"] for i in range(3)] == ["T1", "T2", "T0"]
+    finally:
+        workers.shutdown()
+
+
+@pytest.mark.parametrize("backend", ["journal", "sqlite"])
+def test_rows_page_through_a_batch(db, backend):
+    path = db(backend=backend)
+    records = [{"question": f"q{i}", "reason": "r", "tag": "a"} for i in range(5)]
+    save_db(path, DATA + [{"title": "big", "date": "d", "records": records}])
+    rows = snapshot_rows(path)
+    if backend == "journal":
+        open_snapshot(path)
+        rows = snapshot_rows(path)
+    assert rows[3]["count"] == 5
+    assert rows.records(3, 1, 3) == records[1:3]
+    delete_from_db(path, 0)
+    del rows[0]
+    assert rows.records(2, 4, 10) == records[4:]
+
+
+def test_headers_are_not_torn_by_a_compaction(db, monkeypatch):
+    path = db()
+    save_db(path, [{"title": "T0", "date": "d", "records": []}])
+    for i in range(1, 4):
+        add_to_db(path, {"title": f"T{i}", "date": "d", "records": []})
+    journal = mistake_store.get_journal(path)
+    real = mistake_store.batch_headers
+    compactor = threading.Thread(target=journal.compact)
+
+    def compacts_meanwhile(p):
+        headers = real(p)
+        compactor.start()
+        compactor.join(0.2)  # waits for the journal lock, if it is held
+        return headers
+    monkeypatch.setattr(mistake_store, "batch_headers", compacts_meanwhile)
+    mistake_store.invalidate(path)
+    assert [h["title"] for h in mistake_store.load_headers(path)] == ["T0", "T1", "T2", "T3"]
+    compactor.join()
+    assert load_db(path) == [{"title": f"T{i}", "date": "d", "records": []} for i in range(4)]
@@ -0,0 +1,96 @@
+import sqlite3
+
+from mistake_sqlite import SqliteStore
+
+
+def test_extra_keys_and_missing_question_round_trip(tmp_path):
+    store = SqliteStore(str(tmp_path / "a.sqlite3"), "batches")
+    data = [{"title": "T", "date": "2025-01-01", "note": "kept",
+             "records": [{"question": None, "reason": "r", "tag": "a,b", "type": "wrong"}]}]
+    store.save(data)
+    assert store.load() == data
+    assert store.get(0) == data[0]
+
+
+def test_records_round_trip(tmp_path):
+    store = SqliteStore(str(tmp_path / "r.sqlite3"), "records")
+    recs = [{"question": "q", "type": None, "reason": "", "tags": ["x"], "date": "d", "source": "quiz"}]
+    store.save(recs)
+    assert store.load() == recs
+
+
+def test_positions_follow_own_and_other_writes(tmp_path):
+    path = str(tmp_path / "p.sqlite3")
+    store = SqliteStore(path, "batches")
+    store.save([{"title": f"T{i}", "date": "d", "records": []} for i in range(4)])
+    store.delete(1)
+    store.add({"title": "new", "date": "d", "records": []})
+    assert [store.get(i)["title"] for i in range(store.count())] == ["T0", "T2", "T3", "new"]
+
+    other = sqlite3.connect(path)
+    other.execute("INSERT INTO batches (title, date) VALUES ('other', 'd')")
+    other.commit()
+    other.close()
+    assert store.count() == 5
+    assert store.get(-1)["title"] == "other"
+
+
+def test_batches_round_trip_exactly(tmp_path):
+    store = SqliteStore(str(tmp_path / "b.sqlite3"), "batches")
+    data = [
+        {"title": "T", "date": "d", "records": [{"question": "q", "reason": "r", "tag": " a , b,,c "}]},
+        {"title": None, "note": "x", "records": [{"question": "q", "reason": None, "type": "wrong"},
+                                                 {"question": None, "tag": 5},
+                                                 {"reason": "r", "tag": "a", "x": 1}]},
+        {"title": "no date or records"},
+        {"title": "x", "date": None, "records": "weird"},
+        {"title": 3, "date": "d", "records": []},
+    ]
+    store.save(data)
+    assert store.load() == data
+    assert [store.get(i) for i in range(store.count())] == data
+    store.edit(0, data[1])
+    assert store.get(0) == data[1]
+    assert [tuple(h) for h in store.headers()][1:3] == [(None, None, 3), ("no date or records", None, 0)]
+
+
+def test_records_round_trip_exactly(tmp_path):
+    store = SqliteStore(str(tmp_path / "r2.sqlite3"), "records")
+    recs = [
+        {"question": "q", "tags": ["a,b", " c "]},
+        {"question": "q", "type": "wrong", "tags": ["a", "b"], "date": None},
+        {"tag": "a,b", "reason": 7},
+        {"question": "q", "tags": "a, b"},
+    ]
+    store.save(recs)
+    assert store.load() == recs
+    assert [store.get(i) for i in range(store.count())] == recs
+    assert [r.get("question") for r in store.find_by_tag("a")] == ["q", None, "q"]
+
+
+def test_files_with_required_titles_are_converted(tmp_path):
+    path = str(tmp_path / "old.sqlite3")
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE batches (id INTEGER PRIMARY KEY, title TEXT NOT NULL, date TEXT);
+        CREATE TABLE records (id INTEGER PRIMARY KEY, batch_id INTEGER REFERENCES batches(id) ON DELETE CASCADE,
+                              question TEXT, reason TEXT, tag TEXT, type TEXT, date TEXT);
+        INSERT INTO batches (title, date) VALUES ('T', 'd');
+        INSERT INTO records (batch_id, question, reason, tag) VALUES (1, 'q', 'r', 'a');
+    """)
+    conn.close()
+    store = SqliteStore(path, "batches")
+    store.add({"title": None, "date": "d", "records": []})
+    assert store.load() == [{"title": "T", "date": "d", "records": [{"question": "q", "reason": "r", "tag": "a"}]},
+                            {"title": None, "date": "d", "records": []}]
+    store.delete(0)
+    assert store.count() == 1
+
+
+def test_record_pages(tmp_path):
+    store = SqliteStore(str(tmp_path / "pages.sqlite3"), "batches")
+    records = [{"question": f"q{i}", "reason": "r", "tag": "a"} for i in range(7)]
+    store.save([{"title": "x", "date": "d", "records": []}, {"title": "T", "date": "d", "records": records}])
+    assert store.records(1, 2, 5) == records[2:5]
+    assert store.records(-1, 5, 50) == records[5:]
+    assert store.records(0, 0, 10) == []
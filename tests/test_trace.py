@@ -0,0 +1,78 @@
+import json
+
+import pytest
+
+import mistake_trace
+from mistake_trace import count, counters, prometheus_text, span, stats, traced, write_chrome_trace
+
+
+@pytest.fixture
+def tracing():
+    was = mistake_trace.enabled()
+    mistake_trace.reset()
+    mistake_trace.enable()
+    yield
+    mistake_trace.enable(was)
+    mistake_trace.reset()
+
+
+def _spans(name, millis):
+    for ms in millis:
+        mistake_trace._record(name, 0, ms * 1_000_000, None)
+
+
+def test_nothing_is_recorded_while_off(tracing):
+    mistake_trace.enable(False)
+    with span("off"):
+        pass
+    traced("off.fn")(lambda: None)()
+    count("off.event")
+    assert stats() == [] and counters() == {}
+
+
+def test_spans_aggregate_per_operation(tracing):
+    _spans("store.load_db", range(1, 101))   # 1..100 ms
+    _spans("store.add", [5, 5, 7])
+
+    @traced("viewer.open")
+    def fails():
+        raise ValueError
+    with pytest.raises(ValueError):
+        fails()
+    with span("viewer.open", rows=3):
+        pass
+
+    by_name = {name: rest for name, *rest in stats()}
+    assert [name for name, *_ in stats()] == ["store.add", "store.load_db", "viewer.open"]
+    assert by_name["store.load_db"] == [100, 0.051, 0.1, 0.1]
+    assert by_name["store.add"] == [3, 0.005, 0.007, 0.007]
+    assert by_name["viewer.open"][0] == 2  # the failed call is timed too
+
+
+def test_only_the_latest_spans_feed_the_percentiles(tracing, monkeypatch):
+    monkeypatch.setattr(mistake_trace, "KEEP", 10)
+    _spans("op", [1000] * 5 + [1] * 10)
+    (name, n, p50, p99, top), = stats()
+    assert n == 15 and p50 == p99 == top == 0.001
+
+
+def test_counters_and_prometheus_text_agree(tracing, tmp_path):
+    _spans("store.load_db", [10, 20, 30])
+    _spans('odd "name"\n', [1])
+    count("store.rebase")
+    count("store.rebase", 2)
+    count("store.load_headers.miss")
+    assert counters() == {"store.rebase": 3, "store.load_headers.miss": 1}
+
+    text = prometheus_text()
+    assert 'mistake_operation_seconds{op="store.load_db",quantile="0.5"} 0.020000000' in text
+    assert 'mistake_operation_seconds_sum{op="store.load_db"} 0.060000000' in text
+    assert 'mistake_operation_seconds_count{op="store.load_db"} 3' in text
+    assert 'mistake_operation_seconds_count{op="odd \\"name\\"\\n"} 1' in text
+    assert 'mistake_events_total{event="store.rebase"} 3' in text
+    assert text.index("# TYPE mistake_operation_seconds summary") < text.index("# TYPE mistake_events_total counter")
+
+    trace = tmp_path / "trace.json"
+    assert write_chrome_trace(str(trace)) == 4
+    events = json.loads(trace.read_text())["traceEvents"]
+    assert [e["dur"] for e in events if e["name"] == "store.load_db"] == [10000.0, 20000.0, 30000.0]
@@ -0,0 +1,73 @@
+import threading
+import time
+
+from mistake_workers import Cancelled, Workers, check_cancelled, progress
+
+
+def test_a_cancelled_job_stops_at_its_next_check():
+    workers = Workers()
+    started, release = threading.Event(), threading.Event()
+    seen, errors = [], []
+
+    def slow(n):
+        for i in range(n):
+            if i == 1:
+                started.set()
+                release.wait()
+            check_cancelled()
+            seen.append(i)
+        return n
+
+    job = workers.submit(slow, 100, on_done=errors.append, on_error=errors.append)
+    follow = workers.submit(lambda: "ran", after=job, on_error=errors.append)
+    assert started.wait(5)
+    job.cancel()
+    release.set()
+    assert job.wait(5) and follow.wait(5)
+    workers.shutdown()
+
+    assert job.state == "cancelled" and seen == [0]
+    assert follow.state == "cancelled" and follow.result is None
+    assert [type(e) for e in errors] == [Cancelled, Cancelled]
+
+
+def test_progress_is_reported_throttled_and_ends_on_the_total():
+    workers = Workers()
+    reports = []
+
+    def counts(n):
+        for i in range(1, n + 1):
+            progress(i, n)
+            if i % 1000 == 0:
+                time.sleep(0.06)
+        return n
+
+    job = workers.submit(counts, 5000, on_progress=lambda done, total: reports.append((done, total)))
+    assert job.wait(5)
+    workers.shutdown()
+    assert job.result == 5000
+    assert 2 <= len(reports) < 5000
+    assert reports[-1] == (5000, 5000)
+    assert [d for d, _ in reports] == sorted(d for d, _ in reports)
+
+
+def test_writes_to_a_path_commit_in_order_and_failures_reach_on_error():
+    workers = Workers()
+    log, errors = [], []
+
+    def write(i):
+        time.sleep(0.01 if i % 2 else 0)
+        if i == 3:
+            raise OSError("disk full")
+        log.append(i)
+
+    jobs = [workers.submit(write, i, write="f", on_error=errors.append) for i in range(6)]
+    assert all(job.wait(5) for job in jobs)
+    workers.shutdown()
+    assert log == [0, 1, 2, 4, 5]
+    assert [str(e) for e in errors] == ["disk full"] and jobs[3].state == "failed"
+
+
+def test_helpers_do_nothing_outside_a_job():
+    progress(1, 2)
+    check_cancelled()